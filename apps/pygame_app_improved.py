@@ -472,7 +472,8 @@ class PixaApp:
                     'palette_size': int(self.palette_size_slider.val),
                     'steps': int(self.steps_slider.val),
                     'guidance_scale': self.guidance_slider.val,
-                    'seed': int(self.seed_input.text) if self.seed_input.text.isdigit() else None
+                    'seed': int(self.seed_input.text) if self.seed_input.text.isdigit() else None,
+                    'output_mode': 'sprite'
                 }
                 
                 response = requests.post(
@@ -487,7 +488,7 @@ class PixaApp:
                         # Base64画像をPygame surfaceに変換
                         image_data = data['image'].split(',')[1]
                         image_bytes = base64.b64decode(image_data)
-                        pil_image = Image.open(BytesIO(image_bytes))
+                        pil_image = Image.open(BytesIO(image_bytes)).convert('RGB')
                         
                         # PILからPygameへの変換
                         mode = pil_image.mode
@@ -496,6 +497,13 @@ class PixaApp:
                         
                         pygame_image = pygame.image.fromstring(raw, size, mode)
                         
+                        # スプライト解像度で受け取り、表示サイズまで拡大（transform.scale はニアレストネイバー）
+                        sprite = data.get('sprite')
+                        if sprite:
+                            pygame_image = pygame.transform.scale(
+                                pygame_image, (sprite['display_width'], sprite['display_height'])
+                            )
+                        
                         self.current_image = pygame_image
                         self.server_status = "✨ 生成完了！"
                         self.status_color = COLORS['success']
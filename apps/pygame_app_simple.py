@@ -297,7 +297,7 @@ class PixaApp:
                         # Base64画像をPygame surfaceに変換
                         image_data = data['image'].split(',')[1]
                         image_bytes = base64.b64decode(image_data)
-                        pil_image = Image.open(BytesIO(image_bytes))
+                        pil_image = Image.open(BytesIO(image_bytes)).convert('RGB')
                         
                         # PILからPygameへの変換
                         mode = pil_image.mode
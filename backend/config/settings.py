@@ -3,7 +3,7 @@ Pixa - アプリケーション設定
 """
 import os
 import torch
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 
 class Config:
@@ -20,6 +20,14 @@ class Config:
     MIN_IMAGE_SIZE = 256
     DEFAULT_IMAGE_SIZE = 512
     
+    # パイプラインキャッシュ設定
+    PIPELINE_CACHE_MAX_MODELS = 3       # 保持するモデル数の上限
+    PIPELINE_CACHE_BUDGET_GB = 12       # キャッシュ全体のパラメータサイズ上限
+    # SD系モデル間で共有を試みるコンポーネント
+    # （設定・重みファイルのハッシュが一致する場合だけ共有する）
+    SHARED_PIPELINE_COMPONENTS = ['vae', 'text_encoder', 'tokenizer']
+    HUB_METADATA_TIMEOUT = 10           # ローカルにないモデルのハッシュをHubに問い合わせるときの秒数
+    
     # ピクセルアート設定
     DEFAULT_PIXEL_SIZE = 8
     MAX_PIXEL_SIZE = 20
@@ -35,6 +43,8 @@ class Config:
     DEFAULT_FPS = 10
     MAX_FPS = 30
     MIN_FPS = 5
+    BATCH_FRAME_COUNT = 16      # 一括生成時のフレーム数
+    BATCH_MAX_WORKERS = 4       # 一括生成のワーカープール（spawn）のプロセス数（1で逐次生成）
     
     # 差分合成最適化設定
     DEFAULT_TOLERANCE = 3
@@ -43,6 +53,41 @@ class Config:
     DEFAULT_DURATION = 100
     MAX_DURATION = 1000
     MIN_DURATION = 50
+    AUTO_TOLERANCE_MAX = 255        # 目標サイズ（target_bytes）指定時に探索する tolerance の上限
+    AUTO_TOLERANCE_MAX_ENCODES = 3  # 目標サイズ指定時にフルエンコードする最大回数
+    
+    # アニメーション出力形式設定（/generate_animation_formats）
+    ANIMATION_OUTPUT_FORMATS = ['gif', 'apng', 'webp']  # formats 未指定時にエンコードする形式
+    ENCODER_MAX_WORKERS = 3     # 形式ごとのエンコードを並列に実行するスレッド数
+    WEBP_ENCODE_METHOD = 4      # ロスレスWebPの圧縮の手間（0: 高速 〜 6: 最小サイズ）
+    
+    # スプライトシート（アトラス）設定（/generate_sprite_atlas）
+    MAX_ATLAS_PADDING = 16      # フレーム間の余白の上限（ピクセル）
+    
+    # ジョブキュー設定
+    MAX_QUEUED_JOBS = 32        # 待機できる生成ジョブの上限
+    JOB_RESULT_TTL = 600        # 完了ジョブの結果を保持する秒数
+    JOB_WAIT_TIMEOUT = 300      # 同期APIが完了を待つ最大秒数
+    DEFAULT_JOB_PRIORITY = 10   # 小さいほど優先
+    MIN_JOB_PRIORITY = 0
+    MAX_JOB_PRIORITY = 100
+    MAX_GENERATION_BATCH_SIZE = 4     # 1回のパイプライン呼び出しにまとめる最大リクエスト数
+    GENERATION_BATCH_WINDOW = 0.05    # バッチにまとめるため待つ秒数
+    
+    # 生成結果キャッシュ設定（seed指定の結果と /repixelate 用の元画像を保持）
+    ENABLE_RESULT_CACHE = True
+    RESULT_CACHE_DIR = './temp/result_cache'
+    RESULT_CACHE_MEMORY_MB = 256    # メモリ段の上限
+    RESULT_CACHE_DISK_MB = 2048     # ディスク段の上限
+    RESULT_CACHE_DISK_LOW_WATER = 0.9   # 上限を超えたらこの割合まで古い順に削除
+    
+    # アニメーションフレームキャッシュ設定（tolerance・duration だけ変えた再生成でフレーム合成を省略）
+    ENABLE_FRAME_CACHE = True
+    FRAME_CACHE_MEMORY_MB = 256
+    # ストリーム生成（/generate_optimized_animation）でもキャッシュのために全フレームを作る上限。
+    # これより大きいアニメーションはキャッシュせず1枚ずつ流す
+    FRAME_CACHE_MAX_STREAM_MB = 32
+    WAVE_MAP_CACHE_MB = 64          # 波状歪みのサンプリングマップのキャッシュ上限（プロセスごと）
     
     # M2 Pro最適化設定
     ENABLE_OPTIMIZATIONS = True
@@ -54,6 +99,20 @@ class Config:
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
     TEMP_DIR = './temp'
     
+    # PNGエンコード設定（速度とファイルサイズのトレードオフ）
+    PNG_ENCODE_PROFILES = {
+        'fast': {'compress_level': 1},      # プレビュー向け（低遅延）
+        'balanced': {'compress_level': 6},  # zlib標準
+        'archival': {'optimize': True},     # 最小サイズ（最も遅い）
+    }
+    PNG_ENCODE_PROFILE = 'balanced'
+    DEFAULT_OUTPUT_MODE = 'full'    # sprite ならスプライト解像度のまま返す（表示側で拡大）
+    DEFAULT_ANIMATION_RENDER_MODE = 'full'  # sprite ならアニメーションをスプライト解像度で生成
+    
+    # バイナリ転送設定
+    BINARY_METADATA_HEADER = 'X-Pixa-Metadata'  # バイナリレスポンスのメタデータ（JSON）
+    BINARY_PARAMS_HEADER = 'X-Pixa-Params'      # 画像をボディで送るときのパラメータ（JSON）
+    
     @classmethod
     def get_device(cls) -> torch.device:
         """最適なデバイスを取得"""
@@ -109,6 +168,47 @@ class Config:
             'tolerance': max(min(tolerance, cls.MAX_TOLERANCE), cls.MIN_TOLERANCE),
             'duration': max(min(duration, cls.MAX_DURATION), cls.MIN_DURATION)
         }
+    
+    @classmethod
+    def validate_atlas_params(cls, columns, padding: int, frame_count: int) -> Dict[str, Any]:
+        """スプライトシートのパラメータの検証と正規化（columns 未指定は None = 正方形に近い列数）"""
+        return {
+            'columns': max(min(columns, frame_count), 1) if columns else None,
+            'padding': max(min(padding, cls.MAX_ATLAS_PADDING), 0)
+        }
+    
+    @classmethod
+    def validate_output_mode(cls, output_mode) -> str:
+        """出力モード（full: 元サイズに拡大 / sprite: スプライト解像度のまま）を検証"""
+        return output_mode if output_mode in ('full', 'sprite') else cls.DEFAULT_OUTPUT_MODE
+    
+    @classmethod
+    def validate_png_profile(cls, png_profile) -> str:
+        """PNGエンコードのプロファイル（fast / balanced / archival）を検証"""
+        return png_profile if isinstance(png_profile, str) and png_profile in cls.PNG_ENCODE_PROFILES else cls.PNG_ENCODE_PROFILE
+    
+    @classmethod
+    def get_png_save_kwargs(cls, png_profile) -> Dict[str, Any]:
+        """PNGエンコードのプロファイルを encode_png_bytes に渡す保存オプションに解決"""
+        return cls.PNG_ENCODE_PROFILES[cls.validate_png_profile(png_profile)]
+    
+    @classmethod
+    def validate_job_priority(cls, priority) -> Optional[int]:
+        """ジョブ優先度の検証と正規化（整数にできない値は None）"""
+        try:
+            priority = int(priority)
+        except (TypeError, ValueError, OverflowError):
+            return None
+        return max(min(priority, cls.MAX_JOB_PRIORITY), cls.MIN_JOB_PRIORITY)
+    
+    @classmethod
+    def validate_target_bytes(cls, target_bytes) -> Optional[int]:
+        """目標GIFサイズ（バイト）の検証（指定なし・不正な値は None）"""
+        try:
+            target_bytes = int(target_bytes)
+        except (TypeError, ValueError):
+            return None
+        return target_bytes if target_bytes > 0 else None
 
 
 # サポートされているアニメーションタイプ（リファクタリング後）
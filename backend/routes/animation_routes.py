@@ -1,15 +1,19 @@
 """
 Pixa - アニメーション関連API
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, jsonify, stream_with_context
+import json
 import logging
-import os
-import tempfile
 from datetime import datetime
 
 from services.animation_service import animation_service
 from services.gif_optimization_service import gif_optimization_service
-from utils.image_utils import base64_to_image, image_to_base64
+from services.animation_encoder_service import animation_encoder_service
+from services.batch_animation_service import batch_animation_service
+from utils.image_utils import bytes_to_data_url, create_sprite_atlas, encode_png_bytes, get_sprite_size
+from utils.transport_utils import (
+    parse_image_request, wants_binary, image_payload_response, multipart_response, InvalidParamsError
+)
 from config.settings import Config, ANIMATION_TYPES, GAME_ANIMATION_TYPES, EFFECT_ANIMATION_TYPES
 
 logger = logging.getLogger(__name__)
@@ -20,108 +24,84 @@ animation_routes = Blueprint('animation', __name__)
 
 @animation_routes.route('/generate_optimized_animation', methods=['POST'])
 def generate_optimized_animation():
-    """差分合成最適化GIFを生成するエンドポイント"""
+    """
+    差分合成最適化GIFを生成するエンドポイント
+    
+    画像はJSON（Base64）のほか multipart/form-data や image/* ボディでも受け付ける。
+    Accept: image/gif（または response_format: 'binary'）ならGIFをそのまま返し、
+    統計情報は X-Pixa-Metadata ヘッダーに入れる。
+    render_mode: 'sprite' ならスプライト解像度で変形してエンコード直前に1回だけ拡大し、
+    output_mode: 'sprite' なら拡大せずスプライト解像度のGIFを返す。
+    target_bytes を指定すると tolerance の代わりに、そのサイズに収まる tolerance を自動で探す
+    """
     try:
-        data = request.json
+        data, base_image, params, error_response = _parse_animation_request()
+        if error_response is not None:
+            return error_response
         
-        # 既存画像を使用する場合
-        existing_image_data = data.get('existing_image')
-        if not existing_image_data:
-            return jsonify({
-                'success': False,
-                'error': '既存画像データが必要です'
-            }), 400
+        animation_type = params['animation_type']
+        target_bytes = Config.validate_target_bytes(data.get('target_bytes'))
+        output_mode = params['output_mode']
+        render_mode = params['render_mode']
         
-        # Base64から画像を復元
-        base_image = base64_to_image(existing_image_data)
-        if base_image is None:
-            return jsonify({
-                'success': False,
-                'error': '画像データの解析に失敗しました'
-            }), 400
+        logger.info(f"Generating optimized animation: {animation_type}, frames={params['frame_count']}, render={render_mode}")
         
-        # パラメータ取得と検証
-        animation_type = data.get('animation_type', 'heartbeat')
-        if animation_type not in ANIMATION_TYPES:
-            animation_type = 'heartbeat'
-        
-        frame_count = data.get('frame_count', 8)
-        pixel_size = data.get('pixel_size', Config.DEFAULT_PIXEL_SIZE)
-        palette_size = data.get('palette_size', Config.DEFAULT_PALETTE_SIZE)
-        tolerance = data.get('tolerance', Config.DEFAULT_TOLERANCE)
-        duration_ms = data.get('duration', Config.DEFAULT_DURATION)
-        
-        # パラメータ検証
-        anim_params = Config.validate_animation_params(frame_count, 10)  # FPSは使用しない
-        opt_params = Config.validate_optimization_params(tolerance, duration_ms)
-        img_params = Config.validate_image_params(0, 0, pixel_size, palette_size)
-        
-        logger.info(f"Generating optimized animation: {animation_type}, frames={anim_params['frame_count']}")
-        
-        # アニメーションフレーム生成
-        frames = animation_service.create_animation_frames(
-            base_image=base_image,
-            animation_type=animation_type,
-            frame_count=anim_params['frame_count'],
-            pixel_size=img_params['pixel_size'],
-            palette_size=img_params['palette_size']
-        )
+        # tolerance の探索では同じフレームを何度も見るので FrameStack にまとめて生成し、
+        # それ以外は全フレームを溜めずに差分最適化・GIFエンコードまで流す
+        frames = _create_animation_frames(base_image, params, as_stack=target_bytes is not None)
+        
+        target_search = None
+        if target_bytes is not None:
+            # 目標サイズに収まる tolerance を見積もりで探し、選んだ候補だけをエンコード
+            gif_data, diff_stats, target_search = gif_optimization_service.encode_optimized_gif_for_size(
+                frames=frames,
+                target_bytes=target_bytes,
+                duration=params['duration'],
+                loop=0,
+                min_tolerance=Config.MIN_TOLERANCE,
+                max_tolerance=Config.AUTO_TOLERANCE_MAX,
+                max_encodes=Config.AUTO_TOLERANCE_MAX_ENCODES
+            )
+        else:
+            # 差分合成最適化GIFをメモリ上で生成（差分の統計も同時に集計）
+            gif_data, diff_stats = gif_optimization_service.encode_optimized_gif_stream(
+                frames=frames,
+                duration=params['duration'],
+                loop=0,
+                tolerance=params['tolerance']
+            )
         
-        if not frames:
+        if gif_data is None:
             return jsonify({
                 'success': False,
-                'error': 'アニメーションフレームの生成に失敗しました'
+                'error': 'GIFファイルの生成に失敗しました'
             }), 500
         
-        # 一時ファイルで差分合成最適化GIF生成
-        with tempfile.NamedTemporaryFile(suffix='.gif', delete=False) as temp_file:
-            temp_path = temp_file.name
+        file_size = len(gif_data)
         
-        try:
-            # 差分合成最適化GIF保存
-            success, file_size = gif_optimization_service.save_optimized_gif(
-                frames=frames,
-                output_path=temp_path,
-                duration=opt_params['duration'],
-                loop=0,
-                tolerance=opt_params['tolerance']
-            )
-            
-            if not success:
-                return jsonify({
-                    'success': False,
-                    'error': 'GIFファイルの生成に失敗しました'
-                }), 500
-            
-            # GIFファイルを読み込んでBase64エンコード
-            with open(temp_path, 'rb') as f:
-                gif_data = f.read()
-            
-            gif_base64 = f"data:image/gif;base64,{gif_data.hex()}"
-            
-            # 統計情報取得
-            stats = gif_optimization_service.get_optimization_stats(frames, opt_params['tolerance'])
-            
-            return jsonify({
-                'success': True,
-                'image': gif_base64,
-                'animation_type': animation_type,
-                'frame_count': len(frames),
-                'file_size': file_size,
-                'file_size_kb': round(file_size / 1024, 1),
-                'tolerance': opt_params['tolerance'],
-                'duration_ms': opt_params['duration'],
-                'optimization_stats': stats,
-                'optimized': True,
-                'message': f'差分合成最適化GIF生成完了 ({file_size:,} bytes)'
-            })
-            
-        finally:
-            # 一時ファイル削除
-            try:
-                os.unlink(temp_path)
-            except:
-                pass
+        # 統計情報取得
+        stats = diff_stats.to_stats()
+        
+        metadata = {
+            'success': True,
+            'animation_type': animation_type,
+            'frame_count': diff_stats.frame_count,
+            'file_size': file_size,
+            'file_size_kb': round(file_size / 1024, 1),
+            'tolerance': diff_stats.tolerance,
+            'duration_ms': params['duration'],
+            'optimization_stats': stats,
+            'optimized': True,
+            'render_mode': render_mode,
+            'output_mode': output_mode,
+            'message': f'差分合成最適化GIF生成完了 ({file_size:,} bytes)'
+        }
+        if target_search is not None:
+            metadata['target_size'] = target_search
+        if output_mode == 'sprite':
+            metadata['sprite'] = _sprite_metadata(base_image, params['pixel_size'])
+        
+        return image_payload_response(gif_data, 'GIF', metadata, data)
                 
     except Exception as e:
         logger.error(f"Optimized animation generation error: {str(e)}")
@@ -131,32 +111,346 @@ def generate_optimized_animation():
         }), 500
 
 
-@animation_routes.route('/batch_generate_optimized_animations', methods=['POST'])
-def batch_generate_optimized_animations():
-    """全種類の差分合成最適化GIFを一括生成"""
+@animation_routes.route('/generate_animation_formats', methods=['POST'])
+def generate_animation_formats():
+    """
+    同じフレームから複数形式（GIF / APNG / アニメーションWebP）を並列にエンコードするエンドポイント
+    
+    パラメータは /generate_optimized_animation と同じで、formats で形式を選ぶ
+    （省略時は Config.ANIMATION_OUTPUT_FORMATS）。形式ごとのサイズ・エンコード時間と、
+    最小サイズ・最速の形式を返す。Accept: multipart/mixed（または response_format: 'binary'）なら
+    画像を1パートずつそのまま並べ、最後のJSONパートに統計情報を入れる
+    """
     try:
-        data = request.json
-        existing_image_data = data.get('existing_image')
+        data, base_image, params, error_response = _parse_animation_request()
+        if error_response is not None:
+            return error_response
         
-        if not existing_image_data:
+        formats = data.get('formats') or Config.ANIMATION_OUTPUT_FORMATS
+        available_formats = animation_encoder_service.get_available_formats()
+        if not isinstance(formats, list) or any(format_name not in available_formats for format_name in formats):
             return jsonify({
                 'success': False,
-                'error': '既存画像データが必要です'
+                'error': f'未対応の形式が含まれています: {formats}',
+                'available_formats': available_formats
             }), 400
         
-        # Base64から画像を復元
-        base_image = base64_to_image(existing_image_data)
-        if base_image is None:
+        logger.info(f"Encoding animation formats: {params['animation_type']}, formats={formats}")
+        
+        frames = _create_animation_frames(base_image, params, as_stack=True)
+        results = animation_encoder_service.encode_formats(
+            frames=frames,
+            formats=formats,
+            duration=params['duration'],
+            loop=0,
+            tolerance=params['tolerance'],
+            max_workers=Config.ENCODER_MAX_WORKERS
+        )
+        
+        reports = {
+            format_name: {key: value for key, value in result.items() if key not in ('data', 'image_format')}
+            for format_name, result in results.items()
+        }
+        for report in reports.values():
+            if report['success']:
+                report['file_size_kb'] = round(report['file_size'] / 1024, 1)
+        
+        metadata = {
+            'success': True,
+            'animation_type': params['animation_type'],
+            'frame_count': len(frames),
+            'tolerance': params['tolerance'],
+            'duration_ms': params['duration'],
+            'render_mode': params['render_mode'],
+            'output_mode': params['output_mode'],
+            **animation_encoder_service.summarize(results)
+        }
+        if params['output_mode'] == 'sprite':
+            metadata['sprite'] = _sprite_metadata(base_image, params['pixel_size'])
+        
+        if wants_binary('multipart/mixed', data):
+            parts = [
+                (result['data'], result['mimetype'], reports[format_name])
+                for format_name, result in results.items() if result['success']
+            ]
+            return multipart_response(parts, {**metadata, 'formats': reports})
+        
+        for format_name, result in results.items():
+            if result['success']:
+                reports[format_name]['image'] = bytes_to_data_url(result['data'], result['image_format'])
+        
+        return jsonify({**metadata, 'formats': reports})
+        
+    except Exception as e:
+        logger.error(f"Animation format encoding error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'アニメーションのエンコード中にエラーが発生しました: {str(e)}'
+        }), 500
+
+
+@animation_routes.route('/generate_sprite_atlas', methods=['POST'])
+def generate_sprite_atlas():
+    """
+    アニメーションフレームを1枚のPNGテクスチャ（スプライトシート）にまとめるエンドポイント
+    
+    パラメータは /generate_optimized_animation と同じで、columns（列数、省略時は正方形に近い列数）と
+    padding（フレーム間の余白）を指定できる。各フレームの矩形と表示時間はフレーム表 atlas に入れる。
+    Accept: image/png（または response_format: 'binary'）ならPNGをそのまま返し、
+    フレーム表は X-Pixa-Metadata ヘッダーに入れる
+    """
+    try:
+        data, base_image, params, error_response = _parse_animation_request()
+        if error_response is not None:
+            return error_response
+        
+        atlas_params = Config.validate_atlas_params(
+            data.get('columns'), data.get('padding', 0), params['frame_count']
+        )
+        
+        logger.info(f"Generating sprite atlas: {params['animation_type']}, frames={params['frame_count']}")
+        
+        frames = _create_animation_frames(base_image, params, as_stack=True)
+        atlas, frame_table = create_sprite_atlas(
+            frames,
+            durations=params['duration'],
+            cols=atlas_params['columns'],
+            padding=atlas_params['padding']
+        )
+        png_save_kwargs = Config.get_png_save_kwargs(data.get('png_profile'))
+        png_data = encode_png_bytes(atlas, png_save_kwargs, params['palette_size']) if atlas is not None else None
+        
+        if png_data is None:
             return jsonify({
                 'success': False,
-                'error': '画像データの解析に失敗しました'
-            }), 400
+                'error': 'スプライトシートの生成に失敗しました'
+            }), 500
         
-        # パラメータ取得
-        pixel_size = data.get('pixel_size', Config.DEFAULT_PIXEL_SIZE)
-        palette_size = data.get('palette_size', Config.DEFAULT_PALETTE_SIZE)
+        file_size = len(png_data)
+        metadata = {
+            'success': True,
+            'animation_type': params['animation_type'],
+            'frame_count': len(frames),
+            'file_size': file_size,
+            'file_size_kb': round(file_size / 1024, 1),
+            'render_mode': params['render_mode'],
+            'output_mode': params['output_mode'],
+            'atlas': frame_table,
+            'message': f'スプライトシート生成完了 ({file_size:,} bytes)'
+        }
+        if params['output_mode'] == 'sprite':
+            metadata['sprite'] = _sprite_metadata(base_image, params['pixel_size'])
         
-        img_params = Config.validate_image_params(0, 0, pixel_size, palette_size)
+        return image_payload_response(png_data, 'PNG', metadata, data)
+        
+    except Exception as e:
+        logger.error(f"Sprite atlas generation error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'スプライトシート生成中にエラーが発生しました: {str(e)}'
+        }), 500
+
+
+def _validate_render_mode(render_mode) -> str:
+    """アニメーションの生成解像度（full / sprite）を検証"""
+    return render_mode if render_mode in ('full', 'sprite') else Config.DEFAULT_ANIMATION_RENDER_MODE
+
+
+def _parse_animation_request():
+    """単体アニメーション生成リクエストを解析し、(パラメータ, ベース画像, 検証済みパラメータ, エラーレスポンス) を返す"""
+    try:
+        data, base_image, has_image = parse_image_request()
+    except InvalidParamsError as e:
+        return {}, None, None, (jsonify({
+            'success': False,
+            'error': f'パラメータが不正です: {str(e)}'
+        }), 400)
+    
+    # 既存画像を使用する場合
+    if not has_image:
+        return data, None, None, (jsonify({
+            'success': False,
+            'error': '既存画像データが必要です'
+        }), 400)
+    
+    if base_image is None:
+        return data, None, None, (jsonify({
+            'success': False,
+            'error': '画像データの解析に失敗しました'
+        }), 400)
+    
+    # パラメータ取得と検証
+    animation_type = data.get('animation_type', 'heartbeat')
+    if animation_type not in ANIMATION_TYPES:
+        animation_type = 'heartbeat'
+    
+    frame_count = data.get('frame_count', 8)
+    pixel_size = data.get('pixel_size', Config.DEFAULT_PIXEL_SIZE)
+    palette_size = data.get('palette_size', Config.DEFAULT_PALETTE_SIZE)
+    tolerance = data.get('tolerance', Config.DEFAULT_TOLERANCE)
+    duration_ms = data.get('duration', Config.DEFAULT_DURATION)
+    
+    anim_params = Config.validate_animation_params(frame_count, 10)  # FPSは使用しない
+    opt_params = Config.validate_optimization_params(tolerance, duration_ms)
+    img_params = Config.validate_image_params(0, 0, pixel_size, palette_size)
+    output_mode = Config.validate_output_mode(data.get('output_mode'))
+    
+    return data, base_image, {
+        'animation_type': animation_type,
+        'frame_count': anim_params['frame_count'],
+        'pixel_size': img_params['pixel_size'],
+        'palette_size': img_params['palette_size'],
+        'tolerance': opt_params['tolerance'],
+        'duration': opt_params['duration'],
+        'output_mode': output_mode,
+        'render_mode': 'sprite' if output_mode == 'sprite' else _validate_render_mode(data.get('render_mode'))
+    }, None
+
+
+def _create_animation_frames(base_image, params: dict, as_stack: bool = False):
+    """
+    検証済みパラメータでアニメーションフレームを生成
+    
+    フレームキャッシュが有効ならキャッシュの FrameStack を使う。as_stack が False なら
+    フレームを1枚ずつ返すイテレータのままにして、エンコードまで全フレームを溜めずに流す
+    （キャッシュ有効時も、キャッシュになく Config.FRAME_CACHE_MAX_STREAM_MB を超える
+    アニメーションは流す）
+    """
+    frame_params = {
+        'base_image': base_image,
+        'animation_type': params['animation_type'],
+        'frame_count': params['frame_count'],
+        'pixel_size': params['pixel_size'],
+        'palette_size': params['palette_size'],
+        'sprite_resolution': params['render_mode'] == 'sprite'
+    }
+    if Config.ENABLE_FRAME_CACHE and as_stack:
+        # 同じ画像・同じ生成パラメータのフレームはキャッシュから再利用
+        # （tolerance・duration だけを変えた再リクエストではフレームを合成し直さない）
+        frames = animation_service.get_cached_frame_stack(**frame_params)
+    elif Config.ENABLE_FRAME_CACHE:
+        frames = animation_service.iter_cached_animation_frames(**frame_params)
+    elif as_stack:
+        frames = animation_service.create_frame_stack(**frame_params)
+    else:
+        frames = animation_service.iter_animation_frames(**frame_params)
+    
+    if params['render_mode'] == 'sprite' and params['output_mode'] == 'full':
+        # 変形はスプライト解像度で済ませ、エンコード直前に1回だけ拡大
+        if as_stack:
+            frames = animation_service.upscale_frames(frames, base_image.size)
+        else:
+            frames = animation_service.iter_upscaled_frames(frames, base_image.size)
+    
+    return frames
+
+
+def _sprite_metadata(base_image, pixel_size: int) -> dict:
+    """output_mode: 'sprite' のレスポンスに付けるスプライト解像度と表示サイズ"""
+    sprite_size = get_sprite_size(base_image.size, pixel_size)
+    return {
+        'width': sprite_size[0],
+        'height': sprite_size[1],
+        'scale': pixel_size,
+        'display_width': base_image.width,
+        'display_height': base_image.height
+    }
+
+
+def _parse_batch_request():
+    """一括生成リクエストを解析し、(パラメータ, ベース画像, 画像パラメータ, エラーレスポンス) を返す"""
+    try:
+        data, base_image, has_image = parse_image_request()
+    except InvalidParamsError as e:
+        return {}, None, None, (jsonify({
+            'success': False,
+            'error': f'パラメータが不正です: {str(e)}'
+        }), 400)
+    
+    if not has_image:
+        return data, None, None, (jsonify({
+            'success': False,
+            'error': '既存画像データが必要です'
+        }), 400)
+    
+    if base_image is None:
+        return data, None, None, (jsonify({
+            'success': False,
+            'error': '画像データの解析に失敗しました'
+        }), 400)
+    
+    # パラメータ取得
+    pixel_size = data.get('pixel_size', Config.DEFAULT_PIXEL_SIZE)
+    palette_size = data.get('palette_size', Config.DEFAULT_PALETTE_SIZE)
+    
+    img_params = Config.validate_image_params(0, 0, pixel_size, palette_size)
+    img_params['render_mode'] = _validate_render_mode(data.get('render_mode'))
+    return data, base_image, img_params, None
+
+
+def _iter_batch_results(base_image, img_params: dict):
+    """全アニメーションを並列生成し、完成した順に (アニメーション種類, GIFバイト列を含む結果) を返す"""
+    return batch_animation_service.iter_animation_gifs(
+        base_image=base_image,
+        animation_types=ANIMATION_TYPES,
+        frame_count=Config.BATCH_FRAME_COUNT,
+        pixel_size=img_params['pixel_size'],
+        palette_size=img_params['palette_size'],
+        duration=100,
+        tolerance=3,
+        max_workers=Config.BATCH_MAX_WORKERS,
+        render_mode=img_params['render_mode']
+    )
+
+
+def _batch_entry(result: dict) -> dict:
+    """一括生成の結果1件をJSONレスポンス用に変換"""
+    if not result['success']:
+        return {
+            'success': False,
+            'error': result['error']
+        }
+    
+    file_size = result['file_size']
+    
+    return {
+        'success': True,
+        'image': bytes_to_data_url(result['gif_data'], 'GIF'),
+        'file_size': file_size,
+        'file_size_kb': round(file_size / 1024, 1)
+    }
+
+
+def _batch_statistics(success_count: int, total_size: int) -> dict:
+    """一括生成の統計情報"""
+    return {
+        'success_count': success_count,
+        'total_count': len(ANIMATION_TYPES),
+        'total_size': total_size,
+        'total_size_kb': round(total_size / 1024, 1),
+        'average_size_kb': round(total_size / 1024 / success_count, 1) if success_count > 0 else 0
+    }
+
+
+def _format_stream_event(event: str, payload: dict, stream_format: str) -> str:
+    """ストリーミング用に1件分をNDJSON行またはSSEイベントに整形"""
+    if stream_format == 'sse':
+        return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    return json.dumps({'event': event, **payload}, ensure_ascii=False) + '\n'
+
+
+@animation_routes.route('/batch_generate_optimized_animations', methods=['POST'])
+def batch_generate_optimized_animations():
+    """
+    全種類の差分合成最適化GIFを一括生成
+    
+    Accept: multipart/mixed（または response_format: 'binary'）なら、GIFを1パートずつ
+    そのまま並べた multipart/mixed で返し、最後のJSONパートに統計情報を入れる
+    """
+    try:
+        data, base_image, img_params, error_response = _parse_batch_request()
+        if error_response is not None:
+            return error_response
         
         logger.info(f"Batch generating optimized animations")
         
@@ -165,81 +459,39 @@ def batch_generate_optimized_animations():
         total_size = 0
         success_count = 0
         
-        for anim_type in ANIMATION_TYPES:
-            try:
-                # アニメーションフレーム生成
-                frames = animation_service.create_animation_frames(
-                    base_image=base_image,
-                    animation_type=anim_type,
-                    frame_count=16,  # 一括生成では固定
-                    pixel_size=img_params['pixel_size'],
-                    palette_size=img_params['palette_size']
-                )
-                
-                if frames:
-                    # 一時ファイルで差分合成最適化GIF生成
-                    with tempfile.NamedTemporaryFile(suffix='.gif', delete=False) as temp_file:
-                        temp_path = temp_file.name
-                    
-                    try:
-                        success, file_size = gif_optimization_service.save_optimized_gif(
-                            frames=frames,
-                            output_path=temp_path,
-                            duration=100,
-                            loop=0,
-                            tolerance=3
-                        )
-                        
-                        if success:
-                            with open(temp_path, 'rb') as f:
-                                gif_data = f.read()
-                            
-                            gif_base64 = base64.b64encode(gif_data).decode('utf-8')
-                            gif_base64 = f"data:image/gif;base64,{gif_base64}"
-                            
-                            batch_results[anim_type] = {
-                                'success': True,
-                                'image': gif_base64,
-                                'file_size': file_size,
-                                'file_size_kb': round(file_size / 1024, 1)
-                            }
-                            
-                            total_size += file_size
-                            success_count += 1
-                        else:
-                            batch_results[anim_type] = {
-                                'success': False,
-                                'error': 'GIF生成に失敗しました'
-                            }
-                    
-                    finally:
-                        try:
-                            os.unlink(temp_path)
-                        except:
-                            pass
-                else:
-                    batch_results[anim_type] = {
-                        'success': False,
-                        'error': 'フレーム生成に失敗しました'
-                    }
-                    
-            except Exception as e:
-                batch_results[anim_type] = {
-                    'success': False,
-                    'error': str(e)
-                }
+        # アニメーション種類ごとにワーカープロセスで並列生成（完成順に受け取る）
+        for anim_type, result in _iter_batch_results(base_image, img_params):
+            batch_results[anim_type] = result
+            if result['success']:
+                total_size += result['file_size']
+                success_count += 1
+        
+        statistics = _batch_statistics(success_count, total_size)
+        message = f'{success_count}/{len(ANIMATION_TYPES)} アニメーション生成完了'
+        
+        # レスポンスはアニメーション種類の定義順に並べる
+        if wants_binary('multipart/mixed', data):
+            parts = [
+                (batch_results[anim_type]['gif_data'], 'image/gif',
+                 {'animation_type': anim_type, 'file_size': batch_results[anim_type]['file_size']})
+                for anim_type in ANIMATION_TYPES if batch_results[anim_type]['success']
+            ]
+            errors = {
+                anim_type: batch_results[anim_type]['error']
+                for anim_type in ANIMATION_TYPES if not batch_results[anim_type]['success']
+            }
+            return multipart_response(parts, {
+                'success': True,
+                'statistics': statistics,
+                'errors': errors,
+                'message': message
+            })
         
         return jsonify({
             'success': True,
-            'animations': batch_results,
-            'statistics': {
-                'success_count': success_count,
-                'total_count': len(ANIMATION_TYPES),
-                'total_size': total_size,
-                'total_size_kb': round(total_size / 1024, 1),
-                'average_size_kb': round(total_size / 1024 / success_count, 1) if success_count > 0 else 0
-            },
-            'message': f'{success_count}/{len(ANIMATION_TYPES)} アニメーション生成完了'
+            'animations': {anim_type: _batch_entry(batch_results[anim_type]) for anim_type in ANIMATION_TYPES},
+            'statistics': statistics,
+            'message': message
         })
         
     except Exception as e:
@@ -250,6 +502,62 @@ def batch_generate_optimized_animations():
         }), 500
 
 
+@animation_routes.route('/batch_generate_optimized_animations/stream', methods=['POST'])
+def stream_batch_generate_optimized_animations():
+    """
+    全種類の差分合成最適化GIFを完成した順にストリーミング
+    
+    format が 'sse' ならServer-Sent Events、それ以外はNDJSON（1行1アニメーション）。
+    最後に統計情報を含む complete イベントを送る
+    """
+    try:
+        data, base_image, img_params, error_response = _parse_batch_request()
+        if error_response is not None:
+            return error_response
+        
+        stream_format = 'sse' if data.get('format') == 'sse' else 'ndjson'
+        logger.info(f"Streaming batch optimized animations ({stream_format})")
+        
+        def generate():
+            total_size = 0
+            success_count = 0
+            
+            try:
+                for anim_type, result in _iter_batch_results(base_image, img_params):
+                    entry = _batch_entry(result)
+                    if entry['success']:
+                        total_size += entry['file_size']
+                        success_count += 1
+                    yield _format_stream_event('animation', {'animation_type': anim_type, **entry}, stream_format)
+                
+                yield _format_stream_event('complete', {
+                    'success': True,
+                    'statistics': _batch_statistics(success_count, total_size),
+                    'message': f'{success_count}/{len(ANIMATION_TYPES)} アニメーション生成完了'
+                }, stream_format)
+            
+            except Exception as e:
+                logger.error(f"Batch animation streaming error: {str(e)}")
+                yield _format_stream_event('error', {
+                    'success': False,
+                    'error': f'一括最適化GIF生成中にエラーが発生しました: {str(e)}'
+                }, stream_format)
+        
+        mimetype = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+        return Response(
+            stream_with_context(generate()),
+            mimetype=mimetype,
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        
+    except Exception as e:
+        logger.error(f"Batch optimized animation streaming error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'一括最適化GIF生成中にエラーが発生しました: {str(e)}'
+        }), 500
+
+
 @animation_routes.route('/animation_types', methods=['GET'])
 def get_animation_types():
     """利用可能なアニメーションタイプ一覧"""
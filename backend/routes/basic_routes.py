@@ -2,11 +2,21 @@
 Pixa - 基本画像生成API
 """
 from flask import Blueprint, request, jsonify
+from typing import Optional
+import base64
 import logging
+import re
+import uuid
 
 from services.ai_service import ai_service
 from services.animation_service import animation_service
-from utils.image_utils import apply_pixel_art_processing, image_to_base64
+from services.job_service import generation_job_service, Job, QueueFullError
+from services.result_cache_service import result_cache, frame_cache, make_cache_key
+from utils.image_utils import (
+    apply_pixel_art_processing, encode_png_bytes, bytes_to_data_url, decode_image_bytes,
+    get_sprite_size
+)
+from utils.transport_utils import wants_binary, binary_response
 from config.settings import Config
 
 logger = logging.getLogger(__name__)
@@ -15,9 +25,276 @@ logger = logging.getLogger(__name__)
 basic_routes = Blueprint('basic', __name__)
 
 
+class GenerationError(Exception):
+    """画像生成ジョブの失敗"""
+
+
+def run_generation(prompt: str,
+                   model_id: str,
+                   negative_prompt: str,
+                   img_params: dict,
+                   num_inference_steps: int,
+                   guidance_scale: float,
+                   seed=None,
+                   progress_callback=None) -> dict:
+    """画像生成ジョブ本体（ジョブキューのワーカーで実行）"""
+    raw_key = _raw_cache_key(prompt, model_id, negative_prompt, img_params,
+                             num_inference_steps, guidance_scale, seed)
+    
+    # 同じ条件のジョブが先に完了していればキャッシュから返す
+    cached_result = _lookup_cached_result(raw_key, prompt, model_id, img_params)
+    if cached_result is not None:
+        return cached_result
+    
+    if not ai_service.initialize_pipeline(model_id):
+        raise GenerationError('モデルの初期化に失敗しました')
+    
+    logger.info(f"Generating image: prompt='{prompt[:50]}...', size={img_params['width']}x{img_params['height']}")
+    
+    # AI画像生成
+    generated_image = ai_service.generate_image(
+        prompt=prompt,
+        negative_prompt=negative_prompt,
+        width=img_params['width'],
+        height=img_params['height'],
+        num_inference_steps=num_inference_steps,
+        guidance_scale=guidance_scale,
+        seed=seed,
+        progress_callback=progress_callback
+    )
+    
+    if generated_image is None:
+        raise GenerationError('画像生成に失敗しました')
+    
+    image_handle = raw_key or _new_image_handle()
+    _store_raw_image(image_handle, generated_image)
+    return _build_generation_result(generated_image, prompt, model_id, img_params, image_handle)
+
+
+def run_generation_batch(jobs_kwargs: list, progress_callback=None) -> list:
+    """
+    条件（モデル・サイズ・ステップ数・ガイダンス）が同じ複数の生成ジョブを
+    1回のパイプライン呼び出しで実行し、ジョブごとの結果（または例外）を返す
+    """
+    first = jobs_kwargs[0]
+    if not ai_service.initialize_pipeline(first['model_id']):
+        raise GenerationError('モデルの初期化に失敗しました')
+    
+    logger.info(f"Generating {len(jobs_kwargs)} images in one batch, size={first['img_params']['width']}x{first['img_params']['height']}")
+    
+    generated_images = ai_service.generate_images(
+        prompts=[kwargs['prompt'] for kwargs in jobs_kwargs],
+        negative_prompts=[kwargs['negative_prompt'] for kwargs in jobs_kwargs],
+        seeds=[kwargs['seed'] for kwargs in jobs_kwargs],
+        width=first['img_params']['width'],
+        height=first['img_params']['height'],
+        num_inference_steps=first['num_inference_steps'],
+        guidance_scale=first['guidance_scale'],
+        progress_callback=progress_callback
+    )
+    
+    if generated_images is None:
+        raise GenerationError('画像生成に失敗しました')
+    
+    results = []
+    for kwargs, generated_image in zip(jobs_kwargs, generated_images):
+        try:
+            image_handle = _raw_cache_key(**kwargs) or _new_image_handle()
+            _store_raw_image(image_handle, generated_image)
+            results.append(_build_generation_result(
+                generated_image, kwargs['prompt'], kwargs['model_id'], kwargs['img_params'], image_handle
+            ))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def _raw_cache_key(prompt: str,
+                   model_id: str,
+                   negative_prompt: str,
+                   img_params: dict,
+                   num_inference_steps: int,
+                   guidance_scale: float,
+                   seed=None) -> Optional[str]:
+    """
+    拡散モデル出力のキャッシュキー（seed未指定は結果が毎回変わるのでキャッシュしない）
+    """
+    if seed is None or not Config.ENABLE_RESULT_CACHE:
+        return None
+    
+    return make_cache_key(
+        kind='raw',
+        model_id=model_id,
+        prompt=prompt,
+        negative_prompt=negative_prompt,
+        width=img_params['width'],
+        height=img_params['height'],
+        steps=num_inference_steps,
+        guidance_scale=guidance_scale,
+        seed=seed
+    )
+
+
+def _new_image_handle() -> str:
+    """seed未指定の生成結果用のハンドル（キャッシュキーと同じ16進文字列）"""
+    return uuid.uuid4().hex
+
+
+def _is_valid_image_handle(image_handle) -> bool:
+    """クライアントから受け取ったハンドルの形式チェック（キャッシュのパスに使うため）"""
+    return isinstance(image_handle, str) and re.fullmatch(r'[0-9a-f]{32,64}', image_handle) is not None
+
+
+def _processed_cache_key(raw_key: str, img_params: dict) -> str:
+    """ピクセルアート処理後のPNGのキャッシュキー"""
+    return make_cache_key(
+        kind='pixel_art',
+        raw_key=raw_key,
+        pixel_size=img_params['pixel_size'],
+        palette_size=img_params['palette_size'],
+        png_profile=img_params['png_profile'],
+        output_mode=img_params['output_mode']
+    )
+
+
+def _sprite_info(img_params: dict) -> dict:
+    """sprite 出力の解像度と、表示時に拡大する倍率・サイズ"""
+    sprite_width, sprite_height = get_sprite_size((img_params['width'], img_params['height']), img_params['pixel_size'])
+    return {
+        'width': sprite_width,
+        'height': sprite_height,
+        'scale': img_params['pixel_size'],
+        'display_width': img_params['width'],
+        'display_height': img_params['height']
+    }
+
+
+def _store_raw_image(image_handle: str, generated_image):
+    """拡散モデル出力を可逆PNGでキャッシュ（pixel_size等だけ変えた再処理用）"""
+    raw_bytes = encode_png_bytes(generated_image, Config.get_png_save_kwargs('fast'))
+    if raw_bytes is not None:
+        result_cache.put(image_handle, raw_bytes)
+
+
+def _load_raw_image(image_handle: str):
+    """キャッシュから拡散モデル出力を取り出す（なければ None）"""
+    raw_bytes = result_cache.get(image_handle)
+    if raw_bytes is None:
+        return None
+    return decode_image_bytes(raw_bytes)
+
+
+def _lookup_cached_result(raw_key: Optional[str], prompt: str, model_id: str, img_params: dict) -> Optional[dict]:
+    """
+    キャッシュから結果を作る
+    
+    処理後PNGがあればそのまま、拡散モデル出力だけあればピクセルアート処理のみやり直す
+    """
+    if raw_key is None:
+        return None
+    
+    processed_bytes = result_cache.get(_processed_cache_key(raw_key, img_params))
+    if processed_bytes is not None:
+        result = _generation_response(bytes_to_data_url(processed_bytes), prompt, model_id, img_params, raw_key)
+        result['cached'] = True
+        return result
+    
+    generated_image = _load_raw_image(raw_key)
+    if generated_image is None:
+        return None
+    
+    result = _build_generation_result(generated_image, prompt, model_id, img_params, raw_key)
+    result['cached'] = True
+    return result
+
+
+def _build_generation_result(generated_image,
+                             prompt: str,
+                             model_id: str,
+                             img_params: dict,
+                             image_handle: str) -> dict:
+    """生成画像にピクセルアート処理をかけてレスポンス用の結果を作る"""
+    image_base64 = _render_pixel_art(generated_image, img_params, image_handle)
+    return _generation_response(image_base64, prompt, model_id, img_params, image_handle)
+
+
+def _render_pixel_art(generated_image, img_params: dict, image_handle: str) -> str:
+    """ピクセルアート処理とPNGエンコードを行い、結果をキャッシュしてデータURLを返す"""
+    # ピクセルアート処理
+    pixel_art_image = apply_pixel_art_processing(
+        generated_image, 
+        img_params['pixel_size'], 
+        img_params['palette_size'],
+        native_resolution=img_params['output_mode'] == 'sprite'
+    )
+    
+    # PNGエンコード（減色済みなのでPモードで保存される）
+    image_bytes = encode_png_bytes(
+        pixel_art_image, Config.get_png_save_kwargs(img_params['png_profile']), img_params['palette_size']
+    )
+    if image_bytes is None:
+        raise GenerationError('画像エンコードに失敗しました')
+    
+    result_cache.put(_processed_cache_key(image_handle, img_params), image_bytes)
+    return bytes_to_data_url(image_bytes)
+
+
+def _generation_response(image_base64: str,
+                         prompt: str,
+                         model_id: str,
+                         img_params: dict,
+                         image_handle: str) -> dict:
+    """画像生成のレスポンス（image_handle は /repixelate で再処理するときに使う）"""
+    response = {
+        'success': True,
+        'image': image_base64,
+        'image_handle': image_handle,
+        'parameters': {
+            'prompt': prompt,
+            'model_id': model_id,
+            'width': img_params['width'],
+            'height': img_params['height'],
+            'pixel_size': img_params['pixel_size'],
+            'palette_size': img_params['palette_size'],
+            'png_profile': img_params['png_profile'],
+            'output_mode': img_params['output_mode']
+        },
+        'message': '画像生成が完了しました'
+    }
+    if img_params['output_mode'] == 'sprite':
+        response['sprite'] = _sprite_info(img_params)
+    return response
+
+
+def _image_result_response(result: dict, data: dict, **extra):
+    """
+    画像生成結果のレスポンス
+    
+    Accept: image/png（または response_format: 'binary'）ならPNGをそのまま返し、
+    画像以外の項目は X-Pixa-Metadata ヘッダーに入れる。それ以外はJSON
+    """
+    if not wants_binary('image/png', data):
+        return jsonify({**result, **extra})
+    
+    # 処理後PNGはキャッシュにあるので、データURLをデコードし直さずに済ませる
+    parameters = result['parameters']
+    image_bytes = result_cache.get(_processed_cache_key(result['image_handle'], parameters))
+    if image_bytes is None:
+        image_bytes = base64.b64decode(result['image'].split(',', 1)[1])
+    
+    metadata = {key: value for key, value in result.items() if key != 'image'}
+    return binary_response(image_bytes, 'image/png', {**metadata, **extra})
+
+
 @basic_routes.route('/generate', methods=['POST'])
 def generate_image():
-    """基本的な画像生成エンドポイント"""
+    """
+    基本的な画像生成エンドポイント
+    
+    生成はジョブキューで1件ずつ実行される。async が true ならジョブIDをすぐに返し（202）、
+    そうでなければ完了まで待って結果を返す。seed 指定で同じ条件の結果がキャッシュに
+    あれば、キューを通さずにすぐ返す。Accept: image/png ならPNGをそのまま返す
+    """
     try:
         data = request.json
         
@@ -26,12 +303,8 @@ def generate_image():
         if not prompt.strip():
             return jsonify({'success': False, 'error': 'プロンプトが必要です'}), 400
         
-        # モデルIDを取得して初期化
-        model_id = data.get('model_id', Config.DEFAULT_MODEL_ID)
-        if not ai_service.initialize_pipeline(model_id):
-            return jsonify({'success': False, 'error': 'モデルの初期化に失敗しました'}), 500
-        
         # パラメータの検証と取得
+        model_id = data.get('model_id', Config.DEFAULT_MODEL_ID)
         negative_prompt = data.get('negative_prompt', '')
         width = data.get('width', Config.DEFAULT_IMAGE_SIZE)
         height = data.get('height', Config.DEFAULT_IMAGE_SIZE) 
@@ -40,57 +313,147 @@ def generate_image():
         num_inference_steps = data.get('steps', 20)
         guidance_scale = data.get('guidance_scale', 7.5)
         seed = data.get('seed', None)
+        priority = Config.validate_job_priority(data.get('priority', Config.DEFAULT_JOB_PRIORITY))
+        if priority is None:
+            return jsonify({'success': False, 'error': 'priority は整数で指定してください'}), 400
         
         # パラメータ検証
         img_params = Config.validate_image_params(width, height, pixel_size, palette_size)
+        img_params['png_profile'] = Config.validate_png_profile(data.get('png_profile'))
+        img_params['output_mode'] = Config.validate_output_mode(data.get('output_mode'))
         
-        logger.info(f"Generating image: prompt='{prompt[:50]}...', size={img_params['width']}x{img_params['height']}")
-        
-        # AI画像生成
-        generated_image = ai_service.generate_image(
-            prompt=prompt,
-            negative_prompt=negative_prompt,
-            width=img_params['width'],
-            height=img_params['height'],
-            num_inference_steps=num_inference_steps,
-            guidance_scale=guidance_scale,
-            seed=seed
-        )
+        # キャッシュ確認（seed指定時のみ）
+        raw_key = _raw_cache_key(prompt, model_id, negative_prompt, img_params,
+                                 num_inference_steps, guidance_scale, seed)
+        cached_result = _lookup_cached_result(raw_key, prompt, model_id, img_params)
+        if cached_result is not None:
+            return _image_result_response(cached_result, data)
+        
+        # ジョブ登録
+        try:
+            job = generation_job_service.submit(
+                run_generation,
+                priority=priority,
+                # 同じ条件のリクエストは1回のパイプライン呼び出しにまとめる
+                batch_key=(model_id, img_params['width'], img_params['height'],
+                           num_inference_steps, guidance_scale),
+                batch_func=run_generation_batch,
+                prompt=prompt,
+                model_id=model_id,
+                negative_prompt=negative_prompt,
+                img_params=img_params,
+                num_inference_steps=num_inference_steps,
+                guidance_scale=guidance_scale,
+                seed=seed
+            )
+        except QueueFullError:
+            return jsonify({'success': False, 'error': '生成キューが混雑しています。しばらくしてから再試行してください'}), 429
         
+        if data.get('async', False):
+            return jsonify(_job_response(job)), 202
+        
+        # 同期モード: 完了まで待機
+        if not job.wait(Config.JOB_WAIT_TIMEOUT):
+            return jsonify(_job_response(job)), 202
+        
+        if job.status == Job.FAILED:
+            return jsonify({'success': False, 'error': job.error, 'job_id': job.id}), 500
+        
+        return _image_result_response(job.result, data, job_id=job.id)
+        
+    except Exception as e:
+        logger.error(f"Image generation error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'画像生成中にエラーが発生しました: {str(e)}'
+        }), 500
+
+
+@basic_routes.route('/repixelate', methods=['POST'])
+def repixelate_image():
+    """
+    生成済み画像のピクセルアート処理だけをやり直すエンドポイント
+    
+    /generate が返した image_handle と新しい pixel_size / palette_size を受け取り、
+    キャッシュしてある拡散モデル出力から再処理する（拡散モデルは実行しない）
+    """
+    try:
+        data = request.json
+        
+        image_handle = data.get('image_handle')
+        if not _is_valid_image_handle(image_handle):
+            return jsonify({'success': False, 'error': 'image_handle が不正です'}), 400
+        
+        generated_image = _load_raw_image(image_handle)
         if generated_image is None:
-            return jsonify({'success': False, 'error': '画像生成に失敗しました'}), 500
+            return jsonify({'success': False, 'error': '画像が見つかりません（キャッシュ期限切れ）。再生成してください'}), 404
         
-        # ピクセルアート処理
-        pixel_art_image = apply_pixel_art_processing(
-            generated_image, 
-            img_params['pixel_size'], 
-            img_params['palette_size']
+        img_params = Config.validate_image_params(
+            generated_image.width,
+            generated_image.height,
+            data.get('pixel_size', Config.DEFAULT_PIXEL_SIZE),
+            data.get('palette_size', Config.DEFAULT_PALETTE_SIZE)
         )
+        img_params['png_profile'] = Config.validate_png_profile(data.get('png_profile'))
+        img_params['output_mode'] = Config.validate_output_mode(data.get('output_mode'))
         
-        # Base64エンコード
-        image_base64 = image_to_base64(pixel_art_image)
-        if image_base64 is None:
-            return jsonify({'success': False, 'error': '画像エンコードに失敗しました'}), 500
+        processed_bytes = result_cache.get(_processed_cache_key(image_handle, img_params))
+        if processed_bytes is not None:
+            image_base64 = bytes_to_data_url(processed_bytes)
+        else:
+            image_base64 = _render_pixel_art(generated_image, img_params, image_handle)
         
-        return jsonify({
+        result = {
             'success': True,
             'image': image_base64,
-            'parameters': {
-                'prompt': prompt,
-                'model_id': model_id,
-                'width': img_params['width'],
-                'height': img_params['height'],
-                'pixel_size': img_params['pixel_size'],
-                'palette_size': img_params['palette_size']
-            },
-            'message': '画像生成が完了しました'
-        })
+            'image_handle': image_handle,
+            'parameters': img_params,
+            'message': 'ピクセルアート処理をやり直しました'
+        }
+        if img_params['output_mode'] == 'sprite':
+            result['sprite'] = _sprite_info(img_params)
+        
+        return _image_result_response(result, data)
         
     except Exception as e:
-        logger.error(f"Image generation error: {str(e)}")
+        logger.error(f"Repixelate error: {str(e)}")
         return jsonify({
             'success': False,
-            'error': f'画像生成中にエラーが発生しました: {str(e)}'
+            'error': f'再処理中にエラーが発生しました: {str(e)}'
+        }), 500
+
+
+def _job_response(job: Job) -> dict:
+    """ジョブ状態のレスポンス"""
+    return {
+        'success': job.status != Job.FAILED,
+        **job.to_dict(queue_position=generation_job_service.get_queue_position(job))
+    }
+
+
+@basic_routes.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """
+    生成ジョブの状態・進捗・結果を取得
+    
+    ?wait=秒数 を付けると、完了するかその秒数が経つまで待ってから返す（ロングポーリング）
+    """
+    try:
+        job = generation_job_service.get_job(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'ジョブが見つかりません'}), 404
+        
+        wait = request.args.get('wait', 0, type=float)
+        if wait > 0:
+            job.wait(min(wait, Config.JOB_WAIT_TIMEOUT))
+        
+        return jsonify(_job_response(job))
+        
+    except Exception as e:
+        logger.error(f"Job status error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
         }), 500
 
 
@@ -104,6 +467,9 @@ def health_check():
             'status': 'healthy',
             'service': 'Pixa AI Pixel Art Generator',
             'device_info': device_info,
+            'job_queue': generation_job_service.get_stats(),
+            'result_cache': result_cache.get_stats(),
+            'frame_cache': frame_cache.get_stats(),
             'config': {
                 'default_model': Config.DEFAULT_MODEL_ID,
                 'max_image_size': Config.MAX_IMAGE_SIZE,
@@ -27,8 +27,8 @@ def create_app(config_class=Config):
     """Flaskアプリケーションファクトリ"""
     app = Flask(__name__, static_folder='../frontend', static_url_path='')
     
-    # CORS設定
-    CORS(app)
+    # CORS設定（バイナリレスポンスのメタデータヘッダーをブラウザから読めるようにする）
+    CORS(app, expose_headers=[config_class.BINARY_METADATA_HEADER])
     
     # 設定の適用
     app.config.from_object(config_class)
@@ -2,11 +2,17 @@
 Pixa - AI画像生成サービス
 """
 import torch
+import inspect
+import hashlib
 import logging
-from typing import Optional, Dict, Any, List
+import os
+from typing import Optional, Dict, Any, List, Callable
 from PIL import Image
 from diffusers import StableDiffusionPipeline, StableDiffusionXLPipeline, DiffusionPipeline
+from huggingface_hub import HfApi, snapshot_download
+from huggingface_hub.utils import LocalEntryNotFoundError
 import gc
+from collections import OrderedDict
 
 from config.settings import Config
 
@@ -22,6 +28,12 @@ class AIService:
         self.current_model_id = None
         self.dtype = None
         
+        # 読み込み済みパイプラインのLRUキャッシュ（末尾が最近使用）
+        self.pipelines: "OrderedDict[str, DiffusionPipeline]" = OrderedDict()
+        # モデルごとの共有候補コンポーネントの指紋（{model_id: {コンポーネント名: 指紋}}）
+        # パイプラインを破棄しても保持し、再読み込みのたびに計算・問い合わせしない
+        self.component_fingerprints: Dict[str, Dict[str, Optional[str]]] = {}
+        
         # 最適化設定を適用
         Config.setup_optimizations()
     
@@ -36,10 +48,9 @@ class AIService:
             
             logger.info(f"Using device: {self.device}, dtype: {self.dtype}")
             
-            # モデルが変更された場合のみ読み込み
+            # モデルが変更された場合のみ切り替え（キャッシュになければ読み込み）
             if self.current_model_id != model_id or self.pipeline is None:
-                self._load_pipeline(model_id)
-                self.current_model_id = model_id
+                self._activate_pipeline(model_id)
             
             return True
             
@@ -47,13 +58,28 @@ class AIService:
             logger.error(f"Pipeline initialization failed: {str(e)}")
             return False
     
-    def _load_pipeline(self, model_id: str):
-        """パイプラインを読み込み"""
-        # 既存パイプラインのクリア
-        if self.pipeline is not None:
-            del self.pipeline
+    def _activate_pipeline(self, model_id: str):
+        """指定モデルをアクティブにする（使っていないパイプラインはCPUへ退避）"""
+        # 現在のパイプラインはCPUへ退避（破棄はしない）
+        if self.pipeline is not None and self.device != torch.device("cpu"):
+            self.pipeline.to("cpu")
             self._clear_memory()
         
+        if model_id in self.pipelines:
+            logger.info(f"Reusing cached model: {model_id}")
+            pipeline = self.pipelines[model_id]
+            self.pipelines.move_to_end(model_id)
+        else:
+            pipeline = self._load_pipeline(model_id)
+            self.pipelines[model_id] = pipeline
+        
+        self.pipeline = pipeline.to(self.device)
+        self.current_model_id = model_id
+        
+        self._evict_pipelines()
+    
+    def _load_pipeline(self, model_id: str) -> DiffusionPipeline:
+        """パイプラインを読み込み"""
         logger.info(f"Loading model: {model_id}")
         
         # SDXL判定
@@ -61,27 +87,180 @@ class AIService:
         
         # パイプライン読み込み
         if is_sdxl:
-            self.pipeline = StableDiffusionXLPipeline.from_pretrained(
+            pipeline = StableDiffusionXLPipeline.from_pretrained(
                 model_id,
                 torch_dtype=self.dtype,
                 use_safetensors=True,
                 variant="fp16" if self.dtype == torch.float16 else None
             )
         else:
-            self.pipeline = StableDiffusionPipeline.from_pretrained(
+            # 読み込み済みのパイプラインと中身が同じコンポーネントだけ共有
+            pipeline = StableDiffusionPipeline.from_pretrained(
                 model_id,
                 torch_dtype=self.dtype,
                 use_safetensors=True,
-                variant="fp16" if self.dtype == torch.float16 else None
+                variant="fp16" if self.dtype == torch.float16 else None,
+                **self._get_shared_components(model_id)
             )
         
         # パイプライン設定
-        self.pipeline = self.pipeline.to(self.device)
-        
         if self.device != torch.device("mps"):
-            self.pipeline.enable_memory_efficient_attention()
+            pipeline.enable_memory_efficient_attention()
         
         logger.info(f"Model loaded successfully: {model_id}")
+        return pipeline
+    
+    def _get_shared_components(self, model_id: str) -> Dict[str, Any]:
+        """
+        キャッシュ内のSD系パイプラインから共有できるコンポーネントを取得
+        
+        設定ファイル・重みファイルの内容の指紋が読み込むモデルと一致するものだけを共有する
+        （テキストエンコーダーやVAEを再学習したファインチューンや、SD2.x の OpenCLIP
+        には共有しない）。指紋が取れないコンポーネントはモデル自身のものを読み込む
+        """
+        fingerprints = self._get_component_fingerprints(model_id)
+        shared = {}
+        
+        for name in Config.SHARED_PIPELINE_COMPONENTS:
+            fingerprint = fingerprints.get(name)
+            if fingerprint is None:
+                continue
+            
+            for cached_id, pipeline in reversed(self.pipelines.items()):
+                component = pipeline.components.get(name)
+                if (isinstance(pipeline, StableDiffusionPipeline) and component is not None
+                        and self._get_component_fingerprints(cached_id).get(name) == fingerprint):
+                    logger.info(f"Sharing {name} from cached model: {cached_id}")
+                    shared[name] = component
+                    break
+        
+        return shared
+    
+    def _get_component_fingerprints(self, model_id: str) -> Dict[str, Optional[str]]:
+        """共有候補コンポーネントごとの指紋（配下の全ファイルのパスと内容ハッシュのSHA-256）"""
+        if model_id not in self.component_fingerprints:
+            try:
+                files = self._list_model_files(model_id)
+            except Exception as e:
+                logger.warning(f"Could not fingerprint components of {model_id}: {str(e)}")
+                files = {}
+            
+            fingerprints = {}
+            for name in Config.SHARED_PIPELINE_COMPONENTS:
+                entries = sorted(
+                    f"{path}:{content_hash}" for path, content_hash in files.items()
+                    if path.startswith(f"{name}/")
+                )
+                fingerprints[name] = hashlib.sha256("\n".join(entries).encode("utf-8")).hexdigest() if entries else None
+            self.component_fingerprints[model_id] = fingerprints
+        
+        return self.component_fingerprints[model_id]
+    
+    @staticmethod
+    def _list_model_files(model_id: str) -> Dict[str, str]:
+        """
+        モデルのファイル一覧を {相対パス: 内容ハッシュ} で取得
+        
+        ローカルのモデルはファイルを読んでハッシュを計算する。Hubのモデルはまずローカルの
+        キャッシュ（スナップショット）を使い、ネットワークには問い合わせない。キャッシュに
+        ないときだけHubのメタデータのハッシュ（LFSファイルは SHA-256、それ以外は git の
+        blob ID）を取得する
+        """
+        if os.path.isdir(model_id):
+            return AIService._hash_local_files(model_id)
+        
+        try:
+            snapshot_dir = snapshot_download(model_id, local_files_only=True)
+        except LocalEntryNotFoundError:
+            snapshot_dir = None
+        if snapshot_dir is not None:
+            return AIService._list_snapshot_files(snapshot_dir)
+        
+        info = HfApi().model_info(model_id, files_metadata=True, timeout=Config.HUB_METADATA_TIMEOUT)
+        return {
+            sibling.rfilename: sibling.lfs.sha256 if sibling.lfs else sibling.blob_id
+            for sibling in info.siblings
+        }
+    
+    @staticmethod
+    def _list_snapshot_files(snapshot_dir: str) -> Dict[str, str]:
+        """
+        キャッシュのスナップショットのファイル一覧を {相対パス: 内容ハッシュ} で取得
+        
+        スナップショットの各ファイルは blobs/<ハッシュ> へのシンボリックリンクで、そのファイル名は
+        Hubのメタデータと同じハッシュなので読まずに使える（リンクでなければ内容から計算する）
+        """
+        files = {}
+        for path, relative_path in AIService._walk_files(snapshot_dir):
+            if os.path.islink(path):
+                files[relative_path] = os.path.basename(os.path.realpath(path))
+            else:
+                files[relative_path] = AIService._hash_file(path)
+        return files
+    
+    @staticmethod
+    def _hash_local_files(root_dir: str) -> Dict[str, str]:
+        """ディレクトリ配下のファイル一覧を {相対パス: 内容のSHA-256} で取得"""
+        return {relative_path: AIService._hash_file(path) for path, relative_path in AIService._walk_files(root_dir)}
+    
+    @staticmethod
+    def _walk_files(root_dir: str):
+        """ディレクトリ配下の (パス, '/' 区切りの相対パス) を列挙"""
+        for root, _, names in os.walk(root_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                yield path, os.path.relpath(path, root_dir).replace(os.sep, '/')
+    
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        """ファイル内容のSHA-256"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _iter_modules(pipeline: DiffusionPipeline):
+        """パイプライン内のtorchモジュールを列挙"""
+        for component in pipeline.components.values():
+            if isinstance(component, torch.nn.Module):
+                yield component
+    
+    def _estimate_cache_bytes(self) -> int:
+        """キャッシュ全体のパラメータサイズ（共有モジュールは1回だけ数える）"""
+        seen = set()
+        total = 0
+        for pipeline in self.pipelines.values():
+            for module in self._iter_modules(pipeline):
+                if id(module) in seen:
+                    continue
+                seen.add(id(module))
+                for tensor in list(module.parameters()) + list(module.buffers()):
+                    total += tensor.numel() * tensor.element_size()
+        return total
+    
+    def _evict_pipelines(self):
+        """メモリ予算・モデル数の上限を超えたら古いパイプラインから破棄"""
+        budget = Config.PIPELINE_CACHE_BUDGET_GB * 1024 ** 3
+        evicted = False
+        
+        while len(self.pipelines) > 1:
+            over_count = len(self.pipelines) > Config.PIPELINE_CACHE_MAX_MODELS
+            if not over_count and self._estimate_cache_bytes() <= budget:
+                break
+            
+            oldest_id = next(iter(self.pipelines))
+            if oldest_id == self.current_model_id:
+                self.pipelines.move_to_end(oldest_id)
+                continue
+            
+            logger.info(f"Evicting cached model: {oldest_id}")
+            del self.pipelines[oldest_id]
+            evicted = True
+        
+        if evicted:
+            self._clear_memory()
     
     def _clear_memory(self):
         """メモリクリア"""
@@ -98,8 +277,9 @@ class AIService:
                       height: int = 512,
                       num_inference_steps: int = 20,
                       guidance_scale: float = 7.5,
-                      seed: Optional[int] = None) -> Optional[Image.Image]:
-        """画像生成"""
+                      seed: Optional[int] = None,
+                      progress_callback: Optional[Callable[[float], None]] = None) -> Optional[Image.Image]:
+        """画像生成（progress_callback には 0.0〜1.0 の進捗が渡される）"""
         if not self.pipeline:
             logger.error("Pipeline not initialized")
             return None
@@ -110,12 +290,12 @@ class AIService:
             width, height = params['width'], params['height']
             
             # ジェネレーター設定
-            generator = None
-            if seed is not None:
-                if self.device == torch.device("mps"):
-                    generator = torch.Generator().manual_seed(seed)
-                else:
-                    generator = torch.Generator(device=self.device).manual_seed(seed)
+            generator = self._create_generator(seed) if seed is not None else None
+            
+            # 進捗通知
+            progress_kwargs = {}
+            if progress_callback is not None:
+                progress_kwargs = self._build_progress_kwargs(progress_callback, num_inference_steps)
             
             # 画像生成
             with torch.no_grad():
@@ -126,7 +306,8 @@ class AIService:
                     height=height,
                     num_inference_steps=num_inference_steps,
                     guidance_scale=guidance_scale,
-                    generator=generator
+                    generator=generator,
+                    **progress_kwargs
                 )
                 
                 return result.images[0]
@@ -135,6 +316,95 @@ class AIService:
             logger.error(f"Image generation failed: {str(e)}")
             return None
     
+    def generate_images(self,
+                       prompts: List[str],
+                       negative_prompts: Optional[List[str]] = None,
+                       seeds: Optional[List[Optional[int]]] = None,
+                       width: int = 512,
+                       height: int = 512,
+                       num_inference_steps: int = 20,
+                       guidance_scale: float = 7.5,
+                       progress_callback: Optional[Callable[[float], None]] = None) -> Optional[List[Image.Image]]:
+        """
+        複数プロンプトを1回のパイプライン呼び出しでまとめて生成（マイクロバッチ）
+        
+        サイズ・ステップ数・ガイダンススケールは共通。シードはリクエストごとに
+        ジェネレーターを分けるので、各画像は単体生成時と同じ初期ノイズから始まる
+        """
+        if not self.pipeline:
+            logger.error("Pipeline not initialized")
+            return None
+        
+        try:
+            # パラメータ検証
+            params = Config.validate_image_params(width, height, 0, 0)
+            width, height = params['width'], params['height']
+            
+            negative_prompts = negative_prompts or [""] * len(prompts)
+            seeds = seeds or [None] * len(prompts)
+            
+            # リクエストごとのジェネレーター（シード未指定分はランダム）
+            generators = None
+            if any(seed is not None for seed in seeds):
+                generators = [self._create_generator(seed) for seed in seeds]
+            
+            # 進捗通知
+            progress_kwargs = {}
+            if progress_callback is not None:
+                progress_kwargs = self._build_progress_kwargs(progress_callback, num_inference_steps)
+            
+            # 画像生成
+            with torch.no_grad():
+                result = self.pipeline(
+                    prompt=list(prompts),
+                    negative_prompt=list(negative_prompts),
+                    width=width,
+                    height=height,
+                    num_inference_steps=num_inference_steps,
+                    guidance_scale=guidance_scale,
+                    generator=generators,
+                    **progress_kwargs
+                )
+                
+                return list(result.images)
+        
+        except Exception as e:
+            logger.error(f"Batch image generation failed: {str(e)}")
+            return None
+    
+    def _create_generator(self, seed: Optional[int] = None) -> torch.Generator:
+        """シード付きジェネレーターを作成（seed が None ならランダムシード）"""
+        if self.device == torch.device("mps"):
+            generator = torch.Generator()
+        else:
+            generator = torch.Generator(device=self.device)
+        
+        if seed is None:
+            generator.seed()
+        else:
+            generator.manual_seed(seed)
+        return generator
+    
+    def _build_progress_kwargs(self,
+                             progress_callback: Callable[[float], None],
+                             num_inference_steps: int) -> Dict[str, Any]:
+        """diffusersのバージョンに応じたステップ進捗コールバック引数を作成"""
+        total_steps = max(num_inference_steps, 1)
+        params = inspect.signature(self.pipeline.__call__).parameters
+        
+        if 'callback_on_step_end' in params:
+            def on_step_end(pipeline, step, timestep, callback_kwargs):
+                progress_callback((step + 1) / total_steps)
+                return callback_kwargs
+            return {'callback_on_step_end': on_step_end}
+        
+        if 'callback' in params:
+            def on_step(step, timestep, latents):
+                progress_callback((step + 1) / total_steps)
+            return {'callback': on_step, 'callback_steps': 1}
+        
+        return {}
+    
     def is_initialized(self) -> bool:
         """初期化済みかチェック"""
         return self.pipeline is not None
@@ -149,6 +419,7 @@ class AIService:
             'device': str(self.device) if self.device else None,
             'dtype': str(self.dtype) if self.dtype else None,
             'model_id': self.current_model_id,
+            'cached_models': list(self.pipelines.keys()),
             'initialized': self.is_initialized()
         }
 
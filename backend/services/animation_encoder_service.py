@@ -0,0 +1,207 @@
+"""
+Pixa - アニメーションエンコーダーサービス
+同じフレーム列から GIF / APNG / アニメーションWebP をエンコードし、形式ごとのサイズと時間を比較
+"""
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, features
+from typing import Dict, List, Optional, Union
+import logging
+
+from .gif_optimization_service import gif_optimization_service, FrameDiffResult
+from config.settings import Config
+from utils.frame_stack import FrameStack
+
+logger = logging.getLogger(__name__)
+
+
+class AnimationEncoder:
+    """アニメーションエンコーダーの基底クラス（形式ごとにサブクラスで encode を実装）"""
+
+    format_name = None   # 形式の識別子（'gif' など）
+    mimetype = None
+    image_format = None  # データURLに使う形式名
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """この環境のPillowでエンコードできるか"""
+        return True
+
+    @classmethod
+    def encode(cls, diff_result: FrameDiffResult, duration: int, loop: int) -> Optional[bytes]:
+        """差分最適化済みのフレームをエンコードしてバイト列を返す"""
+        raise NotImplementedError
+
+
+class GifAnimationEncoder(AnimationEncoder):
+    """差分合成最適化GIF（変化矩形＋透明色、256色）"""
+
+    format_name = 'gif'
+    mimetype = 'image/gif'
+    image_format = 'GIF'
+
+    @classmethod
+    def encode(cls, diff_result: FrameDiffResult, duration: int, loop: int) -> Optional[bytes]:
+        return gif_optimization_service.encode_optimized_gif(
+            diff_result.optimized_frames, duration, loop, diff_result.tolerance, diff_result
+        )
+
+
+class ApngAnimationEncoder(AnimationEncoder):
+    """
+    APNG（可逆、256色を超えてもよい）
+
+    使用色が256色以下なら全フレーム共通パレットのPモードで保存する。
+    前フレームからの変化矩形の切り出しは Pillow が行う
+    """
+
+    format_name = 'apng'
+    mimetype = 'image/apng'
+    image_format = 'PNG'
+
+    @classmethod
+    def encode(cls, diff_result: FrameDiffResult, duration: int, loop: int) -> Optional[bytes]:
+        frames = diff_result.optimized_frames
+        images = frames.to_shared_palette_images() or frames.to_images()
+
+        buffer = io.BytesIO()
+        images[0].save(
+            buffer,
+            format='PNG',
+            save_all=True,
+            append_images=images[1:],
+            duration=duration,
+            loop=loop
+        )
+        return buffer.getvalue()
+
+
+class WebpAnimationEncoder(AnimationEncoder):
+    """ロスレスのアニメーションWebP"""
+
+    format_name = 'webp'
+    mimetype = 'image/webp'
+    image_format = 'WEBP'
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return features.check('webp')
+
+    @classmethod
+    def encode(cls, diff_result: FrameDiffResult, duration: int, loop: int) -> Optional[bytes]:
+        images = diff_result.optimized_frames.to_images()
+
+        buffer = io.BytesIO()
+        images[0].save(
+            buffer,
+            format='WEBP',
+            save_all=True,
+            append_images=images[1:],
+            duration=duration,
+            loop=loop,
+            lossless=True,
+            method=Config.WEBP_ENCODE_METHOD
+        )
+        return buffer.getvalue()
+
+
+class AnimationEncoderService:
+    """形式ごとのアニメーションエンコードサービス"""
+
+    # 形式の識別子とエンコーダーの対応
+    ENCODERS = {
+        encoder.format_name: encoder
+        for encoder in (GifAnimationEncoder, ApngAnimationEncoder, WebpAnimationEncoder)
+    }
+
+    @staticmethod
+    def get_available_formats() -> List[str]:
+        """この環境でエンコードできる形式の一覧"""
+        return [name for name, encoder in AnimationEncoderService.ENCODERS.items() if encoder.is_available()]
+
+    @staticmethod
+    def get_encoder(format_name: str) -> Optional[type]:
+        """形式の識別子に対応するエンコーダー（未対応なら None）"""
+        return AnimationEncoderService.ENCODERS.get(format_name)
+
+    @staticmethod
+    def encode(diff_result: FrameDiffResult,
+               format_name: str,
+               duration: int = 100,
+               loop: int = 0) -> Dict:
+        """
+        1形式だけエンコードし、バイト列・サイズ・エンコード時間をまとめて返す
+
+        diff_result は compute_frame_differences の結果（全形式で同じ差分最適化済みフレームを使う）
+        """
+        encoder = AnimationEncoderService.get_encoder(format_name)
+        if encoder is None or not encoder.is_available():
+            return {'success': False, 'format': format_name, 'error': f'未対応の形式です: {format_name}'}
+
+        start_time = time.perf_counter()
+        try:
+            data = encoder.encode(diff_result, duration, loop)
+        except Exception as e:
+            logger.error(f"{format_name} encoding failed: {str(e)}")
+            data = None
+        encode_time_ms = (time.perf_counter() - start_time) * 1000
+
+        if data is None:
+            return {'success': False, 'format': format_name, 'error': f'{format_name} のエンコードに失敗しました'}
+
+        return {
+            'success': True,
+            'format': format_name,
+            'mimetype': encoder.mimetype,
+            'image_format': encoder.image_format,
+            'data': data,
+            'file_size': len(data),
+            'encode_time_ms': round(encode_time_ms, 1)
+        }
+
+    @staticmethod
+    def encode_formats(frames: Union[FrameStack, List[Image.Image]],
+                       formats: Optional[List[str]] = None,
+                       duration: int = 100,
+                       loop: int = 0,
+                       tolerance: int = 3,
+                       max_workers: Optional[int] = None) -> Dict[str, Dict]:
+        """
+        同じフレーム列を複数の形式でエンコードし、形式ごとの結果を指定順に返す
+
+        差分最適化は1回だけ計算して全形式で共有し、形式ごとのエンコードはスレッドプールで
+        並列に実行する（zlib・LZW・libwebp のエンコード中は GIL が解放される）
+        """
+        formats = formats or AnimationEncoderService.get_available_formats()
+        diff_result = gif_optimization_service.compute_frame_differences(frames, tolerance)
+
+        workers = max(1, min(max_workers or len(formats), len(formats)))
+        if workers == 1:
+            return {
+                format_name: AnimationEncoderService.encode(diff_result, format_name, duration, loop)
+                for format_name in formats
+            }
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                format_name: executor.submit(AnimationEncoderService.encode, diff_result, format_name, duration, loop)
+                for format_name in formats
+            }
+            return {format_name: future.result() for format_name, future in futures.items()}
+
+    @staticmethod
+    def summarize(results: Dict[str, Dict]) -> Dict:
+        """成功した形式のうち最小サイズ・最速の形式"""
+        succeeded = {name: result for name, result in results.items() if result['success']}
+        if not succeeded:
+            return {'smallest': None, 'fastest': None}
+
+        return {
+            'smallest': min(succeeded, key=lambda name: succeeded[name]['file_size']),
+            'fastest': min(succeeded, key=lambda name: succeeded[name]['encode_time_ms'])
+        }
+
+
+# グローバルサービスインスタンス
+animation_encoder_service = AnimationEncoderService()
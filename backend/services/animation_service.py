@@ -1,11 +1,16 @@
 """
 Pixa - アニメーションサービス（リファクタリング後）
 """
-from typing import List
+from typing import Iterable, Iterator, List, Tuple, Union
 from PIL import Image
 import logging
 
-from .animations import AnimationFactory
+from .animations import AnimationFactory, AnimationBase
+from .animations.effect_animations import wave_distortion_map_cache
+from .result_cache_service import frame_cache, make_cache_key, make_image_digest
+from config.settings import Config
+from utils.frame_stack import FrameStack
+from utils.image_utils import get_sprite_size
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +23,8 @@ class AnimationService:
                               animation_type: str,
                               frame_count: int = 8,
                               pixel_size: int = 8,
-                              palette_size: int = 16) -> List[Image.Image]:
+                              palette_size: int = 16,
+                              sprite_resolution: bool = False) -> List[Image.Image]:
         """
         アニメーションフレームを生成
         
@@ -28,6 +34,7 @@ class AnimationService:
             frame_count: フレーム数
             pixel_size: ピクセルサイズ
             palette_size: パレットサイズ
+            sprite_resolution: スプライト解像度で生成してそのまま返す
             
         Returns:
             List[Image.Image]: 生成されたフレームリスト
@@ -37,9 +44,142 @@ class AnimationService:
             animation_type=animation_type,
             frame_count=frame_count,
             pixel_size=pixel_size,
-            palette_size=palette_size
+            palette_size=palette_size,
+            sprite_resolution=sprite_resolution
         )
     
+    @staticmethod
+    def iter_animation_frames(base_image: Image.Image,
+                            animation_type: str,
+                            frame_count: int = 8,
+                            pixel_size: int = 8,
+                            palette_size: int = 16,
+                            sprite_resolution: bool = False) -> Iterator[Image.Image]:
+        """
+        アニメーションフレームを1枚ずつ生成（create_animation_frames のストリーム版）
+        
+        全フレームをリストに溜めないので、差分最適化・GIFエンコードとつなげると
+        元サイズのフレームの保持量がフレーム数によらず一定になる
+        """
+        return AnimationFactory.iter_animation_frames(
+            base_image=base_image,
+            animation_type=animation_type,
+            frame_count=frame_count,
+            pixel_size=pixel_size,
+            palette_size=palette_size,
+            sprite_resolution=sprite_resolution
+        )
+    
+    @staticmethod
+    def create_frame_stack(base_image: Image.Image,
+                         animation_type: str,
+                         frame_count: int = 8,
+                         pixel_size: int = 8,
+                         palette_size: int = 16,
+                         sprite_resolution: bool = False) -> FrameStack:
+        """アニメーションフレームを FrameStack（(F, H, W, C) の連続配列）で生成"""
+        return AnimationFactory.create_frame_stack(
+            base_image=base_image,
+            animation_type=animation_type,
+            frame_count=frame_count,
+            pixel_size=pixel_size,
+            palette_size=palette_size,
+            sprite_resolution=sprite_resolution
+        )
+    
+    @staticmethod
+    def get_cached_frame_stack(base_image: Image.Image,
+                             animation_type: str,
+                             frame_count: int = 8,
+                             pixel_size: int = 8,
+                             palette_size: int = 16,
+                             sprite_resolution: bool = False) -> FrameStack:
+        """
+        フレームキャッシュ付きで FrameStack を取得
+        
+        キーはベース画像のダイジェストとフレーム生成に関わるパラメータだけなので、
+        tolerance・duration などGIF段のパラメータを変えた再リクエストではフレーム合成を省略できる。
+        生成に失敗したときの元画像1枚のフレームはキャッシュしない
+        """
+        key = AnimationService._frame_cache_key(
+            base_image, animation_type, frame_count, pixel_size, palette_size, sprite_resolution
+        )
+        
+        stack = frame_cache.get(key)
+        if stack is None:
+            stack = AnimationFactory.try_create_frame_stack(
+                base_image, animation_type, frame_count,
+                pixel_size, palette_size, sprite_resolution=sprite_resolution
+            )
+            if stack is None:
+                return AnimationFactory.fallback_frame_stack(base_image, pixel_size, sprite_resolution)
+            frame_cache.put(key, stack)
+        return stack
+    
+    @staticmethod
+    def iter_cached_animation_frames(base_image: Image.Image,
+                                   animation_type: str,
+                                   frame_count: int = 8,
+                                   pixel_size: int = 8,
+                                   palette_size: int = 16,
+                                   sprite_resolution: bool = False) -> Union[FrameStack, Iterable[Image.Image]]:
+        """
+        フレームキャッシュとストリーム生成を使い分けてフレームを取得
+        
+        キャッシュにあればその FrameStack を返す。なければ、全フレームの推定サイズが
+        Config.FRAME_CACHE_MAX_STREAM_MB 以下なら FrameStack を作ってキャッシュし、
+        それより大きければキャッシュせずに1枚ずつ生成するイテレータを返す
+        （大きなアニメーションは元サイズのフレームの保持量を一定に保つ）
+        """
+        key = AnimationService._frame_cache_key(
+            base_image, animation_type, frame_count, pixel_size, palette_size, sprite_resolution
+        )
+        stack = frame_cache.get(key)
+        if stack is not None:
+            return stack
+        
+        frame_size = get_sprite_size(base_image.size, pixel_size) if sprite_resolution else base_image.size
+        estimated_bytes = frame_count * frame_size[0] * frame_size[1] * 3
+        if estimated_bytes <= Config.FRAME_CACHE_MAX_STREAM_MB * 1024 * 1024:
+            return AnimationService.get_cached_frame_stack(
+                base_image, animation_type, frame_count,
+                pixel_size, palette_size, sprite_resolution
+            )
+        
+        return AnimationService.iter_animation_frames(
+            base_image, animation_type, frame_count,
+            pixel_size, palette_size, sprite_resolution
+        )
+    
+    @staticmethod
+    def _frame_cache_key(base_image: Image.Image,
+                         animation_type: str,
+                         frame_count: int,
+                         pixel_size: int,
+                         palette_size: int,
+                         sprite_resolution: bool) -> str:
+        """フレームキャッシュのキー（ベース画像のダイジェストとフレーム生成パラメータ）"""
+        return make_cache_key(
+            kind='animation_frames',
+            base_image=make_image_digest(base_image),
+            animation_type=animation_type,
+            frame_count=frame_count,
+            pixel_size=pixel_size,
+            palette_size=palette_size,
+            sprite_resolution=sprite_resolution
+        )
+    
+    @staticmethod
+    def upscale_frames(frames: Union[FrameStack, List[Image.Image]],
+                       size: Tuple[int, int]) -> Union[FrameStack, List[Image.Image]]:
+        """スプライト解像度のフレームを表示サイズに拡大（FrameStack は FrameStack のまま）"""
+        return AnimationBase.upscale_frames(frames, size)
+    
+    @staticmethod
+    def iter_upscaled_frames(frames: Iterable[Image.Image], size: Tuple[int, int]) -> Iterator[Image.Image]:
+        """スプライト解像度のフレームを1枚ずつ表示サイズに拡大"""
+        return AnimationBase.iter_upscaled_frames(frames, size)
+    
     @staticmethod
     def get_supported_animation_types() -> List[str]:
         """サポートされているアニメーション種類を取得"""
@@ -61,5 +201,8 @@ class AnimationService:
         return AnimationFactory.get_animation_types_by_category('effect')
 
 
+# サンプリングマップのキャッシュ容量を設定から反映
+wave_distortion_map_cache.set_budget(Config.WAVE_MAP_CACHE_MB * 1024 * 1024)
+
 # グローバルサービスインスタンス
 animation_service = AnimationService()
@@ -4,8 +4,9 @@ Pixa - アニメーション統合インターフェース
 from .game_animations import GameAnimations, GAME_ANIMATION_TYPES
 from .effect_animations import EffectAnimations, EFFECT_ANIMATION_TYPES
 from .animation_base import AnimationBase
+from utils.frame_stack import FrameStack
 
-from typing import List
+from typing import Iterator, List, Optional, Tuple
 from PIL import Image
 import logging
 
@@ -35,33 +36,129 @@ class AnimationFactory:
             pixel_size: ピクセルサイズ
             palette_size: パレットサイズ
             **kwargs: その他のパラメータ
+                sprite_resolution: True ならベース画像をスプライト解像度に縮小してから
+                    変形し、スプライト解像度のフレームを返す（拡大はエンコード時に1回だけ
+                    行う）。変形の移動量などのピクセル単位の定数はスプライトのドット単位になる
             
         Returns:
             List[Image.Image]: 生成されたフレームリスト
         """
+        if kwargs.pop('sprite_resolution', False):
+            base_image = AnimationBase.reduce_to_sprite_grid(base_image, pixel_size)
+            pixel_size = 1
+        
         try:
             # アニメーション種類に応じて適切なクラスを選択
-            if animation_type in GAME_ANIMATION_TYPES:
-                return GameAnimations.create_frames(
-                    base_image, animation_type, frame_count, 
-                    pixel_size, palette_size, **kwargs
-                )
-            elif animation_type in EFFECT_ANIMATION_TYPES:
-                return EffectAnimations.create_frames(
-                    base_image, animation_type, frame_count, 
-                    pixel_size, palette_size, **kwargs
-                )
-            else:
-                logger.warning(f"Unknown animation type: {animation_type}, using default")
-                return GameAnimations.create_frames(
-                    base_image, 'idle_breathing', frame_count, 
-                    pixel_size, palette_size, **kwargs
-                )
+            engine, animation_type = AnimationFactory._select_engine(animation_type)
+            return engine.create_frames(
+                base_image, animation_type, frame_count, 
+                pixel_size, palette_size, **kwargs
+            )
                 
         except Exception as e:
             logger.error(f"Animation creation failed: {str(e)}")
             return [base_image]  # エラー時は元画像を返す
     
+    @staticmethod
+    def iter_animation_frames(base_image: Image.Image,
+                            animation_type: str,
+                            frame_count: int = 8,
+                            pixel_size: int = 8,
+                            palette_size: int = 16,
+                            **kwargs) -> Iterator[Image.Image]:
+        """
+        create_animation_frames のストリーム版（フレームを1枚ずつ返すジェネレータ）
+        
+        エンジンのフレームは生成されるたびにスプライト解像度に縮小され、元サイズの
+        フレームは返すときに1枚ずつ拡大される。保持するのはスプライト解像度の
+        フレームだけなので、フレーム数が増えても元サイズのフレームは常に1枚分で済む。
+        引数は create_animation_frames と同じ
+        """
+        if kwargs.pop('sprite_resolution', False):
+            base_image = AnimationBase.reduce_to_sprite_grid(base_image, pixel_size)
+            pixel_size = 1
+        
+        try:
+            engine, animation_type = AnimationFactory._select_engine(animation_type)
+            frames = engine.iter_frames(
+                base_image, animation_type, frame_count,
+                pixel_size, palette_size, **kwargs
+            )
+            # 共通パレットの減色は最初のフレームの前に全フレームを通すので、
+            # エンジンの例外はここで発生する
+            first_frame = next(frames)
+        
+        except Exception as e:
+            logger.error(f"Animation creation failed: {str(e)}")
+            yield base_image  # エラー時は元画像を返す
+            return
+        
+        yield first_frame
+        yield from frames
+    
+    @staticmethod
+    def create_frame_stack(base_image: Image.Image,
+                         animation_type: str,
+                         frame_count: int = 8,
+                         pixel_size: int = 8,
+                         palette_size: int = 16,
+                         **kwargs) -> FrameStack:
+        """
+        create_animation_frames の FrameStack 版
+        
+        エンジンの出力からピクセルアート後処理までを (F, H, W, C) の配列のまま行い、
+        PIL画像はエンコード時まで作らない。引数は create_animation_frames と同じ
+        """
+        stack = AnimationFactory.try_create_frame_stack(
+            base_image, animation_type, frame_count,
+            pixel_size, palette_size, **kwargs
+        )
+        if stack is None:
+            # エラー時は元画像を返す
+            return AnimationFactory.fallback_frame_stack(base_image, pixel_size, kwargs.get('sprite_resolution', False))
+        return stack
+    
+    @staticmethod
+    def try_create_frame_stack(base_image: Image.Image,
+                             animation_type: str,
+                             frame_count: int = 8,
+                             pixel_size: int = 8,
+                             palette_size: int = 16,
+                             **kwargs) -> Optional[FrameStack]:
+        """create_frame_stack と同じだが、失敗したら元画像の代わりに None を返す（キャッシュ用）"""
+        if kwargs.pop('sprite_resolution', False):
+            base_image = AnimationBase.reduce_to_sprite_grid(base_image, pixel_size)
+            pixel_size = 1
+        
+        try:
+            engine, animation_type = AnimationFactory._select_engine(animation_type)
+            return engine.create_frame_stack(
+                base_image, animation_type, frame_count,
+                pixel_size, palette_size, **kwargs
+            )
+        
+        except Exception as e:
+            logger.error(f"Animation creation failed: {str(e)}")
+            return None
+    
+    @staticmethod
+    def fallback_frame_stack(base_image: Image.Image, pixel_size: int, sprite_resolution: bool = False) -> FrameStack:
+        """生成に失敗したときに返す元画像1枚の FrameStack（sprite_resolution ならスプライト解像度）"""
+        if sprite_resolution:
+            base_image = AnimationBase.reduce_to_sprite_grid(base_image, pixel_size)
+        return FrameStack.from_images([base_image])
+    
+    @staticmethod
+    def _select_engine(animation_type: str) -> Tuple[type, str]:
+        """アニメーション種類を担当するクラスと、実際に使う種類名を返す"""
+        if animation_type in GAME_ANIMATION_TYPES:
+            return GameAnimations, animation_type
+        if animation_type in EFFECT_ANIMATION_TYPES:
+            return EffectAnimations, animation_type
+        
+        logger.warning(f"Unknown animation type: {animation_type}, using default")
+        return GameAnimations, 'idle_breathing'
+    
     @staticmethod
     def get_animation_info(animation_type: str) -> dict:
         """アニメーション情報を取得"""
@@ -121,6 +218,14 @@ class AnimationService:
     @staticmethod
     def create_animation_frames(*args, **kwargs):
         return AnimationFactory.create_animation_frames(*args, **kwargs)
+    
+    @staticmethod
+    def iter_animation_frames(*args, **kwargs):
+        return AnimationFactory.iter_animation_frames(*args, **kwargs)
+    
+    @staticmethod
+    def create_frame_stack(*args, **kwargs):
+        return AnimationFactory.create_frame_stack(*args, **kwargs)
 
 
 animation_service = AnimationService()
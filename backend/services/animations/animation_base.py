@@ -2,10 +2,14 @@
 Pixa - アニメーション基底クラス（簡素版）
 """
 import math
+import numpy as np
 from PIL import Image
-from typing import List
+from typing import Iterable, Iterator, List, Sequence, Tuple, Union
 import logging
 
+from utils.frame_stack import FrameStack, nearest_resize_indices
+from utils.image_utils import get_sprite_size
+
 logger = logging.getLogger(__name__)
 
 
@@ -70,28 +74,211 @@ class AnimationBase:
             return fallback_image or image.copy()
     
     @staticmethod
-    def apply_pixel_art_processing_to_frames(frames: List[Image.Image],
+    def apply_pixel_art_processing_to_frames(frames: Iterable[Image.Image],
                                            pixel_size: int,
-                                           palette_size: int) -> List[Image.Image]:
-        """フレームリストにピクセルアート処理を適用（簡易版）"""
-        processed_frames = []
+                                           palette_size: int,
+                                           shared_palette: bool = True) -> List[Image.Image]:
+        """
+        フレームリストにピクセルアート処理を適用（簡易版）
+        
+        shared_palette が True の場合は全フレームを1枚に連結して一度だけ減色し、
+        全フレームで同じパレットを使う（フレーム間のパレットのちらつきを防ぐ）。
+        pixel_size が1以下（スプライト解像度で生成済み）なら縮小・拡大せず減色のみ行う
+        """
+        return list(AnimationBase.iter_pixel_art_frames(frames, pixel_size, palette_size, shared_palette))
+    
+    @staticmethod
+    def apply_pixel_art_processing_to_stack(frames: Union[FrameStack, Iterable[Image.Image]],
+                                          pixel_size: int,
+                                          palette_size: int,
+                                          shared_palette: bool = True) -> FrameStack:
+        """
+        apply_pixel_art_processing_to_frames の FrameStack 版
+        
+        縮小・減色・拡大を配列のまま全フレームまとめて行う（全フレーム同じサイズであること）
+        """
+        small_frames, sizes = AnimationBase.reduce_frames_to_sprite(frames, pixel_size)
+        stack = FrameStack.from_images(
+            AnimationBase.quantize_sprite_frames(small_frames, palette_size, shared_palette)
+        )
+        
+        if pixel_size <= 1:
+            return stack
+        
+        # 元サイズに戻す
+        return stack.resize_nearest(sizes[0])
+    
+    @staticmethod
+    def iter_pixel_art_frames(frames: Union[FrameStack, Iterable[Image.Image]],
+                            pixel_size: int,
+                            palette_size: int,
+                            shared_palette: bool = True) -> Iterator[Image.Image]:
+        """
+        apply_pixel_art_processing_to_frames のストリーム版
+        
+        共通パレットには全フレームの色が必要なので、最初のフレームを返す前に入力を
+        全て消費する。ただし保持するのはスプライト解像度に縮小したフレームだけで、
+        元サイズのフレームは縮小後すぐに手放し、拡大は1枚ずつ返すときに行う
+        """
+        small_frames, sizes = AnimationBase.reduce_frames_to_sprite(frames, pixel_size)
+        small_frames = AnimationBase.quantize_sprite_frames(small_frames, palette_size, shared_palette)
+        
+        if pixel_size <= 1:
+            yield from small_frames
+            return
+        
+        # 元サイズに戻す
+        for small, size in zip(small_frames, sizes):
+            yield small.resize(size, Image.NEAREST)
+    
+    @staticmethod
+    def reduce_frames_to_sprite(frames: Union[FrameStack, Iterable[Image.Image]],
+                              pixel_size: int) -> Tuple[Union[FrameStack, List[Image.Image]], List[Tuple[int, int]]]:
+        """
+        フレーム列をスプライト解像度に縮小し、(縮小したフレーム, 元のサイズのリスト) を返す
+        
+        FrameStack は配列のまままとめて縮小する。画像の列は1枚ずつ縮小して元サイズの
+        フレームをすぐに手放し、全フレームが同じサイズなら FrameStack にまとめる。
+        pixel_size が1以下なら縮小しない
+        """
+        if isinstance(frames, FrameStack):
+            sizes = [frames.size] * len(frames)
+            if pixel_size > 1:
+                frames = frames.resize_nearest(get_sprite_size(frames.size, pixel_size))
+            return frames, sizes
+        
+        sizes = []
+        small_frames = []
         for frame in frames:
-            # 簡易ピクセルアート処理
+            sizes.append(frame.size)
             if pixel_size > 1:
-                # ダウンサンプル → アップサンプル
-                small_size = (max(frame.width // pixel_size, 16), 
-                             max(frame.height // pixel_size, 16))
-                small_frame = frame.resize(small_size, Image.NEAREST)
-                
-                # カラーパレット制限
-                if palette_size < 256:
-                    small_frame = small_frame.quantize(colors=palette_size, dither=0)
-                    small_frame = small_frame.convert('RGB')
-                
-                # 元サイズに戻す
-                processed_frame = small_frame.resize(frame.size, Image.NEAREST)
-            else:
-                processed_frame = frame
+                frame = frame.resize(get_sprite_size(frame.size, pixel_size), Image.NEAREST)
+            small_frames.append(frame)
+        
+        if len({small.size for small in small_frames}) == 1:
+            return FrameStack.from_images(small_frames), sizes
+        return small_frames, sizes
+    
+    @staticmethod
+    def quantize_sprite_frames(small_frames: Union[FrameStack, List[Image.Image]],
+                             palette_size: int,
+                             shared_palette: bool = True) -> Union[FrameStack, List[Image.Image]]:
+        """
+        縮小済みフレームのカラーパレット制限
+        
+        FrameStack で shared_palette なら全フレームを1回で減色して共通パレットにする。
+        サイズの揃わないリストはフレームごとに減色する
+        """
+        if palette_size >= 256:
+            return small_frames
+        
+        if isinstance(small_frames, FrameStack):
+            if shared_palette:
+                return small_frames.quantize_shared(palette_size)
+            return FrameStack.from_images(
+                small.quantize(colors=palette_size, dither=0).convert('RGB')
+                for small in small_frames
+            )
+        
+        return [
+            small.quantize(colors=palette_size, dither=0).convert('RGB')
+            for small in small_frames
+        ]
+    
+    @staticmethod
+    def reduce_to_sprite_grid(base_image: Image.Image, pixel_size: int) -> Image.Image:
+        """ベース画像をスプライト解像度（1ドット = 1ピクセル）に縮小"""
+        return base_image.convert('RGB').resize(get_sprite_size(base_image.size, pixel_size), Image.NEAREST)
+    
+    @staticmethod
+    def upscale_frames(frames: Union[FrameStack, Iterable[Image.Image]],
+                       size: Tuple[int, int]) -> Union[FrameStack, List[Image.Image]]:
+        """スプライト解像度のフレームを表示サイズに拡大（NEAREST、FrameStack は FrameStack のまま）"""
+        if isinstance(frames, FrameStack):
+            return frames.resize_nearest(size)
+        return list(AnimationBase.iter_upscaled_frames(frames, size))
+    
+    @staticmethod
+    def iter_upscaled_frames(frames: Iterable[Image.Image], size: Tuple[int, int]) -> Iterator[Image.Image]:
+        """upscale_frames のストリーム版（1枚ずつ拡大して返す）"""
+        for frame in frames:
+            yield frame.resize(size, Image.NEAREST)
+    
+    @staticmethod
+    def quantize_frames_shared(frames: List[Image.Image], palette_size: int) -> List[Image.Image]:
+        """全フレームを縦に連結して1回で減色し、共通パレットのフレームに分割"""
+        if not frames:
+            return []
+        
+        return FrameStack.from_images(frames).quantize_shared(palette_size).to_images()
+    
+    @staticmethod
+    def apply_sampling_maps(source: np.ndarray,
+                          sample_maps: np.ndarray,
+                          fill_color: tuple = (0, 0, 0)) -> np.ndarray:
+        """
+        サンプリングマップ（変位フィールド）で全フレームを一括レンダリング
+        
+        Args:
+            source: 参照元の画素 (H, W, C)、またはフレームごとの参照元 (F, H, W, C)
+            sample_maps: 出力画素ごとの参照元フラットインデックス (F, H, W)。負値は fill_color で塗りつぶし
+            fill_color: 参照元のない画素の色
             
-            processed_frames.append(processed_frame)
-        return processed_frames
+        Returns:
+            np.ndarray: (F, H, W, C) のフレーム配列
+        """
+        frame_count, height, width = sample_maps.shape
+        flat_source = source.reshape(-1, source.shape[-1])
+        
+        invalid = sample_maps < 0
+        indices = np.where(invalid, 0, sample_maps)
+        if source.ndim == 4:
+            # フレームごとの参照元へのオフセット
+            frame_offsets = np.arange(frame_count, dtype=indices.dtype) * (height * width)
+            indices = indices + frame_offsets[:, np.newaxis, np.newaxis]
+        
+        frames = flat_source[indices]
+        if invalid.any():
+            frames[invalid] = fill_color
+        return frames
+    
+    @staticmethod
+    def create_row_shift_maps(row_shifts: np.ndarray, width: int) -> np.ndarray:
+        """行ごとの横シフト (F, H)（np.roll と同じ向き）からサンプリングマップを作成"""
+        row_shifts = np.asarray(row_shifts)
+        height = row_shifts.shape[1]
+        src_x = (np.arange(width)[np.newaxis, np.newaxis, :] - row_shifts[:, :, np.newaxis]) % width
+        return (np.arange(height)[np.newaxis, :, np.newaxis] * width + src_x).astype(np.int32)
+    
+    @staticmethod
+    def create_resize_paste_maps(sizes: Sequence[Tuple[int, int]],
+                               offsets: Sequence[Tuple[int, int]],
+                               src_width: int,
+                               src_height: int,
+                               width: int,
+                               height: int) -> np.ndarray:
+        """NEARESTリサイズ→paste と同じ配置のサンプリングマップを作成（範囲外は -1）"""
+        maps = np.empty((len(sizes), height, width), dtype=np.int32)
+        
+        for i, ((new_width, new_height), (x_offset, y_offset)) in enumerate(zip(sizes, offsets)):
+            # PILのNEARESTと同じ丸めになるよう、インデックス列そのものをリサイズ
+            local_x = np.arange(width) - x_offset
+            local_y = np.arange(height) - y_offset
+            src_x = AnimationBase._nearest_resize_indices(src_width, new_width)[np.clip(local_x, 0, new_width - 1)]
+            src_y = AnimationBase._nearest_resize_indices(src_height, new_height)[np.clip(local_y, 0, new_height - 1)]
+            valid_x = (local_x >= 0) & (local_x < new_width)
+            valid_y = (local_y >= 0) & (local_y < new_height)
+            
+            maps[i] = np.where(valid_y[:, np.newaxis] & valid_x[np.newaxis, :],
+                               src_y[:, np.newaxis] * src_width + src_x[np.newaxis, :], -1)
+        return maps
+    
+    @staticmethod
+    def _nearest_resize_indices(src_length: int, dst_length: int) -> np.ndarray:
+        """NEARESTリサイズで各出力画素が参照する元インデックス"""
+        return nearest_resize_indices(src_length, dst_length)
+    
+    @staticmethod
+    def frames_from_array(frames: np.ndarray) -> FrameStack:
+        """(F, H, W, C) のフレーム配列を FrameStack にする（PIL画像は必要になるまで作らない）"""
+        return FrameStack(frames)
@@ -3,15 +3,99 @@ Pixa - エフェクト系アニメーション
 """
 import math
 import random
+import threading
+from collections import OrderedDict
 import numpy as np
-from PIL import Image, ImageEnhance, ImageDraw
-from typing import List
+from PIL import Image, ImageDraw
+from typing import Callable, Hashable, Iterator, List, Union
 import logging
 
+from utils.frame_stack import FrameStack
 from .animation_base import AnimationBase
+from .particle_system import ParticleSystem
 
 logger = logging.getLogger(__name__)
 
+# サンプリングマップのキャッシュ上限の既定値（サービス層が Config で上書きする）
+WAVE_MAP_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def _compute_wave_distortion_index_maps(width: int, height: int, frame_count: int) -> np.ndarray:
+    """波状歪みのサンプリングマップ (F, H, W) を事前計算"""
+    xs = np.arange(width)
+    ys = np.arange(height)
+    index_maps = np.empty((frame_count, height, width), dtype=np.int32)
+    
+    for i in range(frame_count):
+        # 行・列ごとのオフセット（math.sin + int で従来実装と同一の丸め）
+        row_shift = np.array([int(6 * math.sin(2 * math.pi * (y / 25 + i / frame_count))) for y in range(height)])
+        col_shift = np.array([int(3 * math.sin(2 * math.pi * (x / 35 + i / frame_count))) for x in range(width)])
+        
+        # 境界チェック
+        wave_x = np.clip(xs[np.newaxis, :] + row_shift[:, np.newaxis], 0, width - 1)
+        wave_y = np.clip(ys[:, np.newaxis] + col_shift[np.newaxis, :], 0, height - 1)
+        
+        index_maps[i] = wave_y * width + wave_x
+    
+    index_maps.flags.writeable = False
+    return index_maps
+
+
+class IndexMapCache:
+    """サンプリングマップのLRUキャッシュ（配列のバイト数で容量を管理）"""
+    
+    def __init__(self, memory_budget_bytes: int):
+        self.memory_budget_bytes = memory_budget_bytes
+        self._maps: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+    
+    def set_budget(self, memory_budget_bytes: int):
+        """容量を変更（超えた分は古い順に削除）"""
+        with self._lock:
+            self.memory_budget_bytes = memory_budget_bytes
+            self._evict_locked()
+    
+    def get_or_create(self, key: Hashable, create: Callable[[], np.ndarray]) -> np.ndarray:
+        """キャッシュにあれば返し、なければ作成して保存（予算を超えた分は古い順に削除）"""
+        with self._lock:
+            maps = self._maps.get(key)
+            if maps is not None:
+                self._maps.move_to_end(key)
+                return maps
+        
+        maps = create()
+        if maps.nbytes > self.memory_budget_bytes:
+            return maps
+        
+        with self._lock:
+            previous = self._maps.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= previous.nbytes
+            
+            self._maps[key] = maps
+            self._memory_bytes += maps.nbytes
+            self._evict_locked()
+        return maps
+    
+    def _evict_locked(self):
+        """容量を超えた分を古い順に削除（ロック取得済みで呼ぶ）"""
+        while self._memory_bytes > self.memory_budget_bytes:
+            _, evicted = self._maps.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+
+# 波状歪みのサンプリングマップ（(幅, 高さ, フレーム数) ごと）のキャッシュ
+wave_distortion_map_cache = IndexMapCache(WAVE_MAP_CACHE_BYTES)
+
+
+def _wave_distortion_index_maps(width: int, height: int, frame_count: int) -> np.ndarray:
+    """波状歪みのサンプリングマップ (F, H, W)（wave_distortion_map_cache の容量の範囲でキャッシュ）"""
+    return wave_distortion_map_cache.get_or_create(
+        (width, height, frame_count),
+        lambda: _compute_wave_distortion_index_maps(width, height, frame_count)
+    )
+
 
 class EffectAnimations(AnimationBase):
     """エフェクト系アニメーション生成クラス"""
@@ -25,70 +109,107 @@ class EffectAnimations(AnimationBase):
                      **kwargs) -> List[Image.Image]:
         """エフェクト系アニメーションフレーム生成"""
         
+        try:
+            return list(EffectAnimations.iter_frames(
+                base_image, animation_type, frame_count,
+                pixel_size, palette_size, **kwargs
+            ))
+            
+        except Exception as e:
+            logger.error(f"Effect animation creation failed: {str(e)}")
+            return [base_image]  # エラー時は元画像を返す
+    
+    @staticmethod
+    def iter_frames(base_image: Image.Image,
+                   animation_type: str,
+                   frame_count: int = 8,
+                   pixel_size: int = 8,
+                   palette_size: int = 16,
+                   **kwargs) -> Iterator[Image.Image]:
+        """エフェクト系アニメーションフレーム生成（1枚ずつ返すストリーム版）"""
+        frames = EffectAnimations._generate_frames(base_image, animation_type, frame_count, pixel_size, palette_size)
+        
+        # ピクセルアート処理を適用
+        return EffectAnimations.iter_pixel_art_frames(
+            frames, pixel_size, palette_size,
+            shared_palette=kwargs.get('shared_palette', True)
+        )
+    
+    @staticmethod
+    def create_frame_stack(base_image: Image.Image,
+                          animation_type: str,
+                          frame_count: int = 8,
+                          pixel_size: int = 8,
+                          palette_size: int = 16,
+                          **kwargs) -> FrameStack:
+        """エフェクト系アニメーションフレーム生成（FrameStack 版。PIL画像を経由せずに後処理する）"""
+        frames = EffectAnimations._generate_frames(base_image, animation_type, frame_count, pixel_size, palette_size)
+        
+        # ピクセルアート処理を適用
+        return EffectAnimations.apply_pixel_art_processing_to_stack(
+            frames, pixel_size, palette_size,
+            shared_palette=kwargs.get('shared_palette', True)
+        )
+    
+    @staticmethod
+    def _generate_frames(base_image: Image.Image,
+                        animation_type: str,
+                        frame_count: int,
+                        pixel_size: int,
+                        palette_size: int) -> Union[FrameStack, Iterator[Image.Image]]:
+        """後処理前のフレームを生成（ベクトル化済みのエンジンは FrameStack を返す）"""
+        
         # パラメータ検証
         params = EffectAnimations.validate_parameters(base_image, frame_count, pixel_size, palette_size)
         width, height = params['width'], params['height']
         frame_count = params['frame_count']
         
-        try:
-            # アニメーション種類別の処理
-            if animation_type == "glitch_wave":
-                frames = EffectAnimations._create_glitch_wave_frames(base_image, frame_count, width, height)
-            elif animation_type == "heartbeat":
-                frames = EffectAnimations._create_heartbeat_frames(base_image, frame_count, width, height)
-            elif animation_type == "spiral":
-                frames = EffectAnimations._create_spiral_frames(base_image, frame_count, width, height)
-            elif animation_type == "pixel_rain":
-                frames = EffectAnimations._create_pixel_rain_frames(base_image, frame_count, width, height, pixel_size)
-            elif animation_type == "wave_distortion":
-                frames = EffectAnimations._create_wave_distortion_frames(base_image, frame_count, width, height)
-            elif animation_type == "explode_reassemble":
-                frames = EffectAnimations._create_explode_reassemble_frames(base_image, frame_count, width, height)
-            elif animation_type == "split_merge":
-                frames = EffectAnimations._create_split_merge_frames(base_image, frame_count, width, height)
-            elif animation_type == "electric_shock":
-                frames = EffectAnimations._create_electric_shock_frames(base_image, frame_count, width, height)
-            elif animation_type == "rubberband":
-                frames = EffectAnimations._create_rubberband_frames(base_image, frame_count, width, height)
-            else:
-                # デフォルト: heartbeat
-                frames = EffectAnimations._create_heartbeat_frames(base_image, frame_count, width, height)
+        # アニメーション種類別の処理
+        if animation_type == "glitch_wave":
+            frames = EffectAnimations._create_glitch_wave_frames(base_image, frame_count, width, height)
+        elif animation_type == "heartbeat":
+            frames = EffectAnimations._create_heartbeat_frames(base_image, frame_count, width, height)
+        elif animation_type == "spiral":
+            frames = EffectAnimations._create_spiral_frames(base_image, frame_count, width, height)
+        elif animation_type == "pixel_rain":
+            frames = EffectAnimations._create_pixel_rain_frames(base_image, frame_count, width, height, pixel_size)
+        elif animation_type == "wave_distortion":
+            frames = EffectAnimations._create_wave_distortion_frames(base_image, frame_count, width, height)
+        elif animation_type == "explode_reassemble":
+            frames = EffectAnimations._create_explode_reassemble_frames(base_image, frame_count, width, height)
+        elif animation_type == "split_merge":
+            frames = EffectAnimations._create_split_merge_frames(base_image, frame_count, width, height)
+        elif animation_type == "electric_shock":
+            frames = EffectAnimations._create_electric_shock_frames(base_image, frame_count, width, height)
+        elif animation_type == "rubberband":
+            frames = EffectAnimations._create_rubberband_frames(base_image, frame_count, width, height)
+        else:
+            # デフォルト: heartbeat
+            frames = EffectAnimations._create_heartbeat_frames(base_image, frame_count, width, height)
             
-            # ピクセルアート処理を適用
-            return EffectAnimations.apply_pixel_art_processing_to_frames(frames, pixel_size, palette_size)
-            
-        except Exception as e:
-            logger.error(f"Effect animation creation failed: {str(e)}")
-            return [base_image]  # エラー時は元画像を返す
+        return frames
     
     @staticmethod
-    def _create_glitch_wave_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> List[Image.Image]:
+    def _create_glitch_wave_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> FrameStack:
         """グリッチウェーブフレーム生成"""
-        frames = []
+        row_shifts = np.zeros((frame_count, height), dtype=np.int32)
         
         for i in range(frame_count):
-            frame = base_image.copy()
-            pixels = np.array(frame)
-            
-            # グリッチパターン
+            # グリッチパターン（8行単位の横ずれ）
             for y in range(0, height, 8):
                 shift = int(8 * math.sin(2 * math.pi * (i / frame_count + y / height)))
                 if random.random() > 0.7:  # ランダムグリッチ
                     shift += random.randint(-15, 15)
                 
-                if y < height:
-                    pixels[y:min(y+8, height)] = np.roll(pixels[y:min(y+8, height)], shift, axis=1)
-            
-            frame = Image.fromarray(pixels.astype('uint8'))
-            frames.append(frame)
+                row_shifts[i, y:min(y+8, height)] = shift
         
-        return frames
+        pixels = np.array(base_image.convert('RGB'))
+        sample_maps = EffectAnimations.create_row_shift_maps(row_shifts, width)
+        return EffectAnimations.frames_from_array(EffectAnimations.apply_sampling_maps(pixels, sample_maps))
     
     @staticmethod
-    def _create_heartbeat_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> List[Image.Image]:
+    def _create_heartbeat_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> Iterator[Image.Image]:
         """ハートビートフレーム生成"""
-        frames = []
-        
         for i in range(frame_count):
             t = i / frame_count
             
@@ -114,15 +235,11 @@ class EffectAnimations(AnimationBase):
             y_offset = (height - new_size[1]) // 2
             frame.paste(scaled, (x_offset, y_offset))
             
-            frames.append(frame)
-        
-        return frames
+            yield frame
     
     @staticmethod
-    def _create_spiral_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> List[Image.Image]:
+    def _create_spiral_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> Iterator[Image.Image]:
         """スパイラルフレーム生成"""
-        frames = []
-        
         for i in range(frame_count):
             t = i / frame_count
             angle = 360 * t * 2
@@ -144,91 +261,73 @@ class EffectAnimations(AnimationBase):
             y_offset = (height - new_size[1]) // 2
             final_frame.paste(frame, (x_offset, y_offset))
             
-            frames.append(final_frame)
-        
-        return frames
+            yield final_frame
     
     @staticmethod
-    def _create_pixel_rain_frames(base_image: Image.Image, frame_count: int, width: int, height: int, pixel_size: int) -> List[Image.Image]:
+    def _create_pixel_rain_frames(base_image: Image.Image, frame_count: int, width: int, height: int, pixel_size: int) -> FrameStack:
         """ピクセルレインフレーム生成"""
-        frames = []
+        # グリッドの各ピクセルを粒子にする（暗すぎるピクセルは除外）
+        grid = np.asarray(base_image)[0:height:pixel_size, 0:width:pixel_size]
+        brightness = grid.reshape(grid.shape[0], grid.shape[1], -1).sum(axis=-1, dtype=np.int64)
+        colors = np.asarray(base_image.convert('RGB'))[0:height:pixel_size, 0:width:pixel_size]
+        ys, xs = np.nonzero(brightness > 30)
+        
+        # 粒子ごとに (fall_delay, fall_speed) の順で乱数を引く（fall_speed は未使用だが乱数列を保つ）
+        draws = np.array([random.random() for _ in range(2 * len(ys))]).reshape(-1, 2)
+        fall_delay = 0.4 * draws[:, 0]
         
-        # ピクセル情報を収集
-        pixels_data = []
-        for y in range(0, height, pixel_size):
-            for x in range(0, width, pixel_size):
-                color = base_image.getpixel((min(x, width-1), min(y, height-1)))
-                if sum(color) > 30:  # 暗すぎるピクセルは除外
-                    pixels_data.append({
-                        'x': x, 'y': y, 'color': color,
-                        'fall_delay': random.uniform(0, 0.4),
-                        'fall_speed': random.uniform(0.8, 2.0)
-                    })
+        # y - (y + height) * (1 - (1 - p) ** 2) を速度・加速度の形にしたもの
+        origin_y = ys * pixel_size
+        fall_distance = (origin_y + height).astype(np.float64)
+        particles = ParticleSystem(
+            origins=np.stack([xs * pixel_size, origin_y], axis=-1),
+            velocities=np.stack([np.zeros(len(ys)), -2 * fall_distance], axis=-1),
+            accelerations=np.stack([np.zeros(len(ys)), fall_distance], axis=-1),
+            colors=colors[ys, xs],
+            size=pixel_size + 1  # draw.rectangle は両端を含む
+        )
         
+        frames = np.zeros((frame_count, height, width, 3), dtype=np.uint8)
         for i in range(frame_count):
-            frame = EffectAnimations.create_safe_frame(base_image, width, height)
-            draw = ImageDraw.Draw(frame)
             t = i / frame_count
-            
-            for pixel in pixels_data:
-                if t > pixel['fall_delay']:
-                    fall_progress = (t - pixel['fall_delay']) / (1 - pixel['fall_delay'])
-                    current_y = pixel['y'] - (pixel['y'] + height) * (1 - (1 - fall_progress) ** 2)
-                    
-                    if current_y >= -pixel_size:
-                        draw.rectangle([
-                            pixel['x'], int(current_y),
-                            pixel['x'] + pixel_size, int(current_y) + pixel_size
-                        ], fill=pixel['color'])
-            
-            frames.append(frame)
+            fall_progress = (t - fall_delay) / (1 - fall_delay)
+            active = (t > fall_delay) & (particles.positions(fall_progress)[:, 1] >= -pixel_size)
+            particles.render(frames[i], fall_progress, active)
         
-        return frames
+        return EffectAnimations.frames_from_array(frames)
     
     @staticmethod
-    def _create_wave_distortion_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> List[Image.Image]:
+    def _create_wave_distortion_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> FrameStack:
         """波状歪みフレーム生成"""
-        frames = []
-        
-        for i in range(frame_count):
-            frame = base_image.copy()
-            pixels = np.array(frame)
-            new_pixels = np.zeros_like(pixels)
-            
-            for y in range(height):
-                for x in range(width):
-                    # 波の歪み計算
-                    wave_x = x + int(6 * math.sin(2 * math.pi * (y / 25 + i / frame_count)))
-                    wave_y = y + int(3 * math.sin(2 * math.pi * (x / 35 + i / frame_count)))
-                    
-                    # 境界チェック
-                    wave_x = max(0, min(width - 1, wave_x))
-                    wave_y = max(0, min(height - 1, wave_y))
-                    
-                    new_pixels[y, x] = pixels[wave_y, wave_x]
-            
-            frame = Image.fromarray(new_pixels.astype('uint8'))
-            frames.append(frame)
-        
-        return frames
+        pixels = np.array(base_image.convert('RGB'))
+        sample_maps = _wave_distortion_index_maps(width, height, frame_count)
+        return EffectAnimations.frames_from_array(EffectAnimations.apply_sampling_maps(pixels, sample_maps))
     
     @staticmethod
-    def _create_explode_reassemble_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> List[Image.Image]:
-        """爆発・再集合フレーム生成"""
-        frames = []
+    def _create_explode_reassemble_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> Iterator[Image.Image]:
+        """
+        爆発・再集合フレーム生成
+        
+        パーツの位置・回転角は ParticleSystem でまとめて計算し、パーツ画像の回転と貼り付けだけ PIL で行う
+        """
         part_size = 24
         
         # パーツ分割
         parts = []
+        origins = []
         for y in range(0, height, part_size):
             for x in range(0, width, part_size):
-                part = base_image.crop((x, y, min(x + part_size, width), min(y + part_size, height)))
-                parts.append({
-                    'image': part, 'original_x': x, 'original_y': y,
-                    'velocity_x': random.uniform(-25, 25),
-                    'velocity_y': random.uniform(-30, -5),
-                    'rotation': random.uniform(-30, 30)
-                })
+                parts.append(base_image.crop((x, y, min(x + part_size, width), min(y + part_size, height))))
+                origins.append((x, y))
+        
+        # パーツごとに (velocity_x, velocity_y, rotation) の順で乱数を引く
+        draws = np.array([random.random() for _ in range(3 * len(parts))]).reshape(-1, 3)
+        particles = ParticleSystem(
+            origins=origins,
+            velocities=np.stack([-25 + 50 * draws[:, 0], -30 + 25 * draws[:, 1]], axis=-1),
+            accelerations=np.tile([0.0, 9.8 * 8], (len(parts), 1)),
+            angular_velocities=-30 + 60 * draws[:, 2]
+        )
         
         for i in range(frame_count):
             frame = EffectAnimations.create_safe_frame(base_image, width, height)
@@ -242,26 +341,16 @@ class EffectAnimations(AnimationBase):
                 progress = (t - 0.5) * 2
                 ease_t = 1 - EffectAnimations.create_ease_in_out(progress)
             
-            for part in parts:
-                x = part['original_x'] + part['velocity_x'] * ease_t
-                y = part['original_y'] + part['velocity_y'] * ease_t + 9.8 * ease_t * ease_t * 8
-                rotation = part['rotation'] * ease_t
-                
-                # パーツ配置
-                try:
-                    rotated_part = part['image'].rotate(rotation, expand=False)
-                    frame.paste(rotated_part, (int(x), int(y)))
-                except:
-                    pass
+            # パーツ配置（位置は int() と同じく0方向に切り捨てる）
+            positions = np.trunc(particles.positions(ease_t)).astype(np.int64).tolist()
+            for part, (x, y), rotation in zip(parts, positions, particles.angles(ease_t).tolist()):
+                frame.paste(part.rotate(rotation, expand=False), (x, y))
             
-            frames.append(frame)
-        
-        return frames
+            yield frame
     
     @staticmethod
-    def _create_split_merge_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> List[Image.Image]:
+    def _create_split_merge_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> Iterator[Image.Image]:
         """分裂・結合フレーム生成"""
-        frames = []
         half_w, half_h = width // 2, height // 2
         
         parts = [
@@ -297,20 +386,24 @@ class EffectAnimations(AnimationBase):
                 except:
                     pass
             
-            frames.append(frame)
-        
-        return frames
+            yield frame
     
     @staticmethod
-    def _create_electric_shock_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> List[Image.Image]:
+    def _create_electric_shock_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> FrameStack:
         """電撃エフェクトフレーム生成"""
-        frames = []
+        base_rgb = base_image.convert('RGB')
+        base_pixels = np.array(base_rgb)
+        sources = np.empty((frame_count, height, width, 3), dtype=np.uint8)
+        row_shifts = np.zeros((frame_count, height), dtype=np.int32)
+        shocked = np.zeros(frame_count, dtype=bool)
         
         for i in range(frame_count):
-            frame = base_image.copy()
+            sources[i] = base_pixels
             
             # 稲妻の生成
             if random.random() > 0.4:
+                shocked[i] = True
+                frame = base_rgb.copy()
                 draw = ImageDraw.Draw(frame)
                 
                 # 稲妻のパス
@@ -325,29 +418,27 @@ class EffectAnimations(AnimationBase):
                 # 稲妻を描画
                 for j in range(len(points) - 1):
                     draw.line([points[j], points[j+1]], fill=(255, 255, 150), width=random.randint(1, 3))
+                sources[i] = np.asarray(frame)
                 
-                # 画像を少し歪める
-                if len(points) > 1:
-                    pixels = np.array(frame)
-                    for point in points:
-                        px, py = point
-                        if 0 <= py < height:
-                            shift = random.randint(-5, 5)
-                            pixels[py:min(py+5, height)] = np.roll(pixels[py:min(py+5, height)], shift, axis=1)
-                    frame = Image.fromarray(pixels.astype('uint8'))
-                
-                # 明度を上げる
-                enhancer = ImageEnhance.Brightness(frame)
-                frame = enhancer.enhance(1.3)
-            
-            frames.append(frame)
+                # 画像を少し歪める（稲妻の節ごとに5行ずらす）
+                for px, py in points:
+                    if 0 <= py < height:
+                        row_shifts[i, py:min(py+5, height)] = random.randint(-5, 5)
         
-        return frames
+        sample_maps = EffectAnimations.create_row_shift_maps(row_shifts, width)
+        frames = EffectAnimations.apply_sampling_maps(sources, sample_maps)
+        
+        # 明度を上げる（ImageEnhance.Brightness(1.3) と同じく float32 で掛けて切り捨て）
+        brightened = frames[shocked].astype(np.float32) * np.float32(1.3)
+        frames[shocked] = np.minimum(brightened, 255).astype(np.uint8)
+        
+        return EffectAnimations.frames_from_array(frames)
     
     @staticmethod
-    def _create_rubberband_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> List[Image.Image]:
+    def _create_rubberband_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> FrameStack:
         """ラバーバンドフレーム生成"""
-        frames = []
+        sizes = []
+        offsets = []
         
         for i in range(frame_count):
             t = i / frame_count
@@ -356,19 +447,14 @@ class EffectAnimations(AnimationBase):
             stretch_x = 1 + 0.25 * math.sin(2 * math.pi * t)
             stretch_y = 1 - 0.15 * math.sin(2 * math.pi * t)
             
-            # スケール適用
+            # スケールと中央配置
             new_size = (int(width * stretch_x), int(height * stretch_y))
-            frame = base_image.resize(new_size, Image.NEAREST)
-            
-            # 中央配置
-            final_frame = EffectAnimations.create_safe_frame(base_image, width, height)
-            x_offset = (width - new_size[0]) // 2
-            y_offset = (height - new_size[1]) // 2
-            final_frame.paste(frame, (x_offset, y_offset))
-            
-            frames.append(final_frame)
+            sizes.append(new_size)
+            offsets.append(((width - new_size[0]) // 2, (height - new_size[1]) // 2))
         
-        return frames
+        pixels = np.array(base_image.convert('RGB'))
+        sample_maps = EffectAnimations.create_resize_paste_maps(sizes, offsets, width, height, width, height)
+        return EffectAnimations.frames_from_array(EffectAnimations.apply_sampling_maps(pixels, sample_maps))
 
 
 # サポートされているエフェクトアニメーション種類
@@ -5,9 +5,10 @@ import math
 import random
 import numpy as np
 from PIL import Image, ImageEnhance, ImageDraw
-from typing import List
+from typing import Iterator, List
 import logging
 
+from utils.frame_stack import FrameStack
 from .animation_base import AnimationBase
 
 logger = logging.getLogger(__name__)
@@ -25,41 +26,83 @@ class GameAnimations(AnimationBase):
                      **kwargs) -> List[Image.Image]:
         """ゲーム開発向けアニメーションフレーム生成"""
         
+        try:
+            return list(GameAnimations.iter_frames(
+                base_image, animation_type, frame_count,
+                pixel_size, palette_size, **kwargs
+            ))
+            
+        except Exception as e:
+            logger.error(f"Game animation creation failed: {str(e)}")
+            return [base_image]  # エラー時は元画像を返す
+    
+    @staticmethod
+    def iter_frames(base_image: Image.Image,
+                   animation_type: str,
+                   frame_count: int = 8,
+                   pixel_size: int = 8,
+                   palette_size: int = 16,
+                   **kwargs) -> Iterator[Image.Image]:
+        """ゲーム開発向けアニメーションフレーム生成（1枚ずつ返すストリーム版）"""
+        frames = GameAnimations._generate_frames(base_image, animation_type, frame_count, pixel_size, palette_size)
+        
+        # ピクセルアート処理を適用
+        return GameAnimations.iter_pixel_art_frames(
+            frames, pixel_size, palette_size,
+            shared_palette=kwargs.get('shared_palette', True)
+        )
+    
+    @staticmethod
+    def create_frame_stack(base_image: Image.Image,
+                          animation_type: str,
+                          frame_count: int = 8,
+                          pixel_size: int = 8,
+                          palette_size: int = 16,
+                          **kwargs) -> FrameStack:
+        """ゲーム開発向けアニメーションフレーム生成（FrameStack 版。PIL画像を経由せずに後処理する）"""
+        frames = GameAnimations._generate_frames(base_image, animation_type, frame_count, pixel_size, palette_size)
+        
+        # ピクセルアート処理を適用
+        return GameAnimations.apply_pixel_art_processing_to_stack(
+            frames, pixel_size, palette_size,
+            shared_palette=kwargs.get('shared_palette', True)
+        )
+    
+    @staticmethod
+    def _generate_frames(base_image: Image.Image,
+                        animation_type: str,
+                        frame_count: int,
+                        pixel_size: int,
+                        palette_size: int) -> Iterator[Image.Image]:
+        """後処理前のフレームを1枚ずつ生成"""
+        
         # パラメータ検証
         params = GameAnimations.validate_parameters(base_image, frame_count, pixel_size, palette_size)
         width, height = params['width'], params['height']
         frame_count = params['frame_count']
         
-        try:
-            # アニメーション種類別の処理
-            if animation_type == "walk_cycle":
-                frames = GameAnimations._create_walk_cycle_frames(base_image, frame_count, width, height)
-            elif animation_type == "idle_breathing":
-                frames = GameAnimations._create_idle_breathing_frames(base_image, frame_count, width, height)
-            elif animation_type == "attack_slash":
-                frames = GameAnimations._create_attack_slash_frames(base_image, frame_count, width, height)
-            elif animation_type == "jump_landing":
-                frames = GameAnimations._create_jump_landing_frames(base_image, frame_count, width, height)
-            elif animation_type == "walk_4direction":
-                frames = GameAnimations._create_walk_4direction_frames(base_image, frame_count, width, height)
-            elif animation_type == "damage_flash":
-                frames = GameAnimations._create_damage_flash_frames(base_image, frame_count, width, height)
-            else:
-                # デフォルト: idle_breathing
-                frames = GameAnimations._create_idle_breathing_frames(base_image, frame_count, width, height)
-            
-            # ピクセルアート処理を適用
-            return GameAnimations.apply_pixel_art_processing_to_frames(frames, pixel_size, palette_size)
+        # アニメーション種類別の処理
+        if animation_type == "walk_cycle":
+            frames = GameAnimations._create_walk_cycle_frames(base_image, frame_count, width, height)
+        elif animation_type == "idle_breathing":
+            frames = GameAnimations._create_idle_breathing_frames(base_image, frame_count, width, height)
+        elif animation_type == "attack_slash":
+            frames = GameAnimations._create_attack_slash_frames(base_image, frame_count, width, height)
+        elif animation_type == "jump_landing":
+            frames = GameAnimations._create_jump_landing_frames(base_image, frame_count, width, height)
+        elif animation_type == "walk_4direction":
+            frames = GameAnimations._create_walk_4direction_frames(base_image, frame_count, width, height)
+        elif animation_type == "damage_flash":
+            frames = GameAnimations._create_damage_flash_frames(base_image, frame_count, width, height)
+        else:
+            # デフォルト: idle_breathing
+            frames = GameAnimations._create_idle_breathing_frames(base_image, frame_count, width, height)
             
-        except Exception as e:
-            logger.error(f"Game animation creation failed: {str(e)}")
-            return [base_image]  # エラー時は元画像を返す
+        return frames
     
     @staticmethod
-    def _create_walk_cycle_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> List[Image.Image]:
+    def _create_walk_cycle_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> Iterator[Image.Image]:
         """歩行サイクルフレーム生成"""
-        frames = []
-        
         for i in range(frame_count):
             frame = base_image.copy()
             pixels = np.array(frame)
@@ -97,15 +140,11 @@ class GameAnimations(AnimationBase):
                 pixels = np.roll(pixels, body_bob, axis=0)
             
             frame = Image.fromarray(pixels.astype('uint8'))
-            frames.append(frame)
-        
-        return frames
+            yield frame
     
     @staticmethod
-    def _create_idle_breathing_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> List[Image.Image]:
+    def _create_idle_breathing_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> Iterator[Image.Image]:
         """アイドル（呼吸）フレーム生成"""
-        frames = []
-        
         for i in range(frame_count):
             # 呼吸による微細な変化
             breath_phase = i / frame_count
@@ -127,15 +166,11 @@ class GameAnimations(AnimationBase):
             else:
                 final_frame = base_image.copy()
             
-            frames.append(final_frame)
-        
-        return frames
+            yield final_frame
     
     @staticmethod  
-    def _create_attack_slash_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> List[Image.Image]:
+    def _create_attack_slash_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> Iterator[Image.Image]:
         """攻撃（斬撃）フレーム生成"""
-        frames = []
-        
         for i in range(frame_count):
             frame = base_image.copy()
             t = i / frame_count
@@ -178,15 +213,11 @@ class GameAnimations(AnimationBase):
                     lambda img: img.rotate(rotation, expand=False, fillcolor=(0, 0, 0))
                 )
             
-            frames.append(frame)
-        
-        return frames
+            yield frame
     
     @staticmethod
-    def _create_jump_landing_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> List[Image.Image]:
+    def _create_jump_landing_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> Iterator[Image.Image]:
         """ジャンプ・着地フレーム生成"""
-        frames = []
-        
         for i in range(frame_count):
             t = i / frame_count
             
@@ -229,16 +260,14 @@ class GameAnimations(AnimationBase):
                 y_pos = max(0, (height - new_height) + y_offset)
                 
                 final_frame.paste(scaled_frame, (x_pos, y_pos))
-                frames.append(final_frame)
-            except:
-                frames.append(base_image.copy())
-        
-        return frames
+            except Exception:
+                final_frame = base_image.copy()
+            
+            yield final_frame
     
     @staticmethod
-    def _create_walk_4direction_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> List[Image.Image]:
+    def _create_walk_4direction_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> Iterator[Image.Image]:
         """4方向歩行フレーム生成"""
-        frames = []
         frames_per_direction = max(frame_count // 4, 1)
         
         for i in range(frame_count):
@@ -270,15 +299,11 @@ class GameAnimations(AnimationBase):
                     pixels[y] = np.roll(pixels[y], foot_movement, axis=0)
                 frame = Image.fromarray(pixels.astype('uint8'))
             
-            frames.append(frame)
-        
-        return frames
+            yield frame
     
     @staticmethod
-    def _create_damage_flash_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> List[Image.Image]:
+    def _create_damage_flash_frames(base_image: Image.Image, frame_count: int, width: int, height: int) -> Iterator[Image.Image]:
         """ダメージフラッシュフレーム生成"""
-        frames = []
-        
         for i in range(frame_count):
             frame = base_image.copy()
             t = i / frame_count
@@ -307,9 +332,7 @@ class GameAnimations(AnimationBase):
                     frame_array[:, :, 0] = np.minimum(255, frame_array[:, :, 0] + flash_add)
                     frame = Image.fromarray(frame_array.astype('uint8'))
             
-            frames.append(frame)
-        
-        return frames
+            yield frame
 
 
 # サポートされているゲームアニメーション種類
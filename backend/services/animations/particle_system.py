@@ -0,0 +1,110 @@
+"""
+Pixa - パーティクルシステム
+位置・速度・色を粒子ごとの NumPy 配列（構造体配列）で持ち、全粒子をまとめて動かして描画する
+"""
+import numpy as np
+from typing import Optional, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ParticleSystem:
+    """
+    構造体配列（SoA）のパーティクル群
+
+    粒子 i の左上の位置は進行度 p に対して origins[i] + velocities[i] * p + accelerations[i] * p * p、
+    回転角（度）は angular_velocities[i] * p。colors を持つ粒子群は一辺 size の単色の正方形として
+    render で描画でき、PIL の draw.rectangle を粒子の順に重ねたときと同じ結果になる
+    （後の粒子が上に描かれる）。画像の粒子は positions / angles を使って呼び出し側で描く
+    """
+
+    def __init__(self,
+                 origins: np.ndarray,
+                 velocities: np.ndarray,
+                 colors: Optional[np.ndarray] = None,
+                 accelerations: Optional[np.ndarray] = None,
+                 angular_velocities: Optional[np.ndarray] = None,
+                 size: int = 1):
+        """
+        Args:
+            origins: 進行度 0 での左上の位置 (N, 2)（x, y）
+            velocities: 進行度あたりの移動量 (N, 2)
+            colors: 粒子の色 (N, 3)。None なら render は使えない
+            accelerations: 進行度の2乗に掛かる移動量 (N, 2)。None なら等速
+            angular_velocities: 進行度あたりの回転角 (N,)。None なら回転しない
+            size: 正方形の一辺
+        """
+        self.origins = np.asarray(origins, dtype=np.float64)
+        count = len(self.origins)
+        self.velocities = np.asarray(velocities, dtype=np.float64)
+        self.accelerations = (np.zeros((count, 2)) if accelerations is None
+                              else np.asarray(accelerations, dtype=np.float64))
+        self.angular_velocities = (np.zeros(count) if angular_velocities is None
+                                   else np.asarray(angular_velocities, dtype=np.float64))
+        self.colors = None if colors is None else np.asarray(colors, dtype=np.uint8).reshape(count, -1)
+        self.size = size
+
+        # 画素を1要素にまとめた1次元配列（まとめて取り出し・書き込みするため）
+        self._pixels = None if self.colors is None else ParticleSystem._pack_pixels(self.colors)
+
+    def __len__(self) -> int:
+        return len(self.origins)
+
+    @staticmethod
+    def _pack_pixels(pixels: np.ndarray) -> np.ndarray:
+        """(..., C) の uint8 画素を C バイトの void 型の1次元配列として見る（コピーしない）"""
+        pixels = np.ascontiguousarray(pixels)
+        return pixels.reshape(-1, pixels.shape[-1]).view(f'V{pixels.shape[-1]}').ravel()
+
+    def positions(self, progress: Union[float, np.ndarray]) -> np.ndarray:
+        """進行度（スカラーまたは粒子ごとの (N,)）での左上の位置 (N, 2)"""
+        progress = np.asarray(progress, dtype=np.float64)
+        if progress.ndim:
+            progress = progress[:, np.newaxis]
+        return self.origins + self.velocities * progress + self.accelerations * progress * progress
+
+    def angles(self, progress: Union[float, np.ndarray]) -> np.ndarray:
+        """進行度（スカラーまたは粒子ごとの (N,)）での回転角 (N,)"""
+        return self.angular_velocities * np.asarray(progress, dtype=np.float64)
+
+    def render(self,
+               canvas: np.ndarray,
+               progress: Union[float, np.ndarray],
+               active: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        進行度 progress の全粒子を canvas (H, W, 3) に重ねて描画（canvas を書き換えて返す）
+
+        canvas は C 連続の配列であること。位置は int() と同じく0方向に切り捨てる。
+        active で描画する粒子を絞れる
+        """
+        if self._pixels is None:
+            raise ValueError("ParticleSystem.render requires colors")
+
+        height, width = canvas.shape[:2]
+        indices = np.arange(len(self)) if active is None else np.flatnonzero(active)
+        if not len(indices):
+            return canvas
+
+        positions = self.positions(progress)[indices]
+        left = np.trunc(positions[:, 0]).astype(np.int32)
+        top = np.trunc(positions[:, 1]).astype(np.int32)
+
+        # 粒子ごとの描画範囲の局所座標（(n, size, size) にブロードキャストする）
+        local_x = np.arange(self.size, dtype=np.int32)[np.newaxis, np.newaxis, :]
+        local_y = np.arange(self.size, dtype=np.int32)[np.newaxis, :, np.newaxis]
+        dst_x = left[:, np.newaxis, np.newaxis] + local_x
+        dst_y = top[:, np.newaxis, np.newaxis] + local_y
+        inside = (dst_x >= 0) & (dst_x < width) & (dst_y >= 0) & (dst_y < height)
+
+        destinations = (dst_y * width + dst_x)[inside]
+        particle = np.broadcast_to(np.arange(len(indices), dtype=np.int32)[:, np.newaxis, np.newaxis], inside.shape)[inside]
+
+        # 同じ画素に複数の粒子が重なる場合は後の粒子を残す
+        owner = np.full(height * width, -1, dtype=np.int32)
+        np.maximum.at(owner, destinations, particle)
+        visible = owner[destinations] == particle
+
+        sources = indices[particle[visible]]
+        ParticleSystem._pack_pixels(canvas)[destinations[visible]] = self._pixels[sources]
+        return canvas
@@ -0,0 +1,221 @@
+"""
+Pixa - アニメーション一括生成サービス
+アニメーション種類ごとにワーカープロセスへ分散して並列生成
+"""
+import itertools
+import multiprocessing
+import os
+import threading
+import numpy as np
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from PIL import Image
+from typing import Dict, Iterator, List, Optional, Tuple
+import logging
+
+from .animation_service import animation_service
+from .gif_optimization_service import gif_optimization_service
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+
+def render_animation_gif(base_image: Image.Image,
+                         animation_type: str,
+                         frame_count: int,
+                         pixel_size: int,
+                         palette_size: int,
+                         duration: int,
+                         tolerance: int,
+                         render_mode: str = 'full') -> Dict:
+    """
+    1種類のアニメーションを生成してGIFにエンコード
+
+    render_mode が 'sprite' ならスプライト解像度で生成し、エンコード直前に1回だけ拡大する
+    """
+    # フレームは1枚ずつ生成・エンコードし、全フレームをリストに溜めない
+    frames = animation_service.iter_animation_frames(
+        base_image=base_image,
+        animation_type=animation_type,
+        frame_count=frame_count,
+        pixel_size=pixel_size,
+        palette_size=palette_size,
+        sprite_resolution=render_mode == 'sprite'
+    )
+
+    if render_mode == 'sprite':
+        frames = animation_service.iter_upscaled_frames(frames, base_image.size)
+
+    gif_data, _ = gif_optimization_service.encode_optimized_gif_stream(
+        frames=frames,
+        duration=duration,
+        loop=0,
+        tolerance=tolerance
+    )
+
+    if gif_data is None:
+        return {'success': False, 'error': 'GIF生成に失敗しました'}
+
+    return {'success': True, 'gif_data': gif_data, 'file_size': len(gif_data)}
+
+
+def _render_from_shared_memory(shm_name: str,
+                               shape: Tuple[int, ...],
+                               animation_type: str,
+                               frame_count: int,
+                               pixel_size: int,
+                               palette_size: int,
+                               duration: int,
+                               tolerance: int,
+                               render_mode: str) -> Tuple[str, Dict]:
+    """ワーカープロセス側: 共有メモリのベース画像からアニメーションを生成"""
+    try:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        try:
+            pixels = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+            base_image = Image.fromarray(pixels.copy(), 'RGB')
+            del pixels
+        finally:
+            shm.close()
+
+        return animation_type, render_animation_gif(
+            base_image, animation_type, frame_count, pixel_size, palette_size, duration, tolerance, render_mode
+        )
+
+    except Exception as e:
+        return animation_type, {'success': False, 'error': str(e)}
+
+
+class BatchAnimationService:
+    """アニメーション一括生成サービス"""
+
+    def __init__(self, pool_size: Optional[int] = None):
+        """
+        Args:
+            pool_size: ワーカープロセス数（None なら CPU コア数）。プールはこのサイズで1回だけ作る
+        """
+        self.pool_size = pool_size or os.cpu_count() or 1
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """
+        ワーカープール（リクエスト間で再利用）を取得
+
+        スレッドで動く Flask プロセスから fork すると、ロックや torch の状態を引き継いで
+        しまうため spawn で起動する
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.pool_size,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _reset_executor(self, executor: Optional[ProcessPoolExecutor] = None):
+        """
+        ワーカープールを破棄
+
+        executor を指定した場合は、それが現在のプールのときだけ破棄する
+        （別のリクエストが作り直したプールを止めない）
+        """
+        with self._lock:
+            if self._executor is None or (executor is not None and self._executor is not executor):
+                return
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def iter_animation_gifs(self,
+                            base_image: Image.Image,
+                            animation_types: List[str],
+                            frame_count: int = 16,
+                            pixel_size: int = 8,
+                            palette_size: int = 16,
+                            duration: int = 100,
+                            tolerance: int = 3,
+                            max_workers: Optional[int] = None,
+                            render_mode: str = 'full') -> Iterator[Tuple[str, Dict]]:
+        """
+        アニメーションを並列生成し、完成した順に (animation_type, result) を返す
+
+        ベース画像は共有メモリに1回だけ書き込み、各ワーカーはそこから読み出す
+        （タスクごとに画像をpickleしない）。max_workers は共有プールのうちこのリクエストが
+        同時に使うワーカー数で、プールは作り直さず投入するタスク数で制限する。
+        max_workers が1以下なら逐次生成する。
+        render_mode が 'sprite' ならスプライト解像度で生成してからGIFにする
+        """
+        max_workers = min(max_workers or self.pool_size, self.pool_size, len(animation_types))
+        render_args = (frame_count, pixel_size, palette_size, duration, tolerance, render_mode)
+
+        if max_workers <= 1:
+            for animation_type in animation_types:
+                yield animation_type, self._render_safe(base_image, animation_type, *render_args)
+            return
+
+        pixels = np.asarray(base_image.convert('RGB'))
+        shm = shared_memory.SharedMemory(create=True, size=pixels.nbytes)
+        pending = set(animation_types)
+        running = set()
+        executor = None
+
+        try:
+            shared_pixels = np.ndarray(pixels.shape, dtype=np.uint8, buffer=shm.buf)
+            shared_pixels[:] = pixels
+            del shared_pixels
+
+            executor = self._get_executor()
+            queued = iter(animation_types)
+
+            def submit(animation_type: str):
+                running.add(executor.submit(
+                    _render_from_shared_memory, shm.name, pixels.shape, animation_type, *render_args
+                ))
+
+            # 実行中のタスクを max_workers 個までに保つ
+            for animation_type in itertools.islice(queued, max_workers):
+                submit(animation_type)
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.discard(future)
+                    animation_type, result = future.result()
+                    pending.discard(animation_type)
+
+                    next_type = next(queued, None)
+                    if next_type is not None:
+                        submit(next_type)
+
+                    yield animation_type, result
+
+        except BrokenProcessPool as e:
+            logger.error(f"Worker pool broken: {str(e)}")
+            self._reset_executor(executor)
+            # 残りは逐次生成にフォールバック
+            for animation_type in [t for t in animation_types if t in pending]:
+                yield animation_type, self._render_safe(base_image, animation_type, *render_args)
+
+        finally:
+            # 途中で打ち切られた場合は未着手のタスクを取り消す
+            for future in running:
+                future.cancel()
+            shm.close()
+            shm.unlink()
+
+    @staticmethod
+    def _render_safe(base_image: Image.Image, animation_type: str, *render_args) -> Dict:
+        """例外を結果に変換して逐次生成"""
+        try:
+            return render_animation_gif(base_image, animation_type, *render_args)
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def shutdown(self):
+        """ワーカープールを停止"""
+        self._reset_executor()
+
+
+# グローバルサービスインスタンス
+batch_animation_service = BatchAnimationService(Config.BATCH_MAX_WORKERS)
@@ -2,18 +2,378 @@
 Pixa - GIF最適化サービス
 差分合成最適化によるファイルサイズ削減
 """
-import os
+import io
+import math
+import struct
 import numpy as np
-from PIL import Image
-from typing import List, Optional, Tuple
+from PIL import GifImagePlugin, Image
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 import logging
 
+from utils.frame_stack import FrameStack
+
 logger = logging.getLogger(__name__)
 
 
+def changed_bbox(changed_mask: np.ndarray) -> Optional[List[int]]:
+    """変更ピクセルを囲む矩形 [x, y, 幅, 高さ]（変更がなければ None）"""
+    rows = np.flatnonzero(changed_mask.any(axis=1))
+    if not rows.size:
+        return None
+    cols = np.flatnonzero(changed_mask.any(axis=0))
+    return [int(cols[0]), int(rows[0]), int(cols[-1] - cols[0] + 1), int(rows[-1] - rows[0] + 1)]
+
+
+class FrameDiffStats:
+    """フレーム差分の統計（フレームを保持せず、1枚ずつ積み上げられる）"""
+    
+    def __init__(self, tolerance: int):
+        self.tolerance = tolerance
+        self.frame_count = 0
+        self.total_pixels = 0
+        self.changed_pixels = []  # フレーム i (>=1) の変更ピクセル数
+        self.change_ratios = []
+        self.dirty_rects = []  # フレーム i (>=1) の変更ピクセルを囲む矩形 [x, y, 幅, 高さ]（変化なしは None）
+    
+    def add_frame(self, total_pixels: int, changed_mask: Optional[np.ndarray] = None) -> None:
+        """フレーム1枚分の統計を追加（最初のフレームは changed_mask なし）"""
+        if self.frame_count == 0:
+            self.total_pixels = total_pixels
+        self.frame_count += 1
+        
+        if changed_mask is not None:
+            changed = int(np.count_nonzero(changed_mask))
+            self.changed_pixels.append(changed)
+            self.change_ratios.append((changed / self.total_pixels) * 100 if self.total_pixels else 0.0)
+            self.dirty_rects.append(changed_bbox(changed_mask) if changed else None)
+    
+    def to_stats(self) -> dict:
+        """get_optimization_stats 互換の統計情報"""
+        if not self.frame_count:
+            return {}
+        
+        dirty_ratios = [
+            (rect[2] * rect[3] / self.total_pixels) * 100 if rect and self.total_pixels else 0.0
+            for rect in self.dirty_rects
+        ]
+        changed_pixels_stats = [
+            {
+                'frame': i,
+                'changed_pixels': changed,
+                'change_ratio': float(ratio),
+                'dirty_rect': rect,
+                'dirty_ratio': float(dirty_ratio)
+            }
+            for i, (changed, ratio, rect, dirty_ratio) in enumerate(
+                zip(self.changed_pixels, self.change_ratios, self.dirty_rects, dirty_ratios), start=1
+            )
+        ]
+        avg_change_ratio = float(np.mean(self.change_ratios)) if self.change_ratios else 0.0
+        avg_dirty_ratio = float(np.mean(dirty_ratios)) if dirty_ratios else 0.0
+        
+        return {
+            'total_frames': self.frame_count,
+            'total_pixels_per_frame': self.total_pixels,
+            'tolerance': self.tolerance,
+            'average_change_ratio': avg_change_ratio,
+            'average_dirty_ratio': avg_dirty_ratio,
+            'frame_stats': changed_pixels_stats
+        }
+
+
+class FrameDiffResult(FrameDiffStats):
+    """フレーム差分の計算結果（最適化済みフレームと変更ピクセルの統計）"""
+    
+    def __init__(self,
+                 optimized_frames: FrameStack,
+                 changed_masks: np.ndarray,
+                 tolerance: int):
+        super().__init__(tolerance)
+        self.optimized_frames = optimized_frames
+        self.changed_masks = changed_masks  # (F-1, H, W)、フレーム i (>=1) の変更ピクセルマスク
+        
+        width, height = optimized_frames.size
+        for i in range(len(optimized_frames)):
+            self.add_frame(width * height, changed_masks[i - 1] if i else None)
+
+
+class GifStreamWriter:
+    """
+    差分フレームを1枚ずつ受け取ってGIFを組み立てるライター（フレーム間最適化）
+    
+    各フレームは前フレームから変化した矩形だけを、そのオフセット位置に書き出す
+    （disposal=0 で前フレームの上に重ねる）。矩形内でも変化のないピクセルは予約した
+    透明色にするので、LZWに渡る画素が減り、同じ値の連続で圧縮も効く。変化のない
+    フレームは前のフレームの表示時間に加算する。
+    
+    元サイズのフレームは直前の1枚分しか保持しないので、フレームのイテレータを
+    そのまま流せる。グローバルパレットは登場した色を順に登録して作り（使用色が
+    max_colors 以下なら色は変わらない）、ヘッダーは最後に付ける
+    """
+    
+    # 1枚目から色数が多すぎる場合に作るパレットの色数（残りは後続フレームの新色用）
+    FALLBACK_COLORS = 128
+    # 透明色のパレット枠に入れる、どの色とも一致しない色コード
+    TRANSPARENT_CODE = 0xFFFFFFFF
+    
+    def __init__(self, duration: int = 100, loop: int = 0, max_colors: int = 256):
+        self.duration = duration
+        self.loop = loop
+        self.max_colors = max_colors
+        self.size = None
+        self.frame_count = 0  # 受け取ったフレーム数（統合前）
+        self._body = io.BytesIO()
+        self._palette_codes = np.empty(0, dtype=np.uint32)  # 登録順の色 (0xRRGGBB)
+        self._transparent_index = None
+        self._previous_indices = None
+        self._pending = None  # [切り抜いたフレーム, オフセット, 表示時間, 透明色]
+    
+    def add_frame(self, frame: Union[Image.Image, np.ndarray]) -> None:
+        """フレームを1枚追加（PIL画像か (H, W, 3) の uint8 配列）"""
+        is_delta = self._previous_indices is not None
+        if is_delta and self._transparent_index is None and len(self._palette_codes) < self.max_colors:
+            # 2枚目以降の差分用に透明色の枠を1つ確保する
+            self._transparent_index = len(self._palette_codes)
+            self._palette_codes = np.append(self._palette_codes, np.uint32(self.TRANSPARENT_CODE))
+        
+        pixels = frame if isinstance(frame, np.ndarray) else np.asarray(frame.convert('RGB'))
+        indices = self._to_indices(pixels)
+        self.frame_count += 1
+        
+        if not is_delta:
+            self.size = (pixels.shape[1], pixels.shape[0])
+            box = (0, 0) + self.size
+        else:
+            changed = indices != self._previous_indices
+            rect = changed_bbox(changed)
+            if rect is None:
+                self._pending[2] += self.duration
+                return
+            box = (rect[0], rect[1], rect[0] + rect[2], rect[1] + rect[3])
+        
+        self._write_pending()
+        region = indices[box[1]:box[3], box[0]:box[2]].copy()
+        transparency = None
+        if is_delta and self._transparent_index is not None:
+            region[~changed[box[1]:box[3], box[0]:box[2]]] = self._transparent_index
+            transparency = self._transparent_index
+        self._pending = [Image.fromarray(region, 'P'), box[:2], self.duration, transparency]
+        self._previous_indices = indices
+    
+    def getvalue(self) -> Optional[bytes]:
+        """GIFのバイト列を返す（フレームがなければ None）"""
+        if self.size is None:
+            return None
+        
+        self._write_pending()
+        return self._header() + self._body.getvalue() + b';'
+    
+    def _write_pending(self) -> None:
+        """保留中のフレームを書き出す（次のフレームが同じなら表示時間をまとめるため1枚遅らせる）"""
+        if self._pending is None:
+            return
+        
+        region, offset, duration, transparency = self._pending
+        for chunk in GifImagePlugin.getdata(region, offset=offset, duration=duration,
+                                            disposal=0, transparency=transparency):
+            self._body.write(chunk)
+        self._pending = None
+    
+    def _header(self) -> bytes:
+        """論理画面・グローバルパレット・ループ回数のヘッダー"""
+        color_count = max(len(self._palette_codes), 2)
+        table_bits = max(int(math.ceil(math.log2(color_count))) - 1, 0)
+        palette = np.zeros((2 ** (table_bits + 1), 3), dtype=np.uint8)
+        palette[:len(self._palette_codes)] = self._codes_to_rgb(self._palette_codes)
+        if self._transparent_index is not None:
+            palette[self._transparent_index] = 0
+        
+        header = (
+            b'GIF89a'
+            + struct.pack('<HHBBB', self.size[0], self.size[1], 0x80 | table_bits, 0, 0)
+            + palette.tobytes()
+        )
+        if self.loop is not None:
+            header += b'!\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', self.loop) + b'\x00'
+        return header
+    
+    @staticmethod
+    def _rgb_to_codes(pixels: np.ndarray) -> np.ndarray:
+        """(..., 3) のRGBを 0xRRGGBB の色コードにする"""
+        return (
+            (pixels[..., 0].astype(np.uint32) << 16)
+            | (pixels[..., 1].astype(np.uint32) << 8)
+            | pixels[..., 2]
+        )
+    
+    @staticmethod
+    def _codes_to_rgb(codes: np.ndarray) -> np.ndarray:
+        """0xRRGGBB の色コードを (N, 3) のRGBに戻す"""
+        return np.stack([(codes >> 16) & 0xFF, (codes >> 8) & 0xFF, codes & 0xFF], axis=-1).astype(np.uint8)
+    
+    def _lookup(self, codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """色コードをパレット番号に変換し、(番号, パレットに完全一致したか) を返す"""
+        if not len(self._palette_codes):
+            return np.zeros(codes.shape, dtype=np.intp), np.zeros(codes.shape, dtype=bool)
+        
+        order = np.argsort(self._palette_codes)
+        sorted_codes = self._palette_codes[order]
+        positions = np.minimum(np.searchsorted(sorted_codes, codes), len(sorted_codes) - 1)
+        return order[positions], sorted_codes[positions] == codes
+    
+    def _to_indices(self, pixels: np.ndarray) -> np.ndarray:
+        """RGBフレームをグローバルパレットの番号に変換（新しい色はパレットに登録）"""
+        codes = self._rgb_to_codes(pixels)
+        indices, matched = self._lookup(codes)
+        if matched.all():
+            return indices.astype(np.uint8)
+        
+        missing = np.unique(codes[~matched])
+        if len(missing) <= self.max_colors - len(self._palette_codes):
+            self._palette_codes = np.concatenate([self._palette_codes, missing])
+        elif not len(self._palette_codes):
+            # 色数が多すぎる1枚目はメディアンカットで減色したパレットから始める
+            quantized = Image.fromarray(pixels).quantize(
+                colors=self.FALLBACK_COLORS, method=Image.MEDIANCUT, dither=0
+            ).convert('RGB')
+            self._palette_codes = np.unique(self._rgb_to_codes(np.asarray(quantized)))
+        indices, matched = self._lookup(codes)
+        
+        # パレットに入らなかった色は最も近い色に割り当てる
+        if not matched.all():
+            missing, inverse = np.unique(codes[~matched], return_inverse=True)
+            palette = self._codes_to_rgb(self._palette_codes).astype(np.int32)
+            missing_rgb = self._codes_to_rgb(missing).astype(np.int32)
+            nearest = np.empty(len(missing), dtype=np.intp)
+            for start in range(0, len(missing), 4096):
+                block = missing_rgb[start:start + 4096, np.newaxis, :] - palette[np.newaxis, :, :]
+                distances = (block * block).sum(axis=2)
+                if self._transparent_index is not None:
+                    distances[:, self._transparent_index] = np.iinfo(np.int32).max
+                nearest[start:start + 4096] = distances.argmin(axis=1)
+            indices[~matched] = nearest[inverse.reshape(-1)]
+        
+        return indices.astype(np.uint8)
+
+
+class GifSizeEstimator:
+    """
+    差分最適化GIFのサイズを変更ピクセルの統計だけから見積もる（LZWエンコードしない）
+    
+    tolerance ごとに GifStreamWriter が書き出す変化矩形内の変更ピクセル数・透明ピクセル数を
+    数え、数枚だけ実際にエンコードして求めた差分1ピクセルあたりのバイト数を掛ける。
+    フレーム間の差分は最初に1回だけ計算するので、1回の見積もりはマスクの論理演算で済む
+    """
+    
+    # 変化矩形内の透明ピクセルの、変更ピクセルに対する相対コスト（同じ番号が続くのでよく縮む）
+    TRANSPARENT_COST = 0.3
+    # 差分フレーム1枚ごとの固定バイト数（グラフィック制御拡張・イメージ記述子など）
+    FRAME_OVERHEAD = 20
+    
+    def __init__(self, frames: Union[FrameStack, List[Image.Image]], duration: int = 100, loop: int = 0):
+        array = FrameStack.from_images(frames).array
+        self.frame_count = len(array)
+        self._estimates = {}
+        
+        # 連続フレームのRGB最大差分 (F-1, H, W) と、2つ前のフレームとの不一致 (F-2, H, W)
+        diff = np.maximum(array[:-1], array[1:]) - np.minimum(array[:-1], array[1:])
+        self._max_diff = diff.max(axis=-1)
+        self._differs_from_second_previous = GifOptimizationService.compute_changed_mask(array[:-2], array[2:], 0)
+        
+        # 1枚目は単独でエンコードした実サイズを使う
+        self.first_frame_bytes = self._encoded_size(array[:1], duration, loop)
+        self.bytes_per_pixel = 0.0
+        
+        # 差分1ピクセルあたりのバイト数は、最も変化の大きいフレームを前のフレームと
+        # 2枚だけエンコードして実測する（1枚目がほぼ空のアニメーションでも外さないように）
+        changed_counts = np.count_nonzero(self._max_diff.reshape(len(self._max_diff), -1), axis=1)
+        if changed_counts.size and changed_counts.max():
+            index = int(changed_counts.argmax())
+            mask = self._max_diff[index] > 0
+            rect = changed_bbox(mask)
+            changed = int(np.count_nonzero(mask))
+            weight = changed + self.TRANSPARENT_COST * (rect[2] * rect[3] - changed)
+            delta_bytes = (
+                self._encoded_size(array[index:index + 2], duration, loop)
+                - self._encoded_size(array[index:index + 1], duration, loop)
+            )
+            self.bytes_per_pixel = max(delta_bytes - self.FRAME_OVERHEAD, 0) / weight
+    
+    @staticmethod
+    def _encoded_size(frames: np.ndarray, duration: int, loop: int) -> int:
+        """数枚のフレームだけを GifStreamWriter でエンコードしたバイト数"""
+        writer = GifStreamWriter(duration, loop)
+        for frame in frames:
+            writer.add_frame(frame)
+        return len(writer.getvalue())
+    
+    def estimate(self, tolerance: int) -> int:
+        """tolerance で差分最適化したときのGIFのバイト数の見積もり"""
+        if tolerance in self._estimates:
+            return self._estimates[tolerance]
+        
+        size = float(self.first_frame_bytes)
+        for mask in self._output_changed_masks(tolerance):
+            rect = changed_bbox(mask)
+            if rect is None:
+                continue  # 前フレームの表示時間に統合される
+            changed = int(np.count_nonzero(mask))
+            transparent = rect[2] * rect[3] - changed
+            size += self.FRAME_OVERHEAD + self.bytes_per_pixel * (changed + self.TRANSPARENT_COST * transparent)
+        
+        self._estimates[tolerance] = int(size)
+        return self._estimates[tolerance]
+    
+    def find_tolerance(self,
+                       target_bytes: int,
+                       min_tolerance: int,
+                       max_tolerance: int,
+                       scale: float = 1.0) -> int:
+        """
+        見積もり×scale が target_bytes 以下になる最小の tolerance を二分探索
+        （tolerance が大きいほど小さくなる前提。届かなければ max_tolerance）
+        """
+        low, high = min_tolerance, max_tolerance
+        while low < high:
+            middle = (low + high) // 2
+            if self.estimate(middle) * scale <= target_bytes:
+                high = middle
+            else:
+                low = middle + 1
+        return low
+    
+    def _output_changed_masks(self, tolerance: int) -> np.ndarray:
+        """差分最適化後のフレーム i (>=1) が i-1 から変わるピクセル (F-1, H, W)"""
+        changed = self._max_diff > tolerance
+        output_changed = changed.copy()
+        if self.frame_count > 2:
+            # 最適化後のフレーム i は変更ピクセルが元フレーム i、それ以外が元フレーム i-1 なので、
+            # i-1 側の変更の有無で比べる相手が元フレーム i-1 か i-2 かに分かれる
+            previous, current = changed[:-1], changed[1:]
+            output_changed[1:] = np.where(
+                previous,
+                current,
+                np.where(current, self._differs_from_second_previous, self._max_diff[:-1] > 0)
+            )
+        return output_changed
+
+
 class GifOptimizationService:
     """GIF最適化サービス"""
     
+    @staticmethod
+    def compute_changed_mask(prev_array: np.ndarray,
+                           curr_array: np.ndarray,
+                           tolerance: int = 3) -> np.ndarray:
+        """RGB最大差分が tolerance を超えるピクセルのマスク（uint8のまま計算、フレーム軸があってもよい）"""
+        diff = np.maximum(prev_array, curr_array) - np.minimum(prev_array, curr_array)
+        
+        # 長さ3のチャンネル軸での max より、チャンネルごとの比較の OR の方がずっと速い
+        changed = diff[..., 0] > tolerance
+        for channel in range(1, diff.shape[-1]):
+            changed |= diff[..., channel] > tolerance
+        return changed
+    
     @staticmethod
     def create_frame_difference(previous_frame: Optional[Image.Image],
                               current_frame: Image.Image,
@@ -24,104 +384,231 @@ class GifOptimizationService:
             # 最初のフレームはそのまま返す（RGBのまま）
             return current_frame.convert('RGB')
         
-        # RGBに変換して比較
-        prev_rgb = previous_frame.convert('RGB')
-        curr_rgb = current_frame.convert('RGB')
-        
-        # numpy配列に変換
-        prev_array = np.array(prev_rgb)
-        curr_array = np.array(curr_rgb)
-        
-        # ピクセル単位での差分を計算
-        diff = np.abs(prev_array.astype(int) - curr_array.astype(int))
-        pixel_diff = np.max(diff, axis=2)  # RGB最大差分
+        prev_array = np.array(previous_frame.convert('RGB'))
+        curr_array = np.array(current_frame.convert('RGB'))
+        changed_mask = GifOptimizationService.compute_changed_mask(prev_array, curr_array, tolerance)
         
         # 変化が小さいピクセルは前のフレームのピクセルを使用
         # これによりGIFの差分圧縮が効果的に機能する
-        result_array = curr_array.copy()
-        unchanged_mask = pixel_diff <= tolerance
-        result_array[unchanged_mask] = prev_array[unchanged_mask]
+        result_array = np.where(changed_mask[:, :, np.newaxis], curr_array, prev_array)
         
-        return Image.fromarray(result_array.astype('uint8'), 'RGB')
+        return Image.fromarray(result_array, 'RGB')
     
     @staticmethod
-    def optimize_gif_frames(frames: List[Image.Image], 
-                          tolerance: int = 3) -> List[Image.Image]:
+    def compute_frame_differences(frames: Union[FrameStack, List[Image.Image]],
+                                tolerance: int = 3) -> FrameDiffResult:
+        """
+        全フレームの差分を一度だけ計算し、最適化済みフレームと統計をまとめて返す
+        
+        フレームは FrameStack にまとめて全フレーム一括で差分を取り、最適化済みフレームも
+        FrameStack で返す（添字・イテレーションではPIL画像になる）
+        """
+        stack = FrameStack.from_images(frames)
+        frame_array = stack.array
+        
+        # フレーム i と i-1 を一括比較（変化の少ない部分は前フレームと同じ色に）
+        changed_masks = GifOptimizationService.compute_changed_mask(frame_array[:-1], frame_array[1:], tolerance)
+        optimized = frame_array.copy()
+        optimized[1:] = np.where(changed_masks[..., np.newaxis], frame_array[1:], frame_array[:-1])
+        
+        return FrameDiffResult(FrameStack(optimized), changed_masks, tolerance)
+    
+    @staticmethod
+    def iter_frame_differences(frames: Union[FrameStack, Iterable[Image.Image]],
+                             tolerance: int = 3,
+                             stats: Optional[FrameDiffStats] = None) -> Iterator[Image.Image]:
+        """
+        compute_frame_differences のストリーム版（最適化済みフレームを1枚ずつ返す）
+        
+        保持するのは直前のフレームだけ。stats を渡すと変更ピクセルの統計を積み上げる
+        """
+        for optimized in GifOptimizationService._iter_difference_arrays(frames, tolerance, stats):
+            yield Image.fromarray(optimized, 'RGB')
+    
+    @staticmethod
+    def _iter_difference_arrays(frames: Union[FrameStack, Iterable[Image.Image]],
+                              tolerance: int,
+                              stats: Optional[FrameDiffStats]) -> Iterator[np.ndarray]:
+        """iter_frame_differences の本体（PIL画像を作らず (H, W, 3) の配列で返す）"""
+        if isinstance(frames, FrameStack):
+            arrays = iter(frames.array)
+        else:
+            arrays = (np.asarray(frame.convert('RGB')) for frame in frames)
+        
+        prev_array = None
+        
+        for curr_array in arrays:
+            total_pixels = curr_array.shape[0] * curr_array.shape[1]
+            
+            if prev_array is None:
+                if stats is not None:
+                    stats.add_frame(total_pixels)
+                yield curr_array
+            else:
+                changed_mask = GifOptimizationService.compute_changed_mask(prev_array, curr_array, tolerance)
+                if stats is not None:
+                    stats.add_frame(total_pixels, changed_mask)
+                yield np.where(changed_mask[:, :, np.newaxis], curr_array, prev_array)
+            
+            prev_array = curr_array
+    
+    @staticmethod
+    def optimize_gif_frames(frames: Union[FrameStack, List[Image.Image]],
+                          tolerance: int = 3) -> Union[FrameStack, List[Image.Image]]:
         """フレームリストを差分合成用に最適化"""
         
         if not frames:
             return []
         
-        optimized_frames = []
-        previous_frame = None
+        return GifOptimizationService.compute_frame_differences(frames, tolerance).optimized_frames
+    
+    @staticmethod
+    def encode_optimized_gif(frames: Union[FrameStack, List[Image.Image]],
+                           duration: int = 100,
+                           loop: int = 0,
+                           tolerance: int = 3,
+                           diff_result: Optional[FrameDiffResult] = None) -> Optional[bytes]:
+        """
+        差分合成最適化されたGIFをメモリ上でエンコードしてバイト列を返す
+        
+        diff_result に compute_frame_differences の結果を渡すと差分計算を再利用する
+        """
+        
+        if not frames:
+            return None
+        
+        try:
+            # フレームを差分合成用に最適化
+            if diff_result is None:
+                diff_result = GifOptimizationService.compute_frame_differences(frames, tolerance)
+            
+            # 各フレームは変化した矩形だけを透明色つきで書き出す
+            writer = GifStreamWriter(duration, loop)
+            for frame in diff_result.optimized_frames.array:
+                writer.add_frame(frame)
+            return writer.getvalue()
+        
+        except Exception as e:
+            logger.error(f"GIF optimization failed: {str(e)}")
+            return None
+    
+    @staticmethod
+    def encode_optimized_gif_stream(frames: Union[FrameStack, Iterable[Image.Image]],
+                                  duration: int = 100,
+                                  loop: int = 0,
+                                  tolerance: int = 3) -> Tuple[Optional[bytes], FrameDiffStats]:
+        """
+        フレームのイテレータを差分最適化しながら1枚ずつGIFにエンコードし、
+        (GIFのバイト列, 差分統計) を返す
+        
+        encode_optimized_gif と違い全フレームを保持しないので、
+        animation_service.iter_animation_frames とつなげるとメモリ使用量が
+        フレーム数によらず一定になる
+        """
+        stats = FrameDiffStats(tolerance)
+        
+        try:
+            writer = GifStreamWriter(duration, loop)
+            for frame in GifOptimizationService._iter_difference_arrays(frames, tolerance, stats):
+                writer.add_frame(frame)
+            return writer.getvalue(), stats
+        
+        except Exception as e:
+            logger.error(f"GIF optimization failed: {str(e)}")
+            return None, stats
+    
+    @staticmethod
+    def encode_optimized_gif_for_size(frames: Union[FrameStack, List[Image.Image]],
+                                    target_bytes: int,
+                                    duration: int = 100,
+                                    loop: int = 0,
+                                    min_tolerance: int = 1,
+                                    max_tolerance: int = 255,
+                                    max_encodes: int = 3) -> Tuple[Optional[bytes], FrameDiffStats, dict]:
+        """
+        GIFが target_bytes 以下に収まる最小の tolerance を探してエンコードし、
+        (GIFのバイト列, 差分統計, 探索結果) を返す
+        
+        tolerance は GifSizeEstimator の見積もりで二分探索し、フルエンコードするのは
+        選んだ候補だけ。実サイズが目標を超えたときだけ、実測と見積もりの比で見積もりを
+        補正して探索し直す（エンコードは max_encodes 回まで）。目標に届かなければ
+        エンコードした中で最小のGIFを返す
+        """
+        search = {
+            'target_bytes': target_bytes,
+            'target_met': False,
+            'tolerance': min_tolerance,
+            'estimated_bytes': None,
+            'encodes': 0
+        }
         
-        for i, frame in enumerate(frames):
-            # 全てRGBに統一
-            frame_rgb = frame.convert('RGB')
+        if not len(frames):
+            return None, FrameDiffStats(min_tolerance), search
+        
+        try:
+            stack = FrameStack.from_images(frames)
+            estimator = GifSizeEstimator(stack, duration, loop)
+            encoded = {}  # tolerance -> (GIFのバイト列, 差分の計算結果)
+            scale = 1.0
             
-            if i == 0:
-                # 最初のフレームはそのまま
-                optimized_frames.append(frame_rgb)
-                previous_frame = frame_rgb
+            tolerance = estimator.find_tolerance(target_bytes, min_tolerance, max_tolerance)
+            while tolerance not in encoded and len(encoded) < max_encodes:
+                diff_result = GifOptimizationService.compute_frame_differences(stack, tolerance)
+                gif_data = GifOptimizationService.encode_optimized_gif(stack, duration, loop, tolerance, diff_result)
+                if gif_data is None:
+                    break
+                encoded[tolerance] = (gif_data, diff_result)
+                if len(gif_data) <= target_bytes:
+                    break
+                
+                # 見積もりが甘かった分を補正して、より大きい tolerance を探し直す
+                scale = max(scale, len(gif_data) / max(estimator.estimate(tolerance), 1))
+                tolerance = estimator.find_tolerance(target_bytes, tolerance, max_tolerance, scale)
+            
+            if not encoded:
+                return None, FrameDiffStats(min_tolerance), search
+            
+            within_target = [t for t, (gif_data, _) in encoded.items() if len(gif_data) <= target_bytes]
+            if within_target:
+                tolerance = min(within_target)
             else:
-                # 差分フレームを生成（変化の少ない部分は前フレームと同じ色に）
-                diff_frame = GifOptimizationService.create_frame_difference(
-                    previous_frame, frame_rgb, tolerance
-                )
-                optimized_frames.append(diff_frame)
-                previous_frame = frame_rgb
+                tolerance = min(encoded, key=lambda t: len(encoded[t][0]))
+            gif_data, diff_result = encoded[tolerance]
+            
+            search.update({
+                'target_met': bool(within_target),
+                'tolerance': tolerance,
+                'estimated_bytes': estimator.estimate(tolerance),
+                'encodes': len(encoded)
+            })
+            return gif_data, diff_result, search
         
-        return optimized_frames
+        except Exception as e:
+            logger.error(f"GIF optimization failed: {str(e)}")
+            return None, FrameDiffStats(min_tolerance), search
     
     @staticmethod
-    def save_optimized_gif(frames: List[Image.Image],
+    def save_optimized_gif(frames: Union[FrameStack, List[Image.Image]],
                          output_path: str,
                          duration: int = 100,
                          loop: int = 0,
                          tolerance: int = 3) -> Tuple[bool, Optional[int]]:
         """差分合成最適化されたGIFを保存"""
         
-        if not frames:
+        gif_data = GifOptimizationService.encode_optimized_gif(frames, duration, loop, tolerance)
+        if gif_data is None:
             return False, None
         
         try:
-            # フレームを差分合成用に最適化
-            optimized_frames = GifOptimizationService.optimize_gif_frames(frames, tolerance)
-            
-            # より効果的なGIF保存オプション
-            save_kwargs = {
-                'save_all': True,
-                'append_images': optimized_frames[1:],
-                'duration': duration,
-                'loop': loop,
-                'optimize': True,  # 重要：ファイルサイズ最適化
-                'disposal': 0,     # フレームを保持（差分に最適）
-            }
-            
-            # パレット数を制限してファイルサイズを削減
-            first_frame = optimized_frames[0]
-            if hasattr(first_frame, 'quantize'):
-                # 256色以下に制限
-                first_frame = first_frame.quantize(colors=128, method=Image.MEDIANCUT, dither=0)
-                optimized_frames = [first_frame] + [
-                    frame.quantize(colors=128, method=Image.MEDIANCUT, dither=0) 
-                    for frame in optimized_frames[1:]
-                ]
-                save_kwargs['palette'] = first_frame.getpalette()
+            with open(output_path, 'wb') as f:
+                f.write(gif_data)
             
-            # GIFを保存
-            optimized_frames[0].save(output_path, format='GIF', **save_kwargs)
-            
-            # ファイルサイズを返す
-            if os.path.exists(output_path):
-                file_size = os.path.getsize(output_path)
-                logger.info(f"Optimized GIF saved: {output_path} ({file_size:,} bytes)")
-                return True, file_size
-            else:
-                return False, None
+            file_size = len(gif_data)
+            logger.info(f"Optimized GIF saved: {output_path} ({file_size:,} bytes)")
+            return True, file_size
         
         except Exception as e:
-            logger.error(f"GIF optimization failed: {str(e)}")
+            logger.error(f"GIF save failed: {str(e)}")
             return False, None
     
     @staticmethod
@@ -132,44 +619,17 @@ class GifOptimizationService:
         return ((original_size - optimized_size) / original_size) * 100
     
     @staticmethod
-    def get_optimization_stats(frames: List[Image.Image], 
-                             tolerance: int = 3) -> dict:
-        """最適化統計情報を取得"""
+    def get_optimization_stats(frames: Union[FrameStack, List[Image.Image]],
+                             tolerance: int = 3,
+                             diff_result: Optional[FrameDiffResult] = None) -> dict:
+        """最適化統計情報を取得（diff_result があれば差分を再計算しない）"""
         if not frames:
             return {}
         
         try:
-            optimized_frames = GifOptimizationService.optimize_gif_frames(frames, tolerance)
-            
-            # 変更ピクセル数の統計
-            total_pixels = frames[0].width * frames[0].height
-            changed_pixels_stats = []
-            
-            for i in range(1, len(frames)):
-                prev_array = np.array(frames[i-1].convert('RGB'))
-                curr_array = np.array(frames[i].convert('RGB'))
-                
-                diff = np.abs(prev_array.astype(int) - curr_array.astype(int))
-                pixel_diff = np.max(diff, axis=2)
-                
-                changed_pixels = np.sum(pixel_diff > tolerance)
-                change_ratio = (changed_pixels / total_pixels) * 100
-                
-                changed_pixels_stats.append({
-                    'frame': i,
-                    'changed_pixels': int(changed_pixels),
-                    'change_ratio': float(change_ratio)
-                })
-            
-            avg_change_ratio = np.mean([stat['change_ratio'] for stat in changed_pixels_stats])
-            
-            return {
-                'total_frames': len(frames),
-                'total_pixels_per_frame': total_pixels,
-                'tolerance': tolerance,
-                'average_change_ratio': float(avg_change_ratio),
-                'frame_stats': changed_pixels_stats
-            }
+            if diff_result is None:
+                diff_result = GifOptimizationService.compute_frame_differences(frames, tolerance)
+            return diff_result.to_stats()
         
         except Exception as e:
             logger.error(f"Stats calculation failed: {str(e)}")
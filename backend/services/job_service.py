@@ -0,0 +1,264 @@
+"""
+Pixa - ジョブキューサービス
+重い処理（画像生成）を優先度付きキューに積み、単一ワーカーで順番に実行
+"""
+import itertools
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Hashable, List, Optional
+import logging
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """キューに積まれた1件の処理"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+    def __init__(self,
+                 func: Callable,
+                 kwargs: Dict[str, Any],
+                 priority: int,
+                 batch_key: Optional[Hashable] = None,
+                 batch_func: Optional[Callable] = None):
+        self.id = uuid.uuid4().hex
+        self.func = func
+        self.kwargs = kwargs
+        self.priority = priority
+        self.batch_key = batch_key
+        self.batch_func = batch_func
+        self.batch_size = 1
+        self.status = Job.QUEUED
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    def set_progress(self, progress: float):
+        """進捗（0.0〜1.0）を更新"""
+        self.progress = max(0.0, min(float(progress), 1.0))
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """完了（成功・失敗）まで待機。完了していれば True"""
+        return self._done.wait(timeout)
+
+    def is_finished(self) -> bool:
+        """完了済みかチェック"""
+        return self._done.is_set()
+
+    def to_dict(self, queue_position: Optional[int] = None) -> Dict[str, Any]:
+        """ステータスAPI用の辞書"""
+        info = {
+            'job_id': self.id,
+            'status': self.status,
+            'progress': round(self.progress, 3),
+            'priority': self.priority,
+            'batch_size': self.batch_size,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if queue_position is not None:
+            info['queue_position'] = queue_position
+        if self.status == Job.COMPLETED:
+            info['result'] = self.result
+        elif self.status == Job.FAILED:
+            info['error'] = self.error
+        return info
+
+
+class QueueFullError(Exception):
+    """キューが満杯で受け付けられない"""
+
+
+class JobService:
+    """
+    優先度付きジョブキュー（ワーカー1本で順に処理）
+
+    batch_key が同じ待機中ジョブは、batch_window 秒の間に集まった分を最大
+    max_batch_size 件まで batch_func の1回の呼び出しにまとめて実行する
+    """
+
+    def __init__(self,
+                 max_queued_jobs: int = 32,
+                 result_ttl: float = 600,
+                 max_batch_size: int = 1,
+                 batch_window: float = 0.0):
+        self.max_queued_jobs = max_queued_jobs
+        self.result_ttl = result_ttl
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self._queue = queue.PriorityQueue()
+        self._jobs: Dict[str, Job] = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def submit(self,
+               func: Callable,
+               priority: int = 0,
+               batch_key: Optional[Hashable] = None,
+               batch_func: Optional[Callable] = None,
+               **kwargs) -> Job:
+        """
+        ジョブを登録してすぐに返す
+
+        func は kwargs と progress_callback を受け取り、結果（JSON化できる値）を返す。
+        priority が小さいほど先に実行され、同じ優先度なら登録順。
+        batch_func は kwargs のリストと progress_callback を受け取り、ジョブごとの
+        結果（または例外）のリストを返す。priority が整数にできなければ
+        TypeError / ValueError（キューには何も入らない）
+        """
+        priority = int(priority)
+
+        with self._lock:
+            self._cleanup_locked()
+            queued = sum(1 for job in self._jobs.values() if job.status == Job.QUEUED)
+            if queued >= self.max_queued_jobs:
+                raise QueueFullError(f'Job queue is full ({queued} jobs)')
+
+            job = Job(func, kwargs, priority, batch_key, batch_func)
+            self._queue.put((priority, next(self._counter), job))
+            self._jobs[job.id] = job
+            self._ensure_worker_locked()
+
+        logger.info(f"Job queued: {job.id} (priority={priority})")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        """ジョブを取得"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def get_queue_position(self, job: Job) -> Optional[int]:
+        """待機中ジョブの実行順（0が次）"""
+        if job.status != Job.QUEUED:
+            return None
+        with self._lock:
+            waiting = [j for j in self._jobs.values() if j.status == Job.QUEUED]
+        order = sorted(waiting, key=lambda j: (j.priority, j.created_at))
+        return order.index(job) if job in order else None
+
+    def get_stats(self) -> Dict[str, int]:
+        """ステータス別のジョブ数"""
+        with self._lock:
+            stats = {Job.QUEUED: 0, Job.RUNNING: 0, Job.COMPLETED: 0, Job.FAILED: 0}
+            for job in self._jobs.values():
+                stats[job.status] += 1
+        return stats
+
+    def _ensure_worker_locked(self):
+        """ワーカースレッドを起動（ロック取得済みで呼ぶ）"""
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run_worker, name='pixa-job-worker', daemon=True)
+            self._worker.start()
+
+    def _cleanup_locked(self):
+        """保持期限を過ぎた完了ジョブを削除（ロック取得済みで呼ぶ）"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _claim_batch_locked(self, batch: List[Job]):
+        """先頭ジョブと同じ batch_key の待機中ジョブを優先度順に取り込む（ロック取得済みで呼ぶ）"""
+        leader = batch[0]
+        candidates = sorted(
+            (job for job in self._jobs.values()
+             if job.status == Job.QUEUED and job.batch_key == leader.batch_key and job not in batch),
+            key=lambda job: (job.priority, job.created_at)
+        )
+        for job in candidates[:self.max_batch_size - len(batch)]:
+            # キューに残ったエントリは取り出した時点で読み飛ばす
+            job.status = Job.RUNNING
+            job.started_at = time.time()
+            batch.append(job)
+
+    def _collect_batch(self, leader: Job) -> List[Job]:
+        """バッチ化できるジョブを集める"""
+        batch = [leader]
+        if leader.batch_key is None or leader.batch_func is None or self.max_batch_size <= 1:
+            return batch
+
+        with self._lock:
+            self._claim_batch_locked(batch)
+
+        # 集まりきらなければ少しだけ待って追加分を取り込む
+        if len(batch) < self.max_batch_size and self.batch_window > 0:
+            time.sleep(self.batch_window)
+            with self._lock:
+                self._claim_batch_locked(batch)
+
+        return batch
+
+    def _run_batch(self, batch: List[Job]):
+        """ジョブ（またはバッチ）を実行して結果を振り分ける"""
+        leader = batch[0]
+
+        def progress_callback(progress: float):
+            for job in batch:
+                job.set_progress(progress)
+
+        try:
+            if len(batch) == 1:
+                results = [leader.func(progress_callback=progress_callback, **leader.kwargs)]
+            else:
+                logger.info(f"Running batched jobs: {len(batch)} jobs (key={leader.batch_key})")
+                results = leader.batch_func([job.kwargs for job in batch], progress_callback=progress_callback)
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for job, result in zip(batch, results):
+            job.batch_size = len(batch)
+            if isinstance(result, Exception):
+                logger.error(f"Job failed: {job.id}: {str(result)}")
+                job.error = str(result)
+                job.status = Job.FAILED
+            else:
+                job.result = result
+                job.progress = 1.0
+                job.status = Job.COMPLETED
+            job.finished_at = time.time()
+            job.func = None
+            job.batch_func = None
+            job.kwargs = None
+            job._done.set()
+
+    def _run_worker(self):
+        """キューを順に処理"""
+        while True:
+            _, _, job = self._queue.get()
+
+            try:
+                # 別ジョブのバッチに取り込まれたものは読み飛ばす
+                if job.status != Job.QUEUED:
+                    continue
+
+                job.status = Job.RUNNING
+                job.started_at = time.time()
+                self._run_batch(self._collect_batch(job))
+            finally:
+                self._queue.task_done()
+
+
+# 画像生成用のグローバルジョブキュー（パイプラインは1本なのでワーカーも1本）
+generation_job_service = JobService(
+    max_queued_jobs=Config.MAX_QUEUED_JOBS,
+    result_ttl=Config.JOB_RESULT_TTL,
+    max_batch_size=Config.MAX_GENERATION_BATCH_SIZE,
+    batch_window=Config.GENERATION_BATCH_WINDOW
+)
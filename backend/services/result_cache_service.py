@@ -0,0 +1,250 @@
+"""
+Pixa - 生成結果キャッシュ
+パラメータのハッシュをキーにした2段（メモリLRU + ディスク）のバイト列キャッシュと、
+アニメーションのフレーム（FrameStack）のメモリLRUキャッシュ
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import logging
+
+from PIL import Image
+
+from config.settings import Config
+from utils.frame_stack import FrameStack
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(**params: Any) -> str:
+    """パラメータ一式から内容アドレスのキー（SHA-256）を作成"""
+    canonical = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def make_image_digest(image: Image.Image) -> str:
+    """画像の内容（モード・サイズ・画素）のSHA-256"""
+    digest = hashlib.sha256(f'{image.mode}:{image.width}x{image.height}:'.encode('ascii'))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """メモリLRU + ディスクの2段キャッシュ（どちらも容量上限を超えたら古い順に削除）"""
+
+    def __init__(self,
+                 cache_dir: str,
+                 memory_budget_bytes: int,
+                 disk_budget_bytes: int):
+        self.cache_dir = cache_dir
+        self.memory_budget_bytes = memory_budget_bytes
+        self.disk_budget_bytes = disk_budget_bytes
+
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        # ディスク上のファイルの {パス: サイズ}（古く使われた順）と合計サイズ。初回アクセス時に集計
+        self._disk_index: "Optional[OrderedDict[str, int]]" = None
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f'{key}.bin')
+
+    def get(self, key: str) -> Optional[bytes]:
+        """キャッシュを取得（ディスクで見つかればメモリにも載せる）"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._hits += 1
+                return data
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # 再起動後の集計でもLRU順が保たれるよう更新時刻も更新
+        except OSError:
+            with self._lock:
+                self._misses += 1
+                # 削除済みのファイルが索引に残っていれば外す
+                if self._disk_index is not None and path in self._disk_index:
+                    self._disk_bytes -= self._disk_index.pop(path)
+            return None
+
+        with self._lock:
+            self._hits += 1
+            self._put_memory_locked(key, data)
+            if self._disk_index is not None and path in self._disk_index:
+                self._disk_index.move_to_end(path)
+        return data
+
+    def put(self, key: str, data: bytes):
+        """キャッシュに保存"""
+        with self._lock:
+            self._put_memory_locked(key, data)
+
+        if self.disk_budget_bytes <= 0:
+            return
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f'{path}.{threading.get_ident()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.error(f"Result cache write failed: {str(e)}")
+            return
+
+        with self._lock:
+            self._ensure_disk_index_locked()
+            self._disk_bytes += len(data) - self._disk_index.pop(path, 0)
+            self._disk_index[path] = len(data)
+            evicted = self._evict_disk_locked()
+
+        # ファイルの削除はロックの外で行う（削除中も get をブロックしない）
+        for evicted_path in evicted:
+            try:
+                os.remove(evicted_path)
+            except OSError:
+                pass
+
+    def _put_memory_locked(self, key: str, data: bytes):
+        """メモリ段に保存して予算を超えた分を削除（ロック取得済みで呼ぶ）"""
+        if len(data) > self.memory_budget_bytes:
+            return
+
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+
+        while self._memory_bytes > self.memory_budget_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _iter_disk_entries(self):
+        """ディスク上のキャッシュファイルを (パス, サイズ, 更新時刻) で列挙"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.bin'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _ensure_disk_index_locked(self):
+        """ディスク上のファイルを1回だけ走査して索引を作成（ロック取得済みで呼ぶ）"""
+        if self._disk_index is None:
+            entries = sorted(self._iter_disk_entries(), key=lambda entry: entry[2])
+            self._disk_index = OrderedDict((path, size) for path, size, _ in entries)
+            self._disk_bytes = sum(self._disk_index.values())
+
+    def _evict_disk_locked(self) -> List[str]:
+        """
+        ディスク段の予算を超えていたら、古く使われた順に低水位（予算の
+        Config.RESULT_CACHE_DISK_LOW_WATER 倍）まで索引から外し、削除するパスを返す
+        （ロック取得済みで呼ぶ）
+        """
+        if self._disk_bytes <= self.disk_budget_bytes:
+            return []
+
+        low_water = self.disk_budget_bytes * Config.RESULT_CACHE_DISK_LOW_WATER
+        evicted = []
+        while self._disk_index and self._disk_bytes > low_water:
+            path, size = self._disk_index.popitem(last=False)
+            self._disk_bytes -= size
+            evicted.append(path)
+        return evicted
+
+    def get_stats(self) -> Dict[str, Any]:
+        """キャッシュ統計"""
+        with self._lock:
+            return {
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_bytes': self._disk_bytes,
+                'hits': self._hits,
+                'misses': self._misses
+            }
+
+
+class FrameStackCache:
+    """
+    生成済みフレーム（FrameStack）のメモリLRUキャッシュ（配列のバイト数で容量を管理）
+
+    保存したフレームは読み取り専用にして、取得側での書き換えを防ぐ
+    """
+
+    def __init__(self, memory_budget_bytes: int):
+        self.memory_budget_bytes = memory_budget_bytes
+
+        self._stacks: "OrderedDict[str, FrameStack]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: str) -> Optional[FrameStack]:
+        """キャッシュを取得"""
+        with self._lock:
+            stack = self._stacks.get(key)
+            if stack is None:
+                self._misses += 1
+                return None
+            self._stacks.move_to_end(key)
+            self._hits += 1
+            return stack
+
+    def put(self, key: str, stack: FrameStack):
+        """キャッシュに保存して予算を超えた分を古い順に削除"""
+        if stack.nbytes > self.memory_budget_bytes:
+            return
+        stack.array.flags.writeable = False
+
+        with self._lock:
+            previous = self._stacks.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= previous.nbytes
+
+            self._stacks[key] = stack
+            self._memory_bytes += stack.nbytes
+
+            while self._memory_bytes > self.memory_budget_bytes:
+                _, evicted = self._stacks.popitem(last=False)
+                self._memory_bytes -= evicted.nbytes
+
+    def get_stats(self) -> Dict[str, Any]:
+        """キャッシュ統計"""
+        with self._lock:
+            return {
+                'entries': len(self._stacks),
+                'memory_bytes': self._memory_bytes,
+                'hits': self._hits,
+                'misses': self._misses
+            }
+
+
+# 画像生成結果のグローバルキャッシュ
+result_cache = ResultCache(
+    cache_dir=Config.RESULT_CACHE_DIR,
+    memory_budget_bytes=Config.RESULT_CACHE_MEMORY_MB * 1024 * 1024,
+    disk_budget_bytes=Config.RESULT_CACHE_DISK_MB * 1024 * 1024
+)
+
+# アニメーションフレームのグローバルキャッシュ
+frame_cache = FrameStackCache(memory_budget_bytes=Config.FRAME_CACHE_MEMORY_MB * 1024 * 1024)
@@ -0,0 +1,110 @@
+"""
+Pixa - フレームスタック
+アニメーションのフレーム列を1つの連続した uint8 配列 (F, H, W, C) で持つ
+"""
+import numpy as np
+from PIL import Image
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def nearest_resize_indices(src_length: int, dst_length: int) -> np.ndarray:
+    """NEARESTリサイズで各出力画素が参照する元インデックス（PILと同じ丸め）"""
+    index_row = Image.fromarray(np.arange(src_length, dtype=np.int32)[np.newaxis, :])
+    return np.array(index_row.resize((dst_length, 1), Image.NEAREST))[0]
+
+
+class FrameStack:
+    """
+    アニメーションのフレーム列（(F, H, W, C) の連続した uint8 配列）
+
+    エンジン・ピクセルアート後処理・GIF最適化の間は配列のまま受け渡し、
+    PIL画像はエンコードなどで必要になったときだけ作る。添字・イテレーションでは
+    PIL画像を返すので、従来のフレームリストを受け取る処理にもそのまま渡せる
+    """
+
+    def __init__(self, array: np.ndarray):
+        array = np.ascontiguousarray(array, dtype=np.uint8)
+        if array.ndim != 4:
+            raise ValueError(f"FrameStack requires a (frames, height, width, channels) array, got {array.shape}")
+        self.array = array
+
+    @classmethod
+    def from_images(cls, images: Iterable[Image.Image]) -> 'FrameStack':
+        """PIL画像の列から作る（全フレームが同じサイズであること）"""
+        if isinstance(images, FrameStack):
+            return images
+        return cls(np.stack([np.asarray(image.convert('RGB')) for image in images]))
+
+    def __len__(self) -> int:
+        return self.array.shape[0]
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Image.Image, 'FrameStack']:
+        if isinstance(index, slice):
+            return FrameStack(self.array[index])
+        return Image.fromarray(self.array[index])
+
+    def __iter__(self) -> Iterator[Image.Image]:
+        for frame in self.array:
+            yield Image.fromarray(frame)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """1フレームのサイズ (幅, 高さ)"""
+        return self.array.shape[2], self.array.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.array.nbytes
+
+    def to_images(self) -> List[Image.Image]:
+        """PIL画像のリストに変換"""
+        return list(self)
+
+    def to_shared_palette_images(self, max_colors: int = 256) -> Optional[List[Image.Image]]:
+        """
+        全フレームで同じパレットを持つPモード画像のリストに変換
+        （使用色をそのままパレットにするので色は変わらない。色数が多すぎる場合は None）
+        """
+        frame_count, height, width, channels = self.array.shape
+        if channels != 3:
+            return None
+
+        codes = (
+            (self.array[..., 0].astype(np.uint32) << 16)
+            | (self.array[..., 1].astype(np.uint32) << 8)
+            | self.array[..., 2]
+        )
+        colors, indices = np.unique(codes, return_inverse=True)
+        if len(colors) > max_colors:
+            return None
+
+        palette = np.stack([(colors >> 16) & 0xFF, (colors >> 8) & 0xFF, colors & 0xFF], axis=-1).astype(np.uint8)
+        indices = indices.reshape(frame_count, height, width).astype(np.uint8)
+        images = []
+        for frame in indices:
+            image = Image.fromarray(frame, 'P')
+            image.putpalette(palette.tobytes())
+            images.append(image)
+        return images
+
+    def resize_nearest(self, size: Tuple[int, int]) -> 'FrameStack':
+        """全フレームをまとめてNEARESTでリサイズ（PILの resize と同じ結果）"""
+        if size == self.size:
+            return self
+        ys = nearest_resize_indices(self.array.shape[1], size[1])
+        xs = nearest_resize_indices(self.array.shape[2], size[0])
+        return FrameStack(self.array[:, ys][:, :, xs])
+
+    def quantize_shared(self, palette_size: int) -> 'FrameStack':
+        """全フレームを縦に連結して1回で減色（全フレームで同じパレットになる）"""
+        frame_count, height, width, channels = self.array.shape
+        if not frame_count:
+            return self
+
+        # 1回のメディアンカットでパレットを作り、全画素を最近傍色に割り当て
+        stacked = Image.fromarray(self.array.reshape(frame_count * height, width, channels))
+        quantized = stacked.quantize(colors=palette_size, dither=0).convert('RGB')
+        return FrameStack(np.asarray(quantized).reshape(frame_count, height, width, 3))
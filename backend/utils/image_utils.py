@@ -2,19 +2,36 @@
 Pixa - 画像処理ユーティリティ
 """
 import base64
+import binascii
 import io
 import numpy as np
 from PIL import Image, ImageFilter, ImageEnhance
-from typing import Optional, Tuple, List
+from typing import Any, Dict, Optional, Tuple, List, Union
 import logging
 
+from utils.frame_stack import FrameStack
+
 logger = logging.getLogger(__name__)
 
 
+def get_sprite_size(size: Tuple[int, int], pixel_size: int) -> Tuple[int, int]:
+    """ピクセルアート処理で縮小したときのスプライト解像度"""
+    return (
+        max(size[0] // pixel_size, 16),
+        max(size[1] // pixel_size, 16)
+    )
+
+
 def apply_pixel_art_processing(image: Image.Image, 
                              pixel_size: int = 8, 
-                             palette_size: int = 16) -> Optional[Image.Image]:
-    """ピクセルアート風後処理"""
+                             palette_size: int = 16,
+                             native_resolution: bool = False) -> Optional[Image.Image]:
+    """
+    ピクセルアート風後処理
+
+    native_resolution が True なら元のサイズに拡大せず、スプライト解像度のまま返す
+    （表示側で pixel_size 倍に拡大する）
+    """
     if image is None:
         return None
     
@@ -22,10 +39,7 @@ def apply_pixel_art_processing(image: Image.Image,
         original_size = image.size
         
         # ピクセルサイズに基づいて縮小
-        small_size = (
-            max(original_size[0] // pixel_size, 16),
-            max(original_size[1] // pixel_size, 16)
-        )
+        small_size = get_sprite_size(original_size, pixel_size)
         
         # 縮小（NEAREST で鮮明なピクセルエッジを保持）
         image_small = image.resize(small_size, Image.NEAREST)
@@ -36,6 +50,9 @@ def apply_pixel_art_processing(image: Image.Image,
             image_small = image_small.quantize(colors=palette_size, method=Image.MEDIANCUT, dither=0)
             image_small = image_small.convert('RGB')
         
+        if native_resolution:
+            return image_small
+        
         # 元のサイズに拡大
         pixel_art = image_small.resize(original_size, Image.NEAREST)
         
@@ -46,22 +63,91 @@ def apply_pixel_art_processing(image: Image.Image,
         return image
 
 
-def image_to_base64(image: Image.Image, format: str = 'PNG') -> Optional[str]:
-    """画像をBase64エンコード"""
+def encode_image_bytes(image: Image.Image, format: str = 'PNG', **save_kwargs) -> Optional[bytes]:
+    """画像をエンコードしてバイト列を返す"""
     if image is None:
         return None
     
     try:
         buffer = io.BytesIO()
-        image.save(buffer, format=format, optimize=True)
-        buffer.seek(0)
-        
-        base64_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        return f'data:image/{format.lower()};base64,{base64_str}'
+        image.save(buffer, format=format, **save_kwargs)
+        return buffer.getvalue()
+    
+    except Exception as e:
+        logger.error(f"Image encoding failed: {str(e)}")
+        return None
+
+
+def to_exact_palette_image(image: Image.Image, max_colors: int = 256) -> Optional[Image.Image]:
+    """
+    使用色が max_colors 以下なら、その色をそのままパレットにしたPモード画像を返す
+    （減色し直さないので色は変わらない）。色数が多すぎる場合は None
+    """
+    colors = image.convert('RGB').getcolors(maxcolors=max_colors)
+    if colors is None:
+        return None
+    
+    palette_image = Image.new('P', (1, 1))
+    palette_image.putpalette([channel for _, color in colors for channel in color])
+    
+    # パレット内の色のみなので最近傍割り当ては完全一致になる
+    return image.convert('RGB').quantize(palette=palette_image, dither=Image.Dither.NONE)
+
+
+def encode_png_bytes(image: Image.Image,
+                     save_kwargs: Optional[Dict[str, Any]] = None,
+                     palette_size: int = 256) -> Optional[bytes]:
+    """
+    PNGエンコード（save_kwargs は Config.get_png_save_kwargs で解決したプロファイル）
+
+    使用色が palette_size（最大256）以下ならPモードで保存する。ピクセルアート処理後の
+    画像は常にこれに当てはまり、RGBより小さく速くエンコードできる。
+    save_kwargs が None なら Pillow の既定値（zlib標準）で保存する
+    """
+    if image is None:
+        return None
+    
+    if image.mode in ('RGB', 'L'):
+        palette_image = to_exact_palette_image(image, min(palette_size, 256))
+        if palette_image is not None:
+            image = palette_image
+    
+    return encode_image_bytes(image, 'PNG', **(save_kwargs or {}))
+
+
+def bytes_to_data_url(data: bytes, format: str = 'PNG') -> str:
+    """
+    エンコード済みの画像バイト列をBase64のデータURLにする
+
+    PNG・GIFなど全てのルートで共通のエンコーダー（bytes / memoryview をコピーせずに受け取る）
+    """
+    base64_str = binascii.b2a_base64(data, newline=False).decode('ascii')
+    return f'data:image/{format.lower()};base64,{base64_str}'
+
+
+def decode_image_bytes(data: bytes) -> Optional[Image.Image]:
+    """エンコード済みの画像バイト列をRGB画像に復元"""
+    try:
+        return Image.open(io.BytesIO(data)).convert('RGB')
     
     except Exception as e:
-        logger.error(f"Base64 encoding failed: {str(e)}")
+        logger.error(f"Image decoding failed: {str(e)}")
+        return None
+
+
+def image_to_base64(image: Image.Image,
+                    format: str = 'PNG',
+                    save_kwargs: Optional[Dict[str, Any]] = None,
+                    palette_size: int = 256) -> Optional[str]:
+    """画像をBase64エンコード（PNGは save_kwargs で速度とサイズを選べる）"""
+    if format.upper() == 'PNG':
+        image_bytes = encode_png_bytes(image, save_kwargs, palette_size)
+    else:
+        image_bytes = encode_image_bytes(image, format, optimize=True)
+    if image_bytes is None:
         return None
+    
+    return bytes_to_data_url(image_bytes, format)
 
 
 def base64_to_image(base64_str: str) -> Optional[Image.Image]:
@@ -102,40 +188,104 @@ def validate_image_size(image: Image.Image,
     return image
 
 
-def create_image_grid(images: List[Image.Image], 
+def grid_layout(image_count: int,
+                image_size: Tuple[int, int],
+                cols: int = 3,
+                padding: int = 10) -> List[List[int]]:
+    """create_image_grid で並べたときの各画像の矩形 [x, y, 幅, 高さ]"""
+    width, height = image_size
+    return [
+        [(i % cols) * (width + padding), (i // cols) * (height + padding), width, height]
+        for i in range(image_count)
+    ]
+
+
+def create_image_grid(images: Union[List[Image.Image], FrameStack], 
                      cols: int = 3, 
-                     padding: int = 10) -> Optional[Image.Image]:
-    """画像のグリッドを作成"""
-    if not images:
+                     padding: int = 10,
+                     background: Tuple[int, int, int] = (255, 255, 255)) -> Optional[Image.Image]:
+    """
+    画像のグリッドを作成（全画像が同じサイズであること）
+    
+    画像ごとに paste せず、全画像を (F, H, W, C) の配列にまとめて余白込みのタイルにし、
+    軸の並べ替え1回でグリッドに合成する
+    """
+    if images is None or not len(images):
         return None
     
     try:
-        # グリッドサイズ計算
-        rows = (len(images) + cols - 1) // cols
-        img_width, img_height = images[0].size
+        frames = FrameStack.from_images(images).array
+        count, img_height, img_width, channels = frames.shape
+        rows = (count + cols - 1) // cols
         
-        grid_width = cols * img_width + (cols - 1) * padding
-        grid_height = rows * img_height + (rows - 1) * padding
-        
-        # グリッド画像作成
-        grid = Image.new('RGB', (grid_width, grid_height), (255, 255, 255))
-        
-        for i, img in enumerate(images):
-            row = i // cols
-            col = i % cols
-            
-            x = col * (img_width + padding)
-            y = row * (img_height + padding)
-            
-            grid.paste(img, (x, y))
+        # グリッドを (行, y, 列, x, C) のビューで見て、全画像を1回の代入で書き込む
+        grid = np.empty((rows * (img_height + padding), cols * (img_width + padding), channels), dtype=np.uint8)
+        if padding or count % cols:
+            # 背景色の1行を作ってから全行にコピー（色のタプルを直接ブロードキャストするより速い）
+            grid[...] = np.tile(np.array(background, dtype=np.uint8), (grid.shape[1], 1))
+        cells = grid.reshape(rows, img_height + padding, cols, img_width + padding, channels)
+        full_rows = count // cols
+        cells[:full_rows, :img_height, :, :img_width] = (
+            frames[:full_rows * cols].reshape(full_rows, cols, img_height, img_width, channels).transpose(0, 2, 1, 3, 4)
+        )
+        if count % cols:
+            cells[full_rows, :img_height, :count % cols, :img_width] = frames[full_rows * cols:].transpose(1, 0, 2, 3)
         
-        return grid
+        # 最後の行・列の後ろの余白を落とす
+        grid_image = Image.fromarray(grid, 'RGB')
+        if padding:
+            grid_image = grid_image.crop((0, 0, grid_image.width - padding, grid_image.height - padding))
+        return grid_image
     
     except Exception as e:
         logger.error(f"Grid creation failed: {str(e)}")
         return None
 
 
+def create_sprite_atlas(frames: Union[List[Image.Image], FrameStack],
+                        durations: Union[int, List[int]] = 100,
+                        cols: Optional[int] = None,
+                        padding: int = 0) -> Tuple[Optional[Image.Image], dict]:
+    """
+    アニメーションフレームを1枚のテクスチャに並べたスプライトシートと、
+    フレーム表（各フレームの矩形と表示時間、JSON用）を返す
+    
+    cols を省略すると正方形に近い列数にする
+    """
+    frame_count = len(frames) if frames is not None else 0
+    if not frame_count:
+        return None, {'frames': [], 'meta': {'frame_count': 0}}
+    
+    cols = max(1, min(cols or int(np.ceil(np.sqrt(frame_count))), frame_count))
+    if isinstance(durations, int):
+        durations = [durations] * frame_count
+    
+    # 空きセル・余白は1枚目の左上の色で埋める（色数が増えずPモードのPNGのまま保存できる）
+    stack = FrameStack.from_images(frames)
+    atlas = create_image_grid(stack, cols, padding, background=tuple(int(v) for v in stack.array[0, 0, 0]))
+    if atlas is None:
+        return None, {'frames': [], 'meta': {'frame_count': 0}}
+    
+    frame_size = stack.size
+    rects = grid_layout(frame_count, frame_size, cols, padding)
+    
+    frame_table = {
+        'frames': [
+            {'index': i, 'x': x, 'y': y, 'w': w, 'h': h, 'duration': int(duration)}
+            for i, ((x, y, w, h), duration) in enumerate(zip(rects, durations))
+        ],
+        'meta': {
+            'size': {'w': atlas.width, 'h': atlas.height},
+            'frame_size': {'w': frame_size[0], 'h': frame_size[1]},
+            'frame_count': frame_count,
+            'columns': cols,
+            'rows': (frame_count + cols - 1) // cols,
+            'padding': padding
+        }
+    }
+    return atlas, frame_table
+
+
 def enhance_image(image: Image.Image, 
                  brightness: float = 1.0,
                  contrast: float = 1.0,
@@ -0,0 +1,136 @@
+"""
+Pixa - バイナリ転送ユーティリティ
+Base64-in-JSON を使わずに画像を送受信するためのリクエスト解析・レスポンス生成
+"""
+import json
+import uuid
+from flask import Response, jsonify, request
+from PIL import Image
+from typing import Any, Dict, Iterable, Optional, Tuple
+import logging
+
+from config.settings import Config
+from .image_utils import base64_to_image, bytes_to_data_url, decode_image_bytes
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidParamsError(ValueError):
+    """リクエストのパラメータがJSONオブジェクトとして解析できない"""
+
+
+def _load_params(text: Optional[str]) -> Dict[str, Any]:
+    """パラメータのJSON文字列を解析（空なら空のパラメータ、オブジェクト以外は InvalidParamsError）"""
+    try:
+        params = json.loads(text or '{}')
+    except ValueError as e:
+        raise InvalidParamsError(f'params のJSONを解析できません: {str(e)}')
+    if not isinstance(params, dict):
+        raise InvalidParamsError('params はJSONオブジェクトで指定してください')
+    return params
+
+
+def parse_image_request(image_field: str = 'existing_image') -> Tuple[Dict[str, Any], Optional[Image.Image], bool]:
+    """
+    リクエストからパラメータと画像を取り出し、(パラメータ, 画像, 画像が送られたか) を返す
+
+    対応する形式:
+    - multipart/form-data: 画像ファイルは image_field、パラメータは params フィールドのJSON
+    - image/*: ボディが画像そのもの、パラメータは X-Pixa-Params ヘッダーのJSON
+    - application/json: 従来どおり image_field にBase64データURL
+
+    パラメータがJSONオブジェクトでなければ InvalidParamsError
+    """
+    if request.mimetype == 'multipart/form-data':
+        params = _load_params(request.form.get('params'))
+        upload = request.files.get(image_field)
+        if upload is None:
+            return params, None, False
+        return params, decode_image_bytes(upload.read()), True
+
+    if request.mimetype.startswith('image/'):
+        params = _load_params(request.headers.get(Config.BINARY_PARAMS_HEADER))
+        return params, decode_image_bytes(request.get_data()), True
+
+    params = request.get_json(silent=True) or {}
+    if not isinstance(params, dict):
+        raise InvalidParamsError('リクエストボディはJSONオブジェクトで指定してください')
+    image_data = params.get(image_field)
+    if not image_data:
+        return params, None, False
+    return params, base64_to_image(image_data), True
+
+
+def wants_binary(mimetype: str, params: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    バイナリのレスポンスを返すべきか判定
+
+    Accept ヘッダーに mimetype が明示されている（*/* は対象外）か、
+    パラメータで response_format: 'binary' が指定されていればバイナリ
+    """
+    if params and params.get('response_format') == 'binary':
+        return True
+    return any(value == mimetype for value, _ in request.accept_mimetypes)
+
+
+def _metadata_header(metadata: Dict[str, Any]) -> str:
+    """メタデータをヘッダーに載せられるASCIIのJSONにする"""
+    return json.dumps(metadata, ensure_ascii=True, separators=(',', ':'))
+
+
+def binary_response(data: bytes, mimetype: str, metadata: Dict[str, Any], status: int = 200) -> Response:
+    """画像バイト列をそのまま返し、メタデータは X-Pixa-Metadata ヘッダーに載せる"""
+    return Response(
+        data,
+        status=status,
+        mimetype=mimetype,
+        headers={Config.BINARY_METADATA_HEADER: _metadata_header(metadata)}
+    )
+
+
+def image_payload_response(image_bytes: bytes,
+                           format: str,
+                           metadata: Dict[str, Any],
+                           params: Optional[Dict[str, Any]] = None) -> Response:
+    """
+    画像ペイロードのレスポンス（バイナリ要求ならそのまま、それ以外はJSONの image にデータURL）
+    """
+    mimetype = f'image/{format.lower()}'
+    if wants_binary(mimetype, params):
+        return binary_response(image_bytes, mimetype, metadata)
+    return jsonify({'image': bytes_to_data_url(image_bytes, format), **metadata})
+
+
+def multipart_response(parts: Iterable[Tuple[bytes, str, Dict[str, Any]]],
+                       metadata: Dict[str, Any]) -> Response:
+    """
+    複数の画像を multipart/mixed で返す
+
+    parts は (データ, MIMEタイプ, メタデータ) の並び。各パートのメタデータは
+    パートごとの X-Pixa-Metadata ヘッダーに、全体のメタデータは最後の
+    application/json パートに入れる
+    """
+    boundary = f'pixa-{uuid.uuid4().hex}'
+    header_name = Config.BINARY_METADATA_HEADER
+
+    def generate():
+        for data, mimetype, part_metadata in parts:
+            yield (
+                f'--{boundary}\r\n'
+                f'Content-Type: {mimetype}\r\n'
+                f'Content-Length: {len(data)}\r\n'
+                f'{header_name}: {_metadata_header(part_metadata)}\r\n\r\n'
+            ).encode('ascii')
+            yield data
+            yield b'\r\n'
+
+        summary = json.dumps(metadata, ensure_ascii=False).encode('utf-8')
+        yield (
+            f'--{boundary}\r\n'
+            f'Content-Type: application/json; charset=utf-8\r\n'
+            f'Content-Length: {len(summary)}\r\n\r\n'
+        ).encode('ascii')
+        yield summary
+        yield f'\r\n--{boundary}--\r\n'.encode('ascii')
+
+    return Response(generate(), mimetype=f'multipart/mixed; boundary={boundary}')
@@ -146,8 +146,12 @@ class PixaApp {
             const data = await apiService.generateImage(params);
 
             if (data.success) {
-                uiService.displayImage(data.image);
-                uiService.addToHistory(data.image, this.currentMode);
+                // スプライト解像度で受け取り、表示用にブラウザ側で拡大する
+                const image = data.sprite
+                    ? await uiService.upscaleSprite(data.image, data.sprite)
+                    : data.image;
+                uiService.displayImage(image);
+                uiService.addToHistory(image, this.currentMode);
                 uiService.showToast('生成が完了しました！', 'success');
             } else {
                 throw new Error(data.error || '生成に失敗しました');
@@ -253,7 +257,8 @@ class PixaApp {
             pixel_size: parseInt(document.getElementById('pixel-size')?.value || 8),
             palette_size: parseInt(document.getElementById('palette-size')?.value || 16),
             width: 512,
-            height: 512
+            height: 512,
+            output_mode: 'sprite'
         };
     }
 
@@ -42,6 +42,30 @@ class ApiService {
         });
     }
 
+    /**
+     * 生成済み画像のピクセルアート処理だけやり直す（generateImage の image_handle を使用）
+     */
+    async repixelateImage(imageHandle, pixelSize, paletteSize) {
+        return this.request('/repixelate', {
+            method: 'POST',
+            body: JSON.stringify({
+                image_handle: imageHandle,
+                pixel_size: pixelSize,
+                palette_size: paletteSize
+            })
+        });
+    }
+
+    /**
+     * 画像生成ジョブの状態取得（wait秒まで完了を待つ）
+     */
+    async getJobStatus(jobId, wait = 0) {
+        const query = wait > 0 ? `?wait=${wait}` : '';
+        return this.request(`/jobs/${jobId}${query}`, {
+            method: 'GET'
+        });
+    }
+
     /**
      * 最適化GIF生成
      */
@@ -52,6 +76,33 @@ class ApiService {
         });
     }
 
+    /**
+     * 最適化GIF生成（バイナリ転送）
+     * 画像Blobをmultipartで送り、GIFのBlobとメタデータ（X-Pixa-Metadataヘッダー）を返す
+     */
+    async generateOptimizedAnimationBinary(imageBlob, params = {}) {
+        const formData = new FormData();
+        formData.append('existing_image', imageBlob);
+        formData.append('params', JSON.stringify(params));
+
+        const response = await fetch(`${this.baseUrl}/generate_optimized_animation`, {
+            method: 'POST',
+            headers: {
+                'Accept': 'image/gif',
+            },
+            body: formData
+        });
+
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+
+        return {
+            blob: await response.blob(),
+            metadata: JSON.parse(response.headers.get('X-Pixa-Metadata') || '{}')
+        };
+    }
+
     /**
      * 一括最適化GIF生成
      */
@@ -62,6 +113,54 @@ class ApiService {
         });
     }
 
+    /**
+     * 一括最適化GIF生成（ストリーミング）
+     * 完成したアニメーションから順に onAnimation が呼ばれ、最後の統計情報を返す
+     */
+    async streamBatchGenerateOptimizedAnimations(params, onAnimation) {
+        const endpoint = '/batch_generate_optimized_animations/stream';
+        const response = await fetch(`${this.baseUrl}${endpoint}`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ ...params, format: 'ndjson' })
+        });
+
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let summary = null;
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const message = JSON.parse(line);
+
+                if (message.event === 'animation') {
+                    onAnimation(message);
+                } else if (message.event === 'complete') {
+                    summary = message;
+                } else if (message.event === 'error') {
+                    throw new Error(message.error);
+                }
+            }
+        }
+
+        return summary;
+    }
+
     /**
      * ヘルスチェック
      */
@@ -29,6 +29,27 @@ class UIService {
         this.updateDisplayState();
     }
 
+    /**
+     * スプライト解像度の画像を表示サイズまで拡大（ニアレストネイバー）
+     */
+    upscaleSprite(imageData, sprite) {
+        return new Promise((resolve, reject) => {
+            const img = new Image();
+            img.onload = () => {
+                const canvas = document.createElement('canvas');
+                canvas.width = sprite.display_width;
+                canvas.height = sprite.display_height;
+
+                const context = canvas.getContext('2d');
+                context.imageSmoothingEnabled = false;
+                context.drawImage(img, 0, 0, canvas.width, canvas.height);
+                resolve(canvas.toDataURL('image/png'));
+            };
+            img.onerror = reject;
+            img.src = imageData;
+        });
+    }
+
     /**
      * 画像情報を更新
      */
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+波状歪み（wave_distortion）ベンチマーク
+旧実装（Pythonの二重ループ）と座標マップ方式の速度・出力一致を比較
+"""
+import math
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from services.animations.effect_animations import EffectAnimations, _wave_distortion_index_maps
+
+
+def legacy_wave_distortion_frames(base_image, frame_count, width, height):
+    """旧実装（ピクセル単位の二重ループ）"""
+    frames = []
+    for i in range(frame_count):
+        pixels = np.array(base_image)
+        new_pixels = np.zeros_like(pixels)
+        for y in range(height):
+            for x in range(width):
+                wave_x = x + int(6 * math.sin(2 * math.pi * (y / 25 + i / frame_count)))
+                wave_y = y + int(3 * math.sin(2 * math.pi * (x / 35 + i / frame_count)))
+                wave_x = max(0, min(width - 1, wave_x))
+                wave_y = max(0, min(height - 1, wave_y))
+                new_pixels[y, x] = pixels[wave_y, wave_x]
+        frames.append(Image.fromarray(new_pixels.astype('uint8')))
+    return frames
+
+
+def create_test_image(size):
+    """ノイズ画像を生成（全ピクセルが異なる色になりやすい）"""
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8))
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    frame_count = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    image = create_test_image(size)
+
+    print("🌊 wave_distortion ベンチマーク")
+    print("=" * 50)
+    print(f"画像サイズ: {size}x{size}, フレーム数: {frame_count}")
+
+    start = time.perf_counter()
+    legacy_frames = legacy_wave_distortion_frames(image, frame_count, size, size)
+    legacy_time = time.perf_counter() - start
+
+    _wave_distortion_index_maps.cache_clear()
+    start = time.perf_counter()
+    cold_frames = EffectAnimations._create_wave_distortion_frames(image, frame_count, size, size)
+    cold_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    EffectAnimations._create_wave_distortion_frames(image, frame_count, size, size)
+    warm_time = time.perf_counter() - start
+
+    identical = all(
+        np.array_equal(np.array(a), np.array(b)) for a, b in zip(legacy_frames, cold_frames)
+    )
+
+    print(f"\n旧実装:                 {legacy_time:8.3f}秒")
+    print(f"座標マップ（初回）:     {cold_time:8.3f}秒 ({legacy_time / cold_time:.0f}x)")
+    print(f"座標マップ（キャッシュ）: {warm_time:8.3f}秒 ({legacy_time / warm_time:.0f}x)")
+    print(f"\n出力一致: {'✅' if identical else '❌'}")
+
+    return 0 if identical else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
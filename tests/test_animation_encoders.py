@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Pixa - アニメーションエンコーダーのテスト
+GIF / APNG / アニメーションWebP が同じ差分最適化済みフレームに復元できることを確認
+"""
+
+import io
+import sys
+import random
+import unittest
+
+# パスを追加してバックエンドモジュールをインポート
+sys.path.append('../backend')
+
+import numpy as np
+from PIL import Image
+
+from services.animations import AnimationFactory
+from services.animation_encoder_service import animation_encoder_service
+from services.gif_optimization_service import gif_optimization_service
+
+
+class TestAnimationEncoders(unittest.TestCase):
+    """形式ごとのアニメーションエンコードのテスト"""
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(3)
+        base_image = Image.fromarray(rng.integers(0, 256, (16, 16, 3), dtype=np.uint8)).resize((64, 64), Image.NEAREST)
+        random.seed(0)
+        cls.frames = AnimationFactory.create_frame_stack(base_image, 'spiral', 6, 4, 16)
+        cls.optimized = gif_optimization_service.optimize_gif_frames(cls.frames, 3)
+
+    def decode(self, data: bytes):
+        """アニメーションの全フレームをRGBのバイト列と表示時間に展開"""
+        image = Image.open(io.BytesIO(data))
+        decoded = []
+        for i in range(image.n_frames):
+            image.seek(i)
+            decoded.append((image.convert('RGB').tobytes(), image.info.get('duration')))
+        return decoded
+
+    def test_formats_round_trip(self):
+        """全形式が差分最適化済みフレームを劣化なく復元できる"""
+        formats = animation_encoder_service.get_available_formats()
+        self.assertIn('gif', formats)
+        self.assertIn('apng', formats)
+
+        results = animation_encoder_service.encode_formats(self.frames, formats, duration=120, tolerance=3, max_workers=3)
+        self.assertEqual(list(results), formats)
+
+        expected_frames = [frame.tobytes() for frame in self.optimized]
+        for format_name, result in results.items():
+            with self.subTest(format=format_name):
+                self.assertTrue(result['success'])
+                self.assertEqual(result['file_size'], len(result['data']))
+                self.assertGreaterEqual(result['encode_time_ms'], 0)
+
+                decoded = self.decode(result['data'])
+                # 変化のないフレームは前のフレームに統合されることがあるので、表示時間で展開して比べる
+                expanded = [frame for frame, duration in decoded for _ in range(round(duration / 120))]
+                self.assertEqual(expanded, expected_frames)
+
+        summary = animation_encoder_service.summarize(results)
+        self.assertEqual(summary['smallest'], min(results, key=lambda name: results[name]['file_size']))
+        self.assertIn(summary['fastest'], formats)
+
+    def test_sequential_matches_parallel(self):
+        """スレッドプールで並列にエンコードしても逐次と同じバイト列"""
+        sequential = animation_encoder_service.encode_formats(self.frames, ['gif', 'apng'], max_workers=1)
+        parallel = animation_encoder_service.encode_formats(self.frames, ['gif', 'apng'], max_workers=2)
+        for format_name in ('gif', 'apng'):
+            self.assertEqual(sequential[format_name]['data'], parallel[format_name]['data'])
+
+    def test_unknown_format(self):
+        """未対応の形式は失敗として結果に入る"""
+        results = animation_encoder_service.encode_formats(self.frames, ['gif', 'bmp'])
+        self.assertTrue(results['gif']['success'])
+        self.assertFalse(results['bmp']['success'])
+        self.assertIn('error', results['bmp'])
+
+
+if __name__ == '__main__':
+    unittest.main()
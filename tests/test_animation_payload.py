@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Pixa - アニメーションAPIのペイロードサイズ回帰テスト
+"""
+
+import sys
+import io
+import json
+import base64
+import unittest
+from unittest import mock
+
+# パスを追加してバックエンドモジュールをインポート
+sys.path.append('../backend')
+
+from flask import Flask
+from PIL import Image, ImageDraw
+
+from config.settings import Config
+from routes.animation_routes import animation_routes
+
+
+def base64_payload_size(data_size: int, prefix: str) -> int:
+    """正しいBase64データURLの長さ"""
+    return len(prefix) + 4 * ((data_size + 2) // 3)
+
+
+class TestAnimationPayload(unittest.TestCase):
+    """generate_optimized_animation のペイロードのテスト"""
+
+    @classmethod
+    def setUpClass(cls):
+        app = Flask(__name__)
+        app.register_blueprint(animation_routes, url_prefix='/api')
+        cls.client = app.test_client()
+
+        image = Image.new('RGB', (64, 64), (30, 30, 60))
+        draw = ImageDraw.Draw(image)
+        draw.ellipse([16, 16, 48, 48], fill=(250, 200, 40))
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+        cls.png_bytes = buffer.getvalue()
+        cls.image_data_url = 'data:image/png;base64,' + base64.b64encode(cls.png_bytes).decode('ascii')
+
+    def test_json_payload_is_base64(self):
+        """JSONの image はGIFを正しくBase64にしたもので、サイズは約4/3倍"""
+        response = self.client.post('/api/generate_optimized_animation', json={
+            'existing_image': self.image_data_url,
+            'animation_type': 'spiral',
+            'frame_count': 8
+        })
+        self.assertEqual(response.status_code, 200)
+        result = response.get_json()
+
+        prefix = 'data:image/gif;base64,'
+        self.assertTrue(result['image'].startswith(prefix))
+        self.assertEqual(len(result['image']), base64_payload_size(result['file_size'], prefix))
+
+        gif_data = base64.b64decode(result['image'][len(prefix):], validate=True)
+        self.assertEqual(len(gif_data), result['file_size'])
+        self.assertTrue(gif_data.startswith(b'GIF89a'))
+
+    def test_binary_payload(self):
+        """バイナリ要求ではGIFそのもの（ファイルサイズと同じ長さ）を返す"""
+        response = self.client.post(
+            '/api/generate_optimized_animation',
+            data={
+                'existing_image': (io.BytesIO(self.png_bytes), 'image.png'),
+                'params': json.dumps({'animation_type': 'spiral', 'frame_count': 8})
+            },
+            headers={'Accept': 'image/gif'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'image/gif')
+
+        metadata = json.loads(response.headers[Config.BINARY_METADATA_HEADER])
+        self.assertEqual(len(response.data), metadata['file_size'])
+        self.assertNotIn('image', metadata)
+        self.assertTrue(response.data.startswith(b'GIF89a'))
+
+    def test_default_output_mode(self):
+        """output_mode 未指定なら Config.DEFAULT_OUTPUT_MODE に従う"""
+        with mock.patch.object(Config, 'DEFAULT_OUTPUT_MODE', 'sprite'):
+            response = self.client.post('/api/generate_optimized_animation', json={
+                'existing_image': self.image_data_url,
+                'animation_type': 'spiral',
+                'frame_count': 4
+            })
+        self.assertEqual(response.status_code, 200)
+        result = response.get_json()
+        self.assertEqual(result['output_mode'], 'sprite')
+        self.assertIn('sprite', result)
+
+    def test_invalid_params(self):
+        """解析できない・オブジェクトでないパラメータは400"""
+        for params in ('{not json', '[1, 2]', '"spiral"'):
+            with self.subTest(params=params):
+                response = self.client.post(
+                    '/api/generate_optimized_animation',
+                    data={
+                        'existing_image': (io.BytesIO(self.png_bytes), 'image.png'),
+                        'params': params
+                    }
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.get_json()['success'])
+
+                response = self.client.post(
+                    '/api/generate_optimized_animation',
+                    data=self.png_bytes,
+                    content_type='image/png',
+                    headers={Config.BINARY_PARAMS_HEADER: params}
+                )
+                self.assertEqual(response.status_code, 400)
+
+        response = self.client.post('/api/generate_optimized_animation', json=[1, 2])
+        self.assertEqual(response.status_code, 400)
+
+    def test_atlas_invalid_png_profile(self):
+        """スプライトシートの png_profile も検証され、不正な値は既定のプロファイルになる"""
+        default_kwargs = Config.PNG_ENCODE_PROFILES[Config.PNG_ENCODE_PROFILE]
+        for png_profile in (None, 'unknown', ['fast'], {'optimize': True}):
+            self.assertEqual(Config.get_png_save_kwargs(png_profile), default_kwargs)
+        self.assertEqual(Config.get_png_save_kwargs('archival'), {'optimize': True})
+        
+        for png_profile in ('unknown', ['fast']):
+            with self.subTest(png_profile=png_profile):
+                response = self.client.post('/api/generate_sprite_atlas', json={
+                    'existing_image': self.image_data_url,
+                    'animation_type': 'spiral',
+                    'frame_count': 4,
+                    'png_profile': png_profile
+                })
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.get_json()['success'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -6,7 +6,9 @@ Pixa - 統合アニメーションテストスイート
 
 import sys
 import os
+import io
 import unittest
+from unittest import mock
 from pathlib import Path
 
 # パスを追加してバックエンドモジュールをインポート
@@ -15,6 +17,8 @@ sys.path.append('../backend')
 try:
     from services.animations import AnimationFactory
     from services.gif_optimization_service import gif_optimization_service
+    from services import batch_animation_service as batch_module
+    from services.batch_animation_service import batch_animation_service, BatchAnimationService
     from utils.image_utils import apply_pixel_art_processing
     print("✓ リファクタリング後のモジュールを正常にインポートしました")
 except ImportError as e:
@@ -22,6 +26,7 @@ except ImportError as e:
     sys.exit(1)
 
 from PIL import Image, ImageDraw
+import numpy as np
 
 
 class TestAnimationSuite(unittest.TestCase):
@@ -146,6 +151,227 @@ class TestAnimationSuite(unittest.TestCase):
         for anim_type, result in results.items():
             print(f"  ✓ {anim_type}: {result['file_size']:,} bytes")
     
+    def test_shared_palette(self):
+        """共通パレットモードのテスト"""
+        frames = AnimationFactory.create_animation_frames(
+            base_image=self.test_image,
+            animation_type='spiral',
+            frame_count=8,
+            pixel_size=4,
+            palette_size=8
+        )
+        
+        # 全フレームを通した色数がパレットサイズ以下
+        all_colors = set()
+        for frame in frames:
+            all_colors.update(color for _, color in frame.getcolors(maxcolors=1 << 16))
+        self.assertLessEqual(len(all_colors), 8)
+        
+        print("\n🎨 共通パレットテスト:")
+        print(f"  ✓ 全フレームの色数: {len(all_colors)}")
+    
+    def test_in_memory_gif_encoding(self):
+        """メモリ上のGIFエンコードのテスト"""
+        frames = AnimationFactory.create_animation_frames(
+            base_image=self.test_image,
+            animation_type='spiral',
+            frame_count=8,
+            pixel_size=4,
+            palette_size=16
+        )
+        
+        gif_data = gif_optimization_service.encode_optimized_gif(frames, duration=100, tolerance=3)
+        self.assertIsInstance(gif_data, bytes)
+        self.assertTrue(gif_data.startswith(b'GIF8'))
+        
+        # 減色済みパレットをそのまま使うので、差分最適化後のフレームが劣化せず復元できる
+        optimized_frames = gif_optimization_service.optimize_gif_frames(frames, 3)
+        gif = Image.open(io.BytesIO(gif_data))
+        for i, optimized in enumerate(optimized_frames):
+            gif.seek(i)
+            self.assertEqual(gif.convert('RGB').tobytes(), optimized.tobytes())
+        
+        print("\n💾 メモリ上GIFエンコードテスト:")
+        print(f"  ✓ {len(gif_data):,} bytes")
+    
+    def test_frame_diff_reuse(self):
+        """差分計算結果の再利用テスト"""
+        frames = AnimationFactory.create_animation_frames(
+            base_image=self.test_image,
+            animation_type='damage_flash',
+            frame_count=8,
+            pixel_size=4,
+            palette_size=16
+        )
+        
+        diff_result = gif_optimization_service.compute_frame_differences(frames, tolerance=3)
+        self.assertEqual(len(diff_result.optimized_frames), len(frames))
+        self.assertEqual(len(diff_result.changed_masks), len(frames) - 1)
+        self.assertEqual(diff_result.to_stats(), gif_optimization_service.get_optimization_stats(frames, 3))
+        
+        gif_data = gif_optimization_service.encode_optimized_gif(frames, tolerance=3, diff_result=diff_result)
+        self.assertEqual(gif_data, gif_optimization_service.encode_optimized_gif(frames, tolerance=3))
+
+    def test_dirty_rectangle_frames(self):
+        """2枚目以降は変化した矩形だけを透明色つきで書き出す"""
+        first = np.zeros((64, 64, 3), dtype=np.uint8)
+        second = first.copy()
+        second[10:20, 30:45] = (255, 0, 0)
+        second[12, 33] = 0  # 矩形内の変化しないピクセル
+        frames = [Image.fromarray(first), Image.fromarray(second)]
+
+        stats = gif_optimization_service.get_optimization_stats(frames, 3)
+        self.assertEqual(stats['frame_stats'][0]['dirty_rect'], [30, 10, 15, 10])
+
+        gif_data = gif_optimization_service.encode_optimized_gif(frames, tolerance=3)
+        gif = Image.open(io.BytesIO(gif_data))
+        gif.seek(1)
+        self.assertEqual(gif.tile[0][1], (30, 10, 45, 20))
+        self.assertEqual(gif.convert('RGB').tobytes(), frames[1].tobytes())
+
+        # 2枚目のグラフィック制御拡張で透明色フラグが立っている
+        control_blocks = gif_data.split(b'!\xf9\x04')[1:]
+        self.assertEqual(len(control_blocks), 2)
+        self.assertTrue(control_blocks[1][0] & 1)
+
+    def test_streaming_gif_encoding(self):
+        """フレームを1枚ずつ流すGIFエンコードのテスト"""
+        frame_iter = AnimationFactory.iter_animation_frames(
+            base_image=self.test_image,
+            animation_type='damage_flash',
+            frame_count=8,
+            pixel_size=4,
+            palette_size=16
+        )
+        self.assertFalse(isinstance(frame_iter, list))
+        frames = AnimationFactory.create_animation_frames(
+            base_image=self.test_image,
+            animation_type='damage_flash',
+            frame_count=8,
+            pixel_size=4,
+            palette_size=16
+        )
+
+        gif_data, diff_stats = gif_optimization_service.encode_optimized_gif_stream(frame_iter, duration=100, tolerance=3)
+        self.assertTrue(gif_data.startswith(b'GIF89a'))
+        self.assertEqual(diff_stats.to_stats(), gif_optimization_service.get_optimization_stats(frames, 3))
+
+        # 一括エンコードと同じフレーム・表示時間に復元できる
+        def decode(data):
+            gif = Image.open(io.BytesIO(data))
+            decoded = []
+            for i in range(gif.n_frames):
+                gif.seek(i)
+                decoded.append((gif.convert('RGB').tobytes(), gif.info.get('duration')))
+            return decoded
+
+        self.assertEqual(decode(gif_data), decode(gif_optimization_service.encode_optimized_gif(frames, tolerance=3)))
+
+    def test_target_size_encoding(self):
+        """目標サイズに収まる tolerance の自動探索のテスト"""
+        rng = np.random.default_rng(0)
+        base = rng.integers(0, 16, (64, 64, 3), dtype=np.uint8) * 16
+        frames = [base]
+        for amplitude in (8, 40, 120, 8, 40, 120):
+            # 変化の大きさが異なるノイズを重ねる（tolerance が大きいほど差分が減る）
+            noise = rng.integers(0, 2, base.shape[:2], dtype=np.uint8)[..., np.newaxis] * amplitude
+            frames.append(base ^ noise)
+        frames = [Image.fromarray(frame) for frame in frames]
+
+        strict_size = len(gif_optimization_service.encode_optimized_gif(frames, tolerance=1))
+        loose_size = len(gif_optimization_service.encode_optimized_gif(frames, tolerance=255))
+        self.assertLess(loose_size, strict_size)
+
+        # 十分な目標サイズなら最小の tolerance のまま1回だけエンコード
+        gif_data, diff_stats, search = gif_optimization_service.encode_optimized_gif_for_size(frames, strict_size * 2)
+        self.assertEqual(len(gif_data), strict_size)
+        self.assertEqual((search['tolerance'], search['encodes'], search['target_met']), (1, 1, True))
+        self.assertEqual(diff_stats.tolerance, 1)
+
+        # 中間の目標サイズなら tolerance を上げて収める
+        target = (strict_size + loose_size) // 2
+        gif_data, diff_stats, search = gif_optimization_service.encode_optimized_gif_for_size(frames, target)
+        self.assertLessEqual(len(gif_data), target)
+        self.assertTrue(search['target_met'])
+        self.assertGreater(search['tolerance'], 1)
+        self.assertLessEqual(search['encodes'], 3)
+        self.assertEqual(diff_stats.to_stats(), gif_optimization_service.get_optimization_stats(frames, search['tolerance']))
+
+        # 届かない目標サイズでは最小のGIFを返す
+        gif_data, _, search = gif_optimization_service.encode_optimized_gif_for_size(frames, loose_size // 4)
+        self.assertFalse(search['target_met'])
+        self.assertLessEqual(len(gif_data), strict_size)
+
+    def test_batch_generation(self):
+        """並列一括生成のテスト"""
+        animation_types = ['walk_cycle', 'spiral', 'glitch_wave']
+        
+        results = dict(batch_animation_service.iter_animation_gifs(
+            base_image=self.test_image,
+            animation_types=animation_types,
+            frame_count=4,
+            pixel_size=4,
+            palette_size=16,
+            max_workers=2
+        ))
+        
+        self.assertEqual(set(results), set(animation_types))
+        for anim_type, result in results.items():
+            with self.subTest(animation_type=anim_type):
+                self.assertTrue(result['success'])
+                self.assertTrue(result['gif_data'].startswith(b'GIF8'))
+                self.assertEqual(result['file_size'], len(result['gif_data']))
+    
+    def test_batch_pool_is_reused(self):
+        """リクエストごとに max_workers が違ってもワーカープールは1回だけ spawn で作る"""
+        service = BatchAnimationService(pool_size=3)
+        executor_class = batch_module.ProcessPoolExecutor
+        try:
+            with mock.patch.object(batch_module, 'ProcessPoolExecutor', wraps=executor_class) as pool:
+                for max_workers, animation_types in ((2, ['spiral', 'heartbeat', 'glitch_wave']),
+                                                     (3, ['spiral', 'heartbeat']),
+                                                     (None, ['walk_cycle', 'spiral', 'heartbeat', 'glitch_wave'])):
+                    with self.subTest(max_workers=max_workers):
+                        results = dict(service.iter_animation_gifs(
+                            base_image=self.test_image,
+                            animation_types=animation_types,
+                            frame_count=4,
+                            pixel_size=4,
+                            palette_size=16,
+                            max_workers=max_workers
+                        ))
+                        self.assertEqual(set(results), set(animation_types))
+                        self.assertTrue(all(result['success'] for result in results.values()))
+            
+            pool.assert_called_once()
+            self.assertEqual(pool.call_args.kwargs['max_workers'], 3)
+            self.assertEqual(pool.call_args.kwargs['mp_context'].get_start_method(), 'spawn')
+        finally:
+            service.shutdown()
+    
+    def test_sprite_resolution_rendering(self):
+        """スプライト解像度での生成（拡大は最後に1回）のテスト"""
+        pixel_size = 4
+        sprite_size = (self.test_image.width // pixel_size, self.test_image.height // pixel_size)
+        
+        for anim_type in AnimationFactory.get_all_animation_types():
+            with self.subTest(animation_type=anim_type):
+                frames = AnimationFactory.create_animation_frames(
+                    self.test_image, anim_type, 4, pixel_size, 16, sprite_resolution=True
+                )
+                self.assertEqual(len(frames), 4)
+                self.assertTrue(all(frame.size == sprite_size for frame in frames))
+                
+                # 共通パレットで減色済み
+                colors = Image.fromarray(np.concatenate([np.asarray(frame) for frame in frames])).getcolors(256)
+                self.assertLessEqual(len(colors), 16)
+        
+        result = batch_animation_service._render_safe(
+            self.test_image, 'spiral', 4, pixel_size, 16, 100, 3, 'sprite'
+        )
+        self.assertTrue(result['success'])
+        self.assertEqual(Image.open(io.BytesIO(result['gif_data'])).size, self.test_image.size)
+    
     def test_animation_factory(self):
         """AnimationFactoryの統合テスト"""
         # 全アニメーション種類の取得
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Pixa - エフェクトのベクトル化テスト
+NumPy化したエフェクトが旧実装と同じ出力になることを確認
+"""
+
+import sys
+import math
+import random
+import unittest
+
+# パスを追加してバックエンドモジュールをインポート
+sys.path.append('../backend')
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from services.animations.animation_base import AnimationBase
+from services.animations.effect_animations import EffectAnimations, IndexMapCache
+from services.animations.particle_system import ParticleSystem
+
+
+def legacy_wave_distortion_frames(base_image, frame_count, width, height):
+    """旧実装（ピクセル単位の二重ループ）"""
+    frames = []
+    for i in range(frame_count):
+        pixels = np.array(base_image)
+        new_pixels = np.zeros_like(pixels)
+        for y in range(height):
+            for x in range(width):
+                wave_x = x + int(6 * math.sin(2 * math.pi * (y / 25 + i / frame_count)))
+                wave_y = y + int(3 * math.sin(2 * math.pi * (x / 35 + i / frame_count)))
+                wave_x = max(0, min(width - 1, wave_x))
+                wave_y = max(0, min(height - 1, wave_y))
+                new_pixels[y, x] = pixels[wave_y, wave_x]
+        frames.append(Image.fromarray(new_pixels.astype('uint8')))
+    return frames
+
+
+def legacy_pixel_rain_frames(base_image, frame_count, width, height, pixel_size):
+    """旧実装（ピクセルごとの辞書と draw.rectangle）"""
+    pixels_data = []
+    for y in range(0, height, pixel_size):
+        for x in range(0, width, pixel_size):
+            color = base_image.getpixel((min(x, width-1), min(y, height-1)))
+            if sum(color) > 30:
+                pixels_data.append({
+                    'x': x, 'y': y, 'color': color,
+                    'fall_delay': random.uniform(0, 0.4),
+                    'fall_speed': random.uniform(0.8, 2.0)
+                })
+    
+    frames = []
+    for i in range(frame_count):
+        frame = Image.new('RGB', (width, height), (0, 0, 0))
+        draw = ImageDraw.Draw(frame)
+        t = i / frame_count
+        for pixel in pixels_data:
+            if t > pixel['fall_delay']:
+                fall_progress = (t - pixel['fall_delay']) / (1 - pixel['fall_delay'])
+                current_y = pixel['y'] - (pixel['y'] + height) * (1 - (1 - fall_progress) ** 2)
+                if current_y >= -pixel_size:
+                    draw.rectangle([
+                        pixel['x'], int(current_y),
+                        pixel['x'] + pixel_size, int(current_y) + pixel_size
+                    ], fill=pixel['color'])
+        frames.append(frame)
+    return frames
+
+
+def legacy_explode_reassemble_frames(base_image, frame_count, width, height):
+    """旧実装（パーツごとの rotate と paste）"""
+    part_size = 24
+    parts = []
+    for y in range(0, height, part_size):
+        for x in range(0, width, part_size):
+            part = base_image.crop((x, y, min(x + part_size, width), min(y + part_size, height)))
+            parts.append({
+                'image': part, 'original_x': x, 'original_y': y,
+                'velocity_x': random.uniform(-25, 25),
+                'velocity_y': random.uniform(-30, -5),
+                'rotation': random.uniform(-30, 30)
+            })
+    
+    frames = []
+    for i in range(frame_count):
+        frame = Image.new('RGB', (width, height), (0, 0, 0))
+        t = i / frame_count
+        if t < 0.5:
+            ease_t = t * 2
+        else:
+            ease_t = 1 - AnimationBase.create_ease_in_out((t - 0.5) * 2)
+        for part in parts:
+            x = part['original_x'] + part['velocity_x'] * ease_t
+            y = part['original_y'] + part['velocity_y'] * ease_t + 9.8 * ease_t * ease_t * 8
+            frame.paste(part['image'].rotate(part['rotation'] * ease_t, expand=False), (int(x), int(y)))
+        frames.append(frame)
+    return frames
+
+
+class TestEffectVectorization(unittest.TestCase):
+    """ベクトル化エフェクトのテスト"""
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(42)
+        # 非正方形で幅・高さの取り違えも検出する
+        cls.test_image = Image.fromarray(rng.integers(0, 256, (48, 80, 3), dtype=np.uint8))
+
+    def test_wave_distortion_matches_legacy(self):
+        """wave_distortionが旧実装とピクセル単位で一致"""
+        width, height = self.test_image.size
+        for frame_count in (3, 8):
+            with self.subTest(frame_count=frame_count):
+                expected = legacy_wave_distortion_frames(self.test_image, frame_count, width, height)
+                actual = EffectAnimations._create_wave_distortion_frames(
+                    self.test_image, frame_count, width, height
+                )
+                self.assertEqual(len(actual), frame_count)
+                for exp, act in zip(expected, actual):
+                    np.testing.assert_array_equal(np.array(exp), np.array(act))
+
+    def test_index_map_cache_budget(self):
+        """容量内のマップは再利用され、容量から押し出されたマップは作り直される"""
+        # 1フレームのマップ2つ分の容量
+        cache = IndexMapCache(memory_budget_bytes=2 * 4 * 10 * 10)
+        created = []
+        
+        def get(key, frame_count=1):
+            def create():
+                created.append(key)
+                return np.zeros((frame_count, 10, 10), dtype=np.int32)
+            return cache.get_or_create(key, create)
+        
+        first = get('a')
+        self.assertIs(get('a'), first)
+        second = get('b')
+        self.assertIs(get('b'), second)
+        self.assertEqual(created, ['a', 'b'])
+        
+        # 3つ目で最も古い 'a' が押し出される
+        get('c')
+        self.assertIsNot(get('a'), first)
+        self.assertEqual(created, ['a', 'b', 'c', 'a'])
+        
+        # 容量より大きいマップは保存しない
+        self.assertIsNot(get('large', frame_count=3), get('large', frame_count=3))
+        
+        # 容量を縮めると古いマップから削除される（最近使った 'a' が残る）
+        cache.set_budget(4 * 10 * 10)
+        del created[:]
+        get('a')
+        get('c')
+        self.assertEqual(created, ['c'])
+
+    def test_row_shift_maps_match_np_roll(self):
+        """行シフトのサンプリングマップがnp.rollと一致"""
+        pixels = np.array(self.test_image)
+        height, width = pixels.shape[:2]
+        row_shifts = np.random.default_rng(0).integers(-30, 30, (2, height))
+        
+        frames = AnimationBase.apply_sampling_maps(
+            pixels, AnimationBase.create_row_shift_maps(row_shifts, width)
+        )
+        for i in range(2):
+            expected = np.stack([np.roll(pixels[y], row_shifts[i, y], axis=0) for y in range(height)])
+            np.testing.assert_array_equal(frames[i], expected)
+
+    def test_resize_paste_maps_match_pil(self):
+        """リサイズ＋pasteのサンプリングマップがPILの処理と一致"""
+        width, height = self.test_image.size
+        sizes = [(100, 40), (61, 37), (width, height)]
+        offsets = [((width - w) // 2, (height - h) // 2) for w, h in sizes]
+        
+        frames = AnimationBase.apply_sampling_maps(
+            np.array(self.test_image),
+            AnimationBase.create_resize_paste_maps(sizes, offsets, width, height, width, height)
+        )
+        for frame, size, offset in zip(frames, sizes, offsets):
+            expected = Image.new('RGB', (width, height), (0, 0, 0))
+            expected.paste(self.test_image.resize(size, Image.NEAREST), offset)
+            np.testing.assert_array_equal(frame, np.array(expected))
+
+    def test_pixel_rain_matches_legacy(self):
+        """pixel_rainが旧実装と乱数列・ピクセル単位で一致"""
+        width, height = self.test_image.size
+        for pixel_size in (1, 4, 7):
+            with self.subTest(pixel_size=pixel_size):
+                random.seed(pixel_size)
+                expected = legacy_pixel_rain_frames(self.test_image, 10, width, height, pixel_size)
+                random.seed(pixel_size)
+                actual = EffectAnimations._create_pixel_rain_frames(self.test_image, 10, width, height, pixel_size)
+                for exp, act in zip(expected, actual):
+                    np.testing.assert_array_equal(np.array(exp), np.array(act))
+
+    def test_explode_reassemble_matches_legacy(self):
+        """ParticleSystemで動かすexplode_reassembleが旧実装（パーツごとの計算）とピクセル単位で一致"""
+        # 端のパーツが小さくなるサイズも含める
+        for width, height in (self.test_image.size, (70, 53)):
+            with self.subTest(size=(width, height)):
+                image = self.test_image.resize((width, height), Image.NEAREST)
+                random.seed(1)
+                expected = legacy_explode_reassemble_frames(image, 12, width, height)
+                random.seed(1)
+                actual = EffectAnimations._create_explode_reassemble_frames(image, 12, width, height)
+                for exp, act in zip(expected, actual):
+                    np.testing.assert_array_equal(np.array(exp), np.array(act))
+
+    def test_particle_overlap_order(self):
+        """重なった粒子は後の粒子が上に描かれる"""
+        particles = ParticleSystem(
+            origins=[[0, 0], [2, 2], [1, 1]],
+            velocities=np.zeros((3, 2)),
+            colors=[[255, 0, 0], [0, 255, 0], [0, 0, 255]],
+            size=3
+        )
+        canvas = particles.render(np.zeros((6, 6, 3), dtype=np.uint8), 0.0)
+        
+        expected = Image.new('RGB', (6, 6), (0, 0, 0))
+        draw = ImageDraw.Draw(expected)
+        for (x, y), color in zip([(0, 0), (2, 2), (1, 1)], [(255, 0, 0), (0, 255, 0), (0, 0, 255)]):
+            draw.rectangle([x, y, x + 2, y + 2], fill=color)
+        np.testing.assert_array_equal(canvas, np.array(expected))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
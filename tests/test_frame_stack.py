@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Pixa - FrameStack のテスト
+配列のまま処理したフレームがPIL画像ごとの処理と同じ結果になることを確認
+"""
+
+import sys
+import random
+import unittest
+
+# パスを追加してバックエンドモジュールをインポート
+sys.path.append('../backend')
+
+import numpy as np
+from PIL import Image
+
+from utils.frame_stack import FrameStack
+from services.animations import AnimationFactory
+from services.gif_optimization_service import gif_optimization_service
+
+
+class TestFrameStack(unittest.TestCase):
+    """FrameStack のテスト"""
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(7)
+        # 非正方形で幅・高さの取り違えも検出する
+        cls.frames = [
+            Image.fromarray(rng.integers(0, 256, (36, 52, 3), dtype=np.uint8))
+            for _ in range(4)
+        ]
+        cls.base_image = Image.fromarray(rng.integers(0, 256, (16, 24, 3), dtype=np.uint8)).resize((96, 64), Image.NEAREST)
+
+    def test_round_trip(self):
+        """PIL画像との相互変換"""
+        stack = FrameStack.from_images(self.frames)
+        self.assertEqual(stack.array.shape, (4, 36, 52, 3))
+        self.assertTrue(stack.array.flags.c_contiguous)
+        self.assertEqual(stack.size, (52, 36))
+        self.assertEqual(len(stack), 4)
+        for expected, actual in zip(self.frames, stack):
+            self.assertEqual(expected.tobytes(), actual.tobytes())
+        self.assertIsInstance(stack[1:3], FrameStack)
+
+    def test_resize_matches_pil(self):
+        """まとめてのNEARESTリサイズがPILと一致"""
+        stack = FrameStack.from_images(self.frames)
+        for size in ((13, 9), (104, 72), (52, 20)):
+            with self.subTest(size=size):
+                resized = stack.resize_nearest(size)
+                for frame, actual in zip(self.frames, resized):
+                    self.assertEqual(frame.resize(size, Image.NEAREST).tobytes(), actual.tobytes())
+
+    def test_quantize_shared(self):
+        """全フレーム共通のパレットで減色"""
+        quantized = FrameStack.from_images(self.frames).quantize_shared(8)
+        colors = np.unique(quantized.array.reshape(-1, 3), axis=0)
+        self.assertLessEqual(len(colors), 8)
+
+    def test_shared_palette_images(self):
+        """全フレーム共通パレットのPモード画像（色は変わらない）"""
+        stack = FrameStack.from_images(self.frames).quantize_shared(8)
+        images = stack.to_shared_palette_images()
+        self.assertTrue(all(image.mode == 'P' for image in images))
+        self.assertEqual(len({bytes(image.getpalette()) for image in images}), 1)
+        for expected, actual in zip(stack, images):
+            self.assertEqual(expected.tobytes(), actual.convert('RGB').tobytes())
+
+        # 色数が多すぎる場合は None
+        self.assertIsNone(FrameStack.from_images(self.frames).to_shared_palette_images(16))
+
+    def test_frame_stack_pipeline_matches_frames(self):
+        """create_frame_stack が create_animation_frames と同じフレームになる"""
+        for anim_type in AnimationFactory.get_all_animation_types():
+            for sprite_resolution in (False, True):
+                with self.subTest(animation_type=anim_type, sprite_resolution=sprite_resolution):
+                    random.seed(0)
+                    frames = AnimationFactory.create_animation_frames(
+                        self.base_image, anim_type, 6, 4, 16, sprite_resolution=sprite_resolution
+                    )
+                    random.seed(0)
+                    stack = AnimationFactory.create_frame_stack(
+                        self.base_image, anim_type, 6, 4, 16, sprite_resolution=sprite_resolution
+                    )
+                    self.assertIsInstance(stack, FrameStack)
+                    np.testing.assert_array_equal(stack.array, np.stack([np.asarray(frame) for frame in frames]))
+
+    def test_gif_optimization_accepts_stack(self):
+        """GIF最適化が FrameStack をそのまま受け取れる"""
+        stack = FrameStack.from_images(self.frames)
+        diff_result = gif_optimization_service.compute_frame_differences(stack, tolerance=3)
+        self.assertIsInstance(diff_result.optimized_frames, FrameStack)
+        self.assertEqual(diff_result.to_stats(), gif_optimization_service.get_optimization_stats(self.frames, 3))
+
+        gif_data, diff_stats = gif_optimization_service.encode_optimized_gif_stream(stack, tolerance=3)
+        self.assertTrue(gif_data.startswith(b'GIF89a'))
+        self.assertEqual(diff_stats.to_stats(), diff_result.to_stats())
+
+
+if __name__ == '__main__':
+    unittest.main()
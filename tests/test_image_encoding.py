@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Pixa - PNGエンコード・スプライト出力のテスト
+"""
+
+import sys
+import io
+import unittest
+import numpy as np
+
+# パスを追加してバックエンドモジュールをインポート
+sys.path.append('../backend')
+
+from PIL import Image
+
+from utils.frame_stack import FrameStack
+from utils.image_utils import (
+    apply_pixel_art_processing, create_image_grid, create_sprite_atlas, encode_png_bytes,
+    get_sprite_size
+)
+
+
+# Config.PNG_ENCODE_PROFILES と同じ保存オプション（fast / balanced / archival）
+PNG_SAVE_OPTIONS = ({'compress_level': 1}, {'compress_level': 6}, {'optimize': True})
+
+
+class TestPngEncoding(unittest.TestCase):
+    """encode_png_bytesのテスト"""
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        noise = Image.fromarray(rng.integers(0, 256, (64, 64, 3), dtype=np.uint8))
+        cls.source = noise.resize((256, 256), Image.BICUBIC)
+        cls.pixel_art = apply_pixel_art_processing(cls.source, 8, 16)
+
+    def test_palette_mode_is_lossless(self):
+        """減色済みの画像はPモードで保存され、ピクセルは変わらない"""
+        for save_kwargs in PNG_SAVE_OPTIONS:
+            with self.subTest(save_kwargs=save_kwargs):
+                data = encode_png_bytes(self.pixel_art, save_kwargs, palette_size=16)
+                decoded = Image.open(io.BytesIO(data))
+                self.assertEqual(decoded.mode, 'P')
+                np.testing.assert_array_equal(np.asarray(decoded.convert('RGB')), np.asarray(self.pixel_art))
+
+    def test_palette_mode_is_smaller(self):
+        """Pモードの方がRGBのPNGより小さい"""
+        rgb_buffer = io.BytesIO()
+        self.pixel_art.save(rgb_buffer, format='PNG', optimize=True)
+        data = encode_png_bytes(self.pixel_art, palette_size=16)
+        self.assertLess(len(data), len(rgb_buffer.getvalue()) / 2)
+
+    def test_many_colors_stay_rgb(self):
+        """色数が多い画像はRGBのまま保存される"""
+        data = encode_png_bytes(self.source, {'compress_level': 1})
+        decoded = Image.open(io.BytesIO(data))
+        self.assertEqual(decoded.mode, 'RGB')
+        np.testing.assert_array_equal(np.asarray(decoded), np.asarray(self.source))
+
+
+
+class TestSpriteOutput(unittest.TestCase):
+    """スプライト解像度出力のテスト"""
+
+    def test_native_resolution_matches_full_output(self):
+        """スプライトをNEARESTで拡大すると通常出力と一致する"""
+        rng = np.random.default_rng(1)
+        source = Image.fromarray(rng.integers(0, 256, (32, 32, 3), dtype=np.uint8)).resize((256, 256))
+
+        full = apply_pixel_art_processing(source, 8, 16)
+        sprite = apply_pixel_art_processing(source, 8, 16, native_resolution=True)
+
+        self.assertEqual(sprite.size, get_sprite_size(source.size, 8))
+        self.assertEqual(sprite.size, (32, 32))
+        np.testing.assert_array_equal(
+            np.asarray(sprite.resize(full.size, Image.NEAREST)),
+            np.asarray(full)
+        )
+
+
+
+class TestSpriteAtlas(unittest.TestCase):
+    """グリッド合成・スプライトシートのテスト"""
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(2)
+        cls.frames = [Image.fromarray(rng.integers(0, 4, (12, 20, 3), dtype=np.uint8) * 64) for _ in range(7)]
+
+    def test_grid_matches_paste(self):
+        """配列での一括合成が画像ごとの paste と同じ結果になる"""
+        for cols, padding in ((3, 10), (4, 0), (7, 2), (2, 5)):
+            with self.subTest(cols=cols, padding=padding):
+                rows = (len(self.frames) + cols - 1) // cols
+                expected = Image.new('RGB', (cols * 20 + (cols - 1) * padding, rows * 12 + (rows - 1) * padding), (255, 255, 255))
+                for i, frame in enumerate(self.frames):
+                    expected.paste(frame, ((i % cols) * (20 + padding), (i // cols) * (12 + padding)))
+
+                grid = create_image_grid(self.frames, cols, padding)
+                self.assertEqual(grid.size, expected.size)
+                self.assertEqual(grid.tobytes(), expected.tobytes())
+
+    def test_atlas_frame_table(self):
+        """フレーム表の矩形でスプライトシートから各フレームを切り出せる"""
+        atlas, frame_table = create_sprite_atlas(FrameStack.from_images(self.frames), durations=120, padding=1)
+        meta = frame_table['meta']
+        self.assertEqual((meta['columns'], meta['rows'], meta['frame_count']), (3, 3, 7))
+        self.assertEqual((meta['size']['w'], meta['size']['h']), atlas.size)
+
+        for frame, entry in zip(self.frames, frame_table['frames']):
+            self.assertEqual(entry['duration'], 120)
+            region = atlas.crop((entry['x'], entry['y'], entry['x'] + entry['w'], entry['y'] + entry['h']))
+            self.assertEqual(region.tobytes(), frame.tobytes())
+
+        # 空きセル・余白で色数が増えないのでPモードのPNGになる
+        decoded = Image.open(io.BytesIO(encode_png_bytes(atlas, palette_size=64)))
+        self.assertEqual(decoded.mode, 'P')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
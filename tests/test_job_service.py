@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Pixa - ジョブキューのテスト
+"""
+
+import sys
+import time
+import threading
+import unittest
+
+# パスを追加してバックエンドモジュールをインポート
+sys.path.append('../backend')
+
+from services.job_service import JobService, Job, QueueFullError
+from config.settings import Config
+
+
+class TestJobService(unittest.TestCase):
+    """JobServiceのテスト"""
+
+    def test_priority_order(self):
+        """優先度の小さいジョブから実行される"""
+        service = JobService()
+        order = []
+        gate = threading.Event()
+
+        def blocker(progress_callback=None):
+            gate.wait(5)
+
+        def record(name, progress_callback=None):
+            order.append(name)
+            return name
+
+        first = service.submit(blocker)
+        jobs = [
+            service.submit(record, priority=5, name='low'),
+            service.submit(record, priority=1, name='high'),
+            service.submit(record, priority=5, name='low2'),
+        ]
+        gate.set()
+
+        for job in [first] + jobs:
+            self.assertTrue(job.wait(5))
+        self.assertEqual(order, ['high', 'low', 'low2'])
+        self.assertEqual(jobs[1].status, Job.COMPLETED)
+        self.assertEqual(jobs[1].result, 'high')
+
+    def test_failure_and_progress(self):
+        """例外はFAILED、進捗はコールバックで更新される"""
+        service = JobService()
+
+        def failing(progress_callback=None):
+            progress_callback(0.5)
+            raise RuntimeError('boom')
+
+        job = service.submit(failing)
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.error, 'boom')
+        self.assertEqual(job.to_dict()['progress'], 0.5)
+
+    def test_queue_limit(self):
+        """待機数の上限を超えると受け付けない"""
+        service = JobService(max_queued_jobs=1)
+        gate = threading.Event()
+        service.submit(lambda progress_callback=None: gate.wait(5))
+        time.sleep(0.1)  # 1件目が実行中になるのを待つ
+
+        service.submit(lambda progress_callback=None: None)
+        with self.assertRaises(QueueFullError):
+            service.submit(lambda progress_callback=None: None)
+        gate.set()
+
+    def test_invalid_priority(self):
+        """整数にできない優先度は登録されず、後続のジョブを妨げない"""
+        service = JobService(max_queued_jobs=2)
+        for priority in ('high', None, [1]):
+            with self.assertRaises((TypeError, ValueError)):
+                service.submit(lambda progress_callback=None: None, priority=priority)
+        self.assertEqual(service.get_stats()[Job.QUEUED], 0)
+
+        jobs = [service.submit(lambda value, progress_callback=None: value, priority=p, value=p) for p in (3, '1')]
+        for job in jobs:
+            self.assertTrue(job.wait(5))
+        self.assertEqual([job.result for job in jobs], [3, '1'])
+        self.assertTrue(service._worker.is_alive())
+
+        self.assertEqual(Config.validate_job_priority('7'), 7)
+        self.assertEqual(Config.validate_job_priority(10 ** 6), Config.MAX_JOB_PRIORITY)
+        self.assertEqual(Config.validate_job_priority(-5), Config.MIN_JOB_PRIORITY)
+        self.assertIsNone(Config.validate_job_priority(None))
+        self.assertIsNone(Config.validate_job_priority('high'))
+        self.assertIsNone(Config.validate_job_priority(float('inf')))
+
+    def test_micro_batching(self):
+        """同じ batch_key の待機ジョブはまとめて実行される"""
+        service = JobService(max_batch_size=3, batch_window=0.05)
+        gate = threading.Event()
+        batch_sizes = []
+
+        def single(value, progress_callback=None):
+            batch_sizes.append(1)
+            return value * 10
+
+        def batch(kwargs_list, progress_callback=None):
+            batch_sizes.append(len(kwargs_list))
+            return [kwargs['value'] * 10 for kwargs in kwargs_list]
+
+        blocker = service.submit(lambda progress_callback=None: gate.wait(5))
+        jobs = [
+            service.submit(single, batch_key='a', batch_func=batch, value=i)
+            for i in range(4)
+        ]
+        other = service.submit(single, batch_key='b', batch_func=batch, value=9)
+        gate.set()
+
+        for job in [blocker, other] + jobs:
+            self.assertTrue(job.wait(5))
+        self.assertEqual([job.result for job in jobs], [0, 10, 20, 30])
+        self.assertEqual(other.result, 90)
+        self.assertEqual(batch_sizes, [3, 1, 1])
+        self.assertEqual([job.batch_size for job in jobs], [3, 3, 3, 1])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
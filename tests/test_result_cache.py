@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Pixa - 生成結果キャッシュのテスト
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+# パスを追加してバックエンドモジュールをインポート
+sys.path.append('../backend')
+
+import numpy as np
+from PIL import Image
+
+from services.result_cache_service import FrameStackCache, ResultCache, make_cache_key, make_image_digest
+from services.animation_service import animation_service
+from services.animations import GameAnimations
+from config.settings import Config
+from utils.frame_stack import FrameStack
+
+
+class TestResultCache(unittest.TestCase):
+    """ResultCacheのテスト"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.temp_dir.name, 'cache')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_cache_key(self):
+        """キーは引数の順序に依存せず、値が変われば変わる"""
+        key = make_cache_key(prompt='cat', seed=1)
+        self.assertEqual(key, make_cache_key(seed=1, prompt='cat'))
+        self.assertNotEqual(key, make_cache_key(prompt='cat', seed=2))
+
+    def test_memory_lru(self):
+        """メモリ段は予算を超えると最も古く使われたものから削除される"""
+        cache = ResultCache(self.cache_dir, memory_budget_bytes=10, disk_budget_bytes=0)
+        cache.put('a', b'xxxx')
+        cache.put('b', b'yyyy')
+        self.assertEqual(cache.get('a'), b'xxxx')
+        cache.put('c', b'zzzz')
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'xxxx')
+        self.assertEqual(cache.get('c'), b'zzzz')
+
+    def test_disk_tier(self):
+        """メモリから消えてもディスク段から取得できる"""
+        cache = ResultCache(self.cache_dir, memory_budget_bytes=4, disk_budget_bytes=1024)
+        cache.put('a', b'1111')
+        cache.put('b', b'2222')
+        self.assertEqual(cache.get('a'), b'1111')
+
+        # 別インスタンス（再起動後）でも残っている
+        restarted = ResultCache(self.cache_dir, memory_budget_bytes=4, disk_budget_bytes=1024)
+        self.assertEqual(restarted.get('b'), b'2222')
+
+    def test_disk_eviction(self):
+        """ディスク段は予算を超えると古いものから削除される"""
+        cache = ResultCache(self.cache_dir, memory_budget_bytes=0, disk_budget_bytes=10)
+        cache.put('a', b'aaaa')
+        os.utime(cache._path('a'), (0, 0))
+        cache.put('b', b'bbbb')
+        cache.put('c', b'cccc')
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), b'bbbb')
+        self.assertEqual(cache.get('c'), b'cccc')
+        self.assertLessEqual(cache.get_stats()['disk_bytes'], 10)
+
+    def test_disk_eviction_low_water(self):
+        """ディスク段は低水位まで削除し、ディレクトリの走査は最初の1回だけ"""
+        cache = ResultCache(self.cache_dir, memory_budget_bytes=0, disk_budget_bytes=100)
+        scans = []
+        iter_disk_entries = cache._iter_disk_entries
+        cache._iter_disk_entries = lambda: scans.append(1) or iter_disk_entries()
+
+        for i in range(30):
+            cache.put(f'key{i}', b'x' * 10)
+
+        self.assertEqual(len(scans), 1)
+        disk_bytes = cache.get_stats()['disk_bytes']
+        self.assertLessEqual(disk_bytes, 100)
+        files = [name for _, _, names in os.walk(self.cache_dir) for name in names]
+        self.assertEqual(len(files) * 10, disk_bytes)
+        self.assertIsNone(cache.get('key0'))
+        self.assertEqual(cache.get('key29'), b'x' * 10)
+
+
+
+class TestFrameStackCache(unittest.TestCase):
+    """FrameStackCacheのテスト"""
+
+    @staticmethod
+    def make_stack(value, frame_count=2):
+        return FrameStack(np.full((frame_count, 4, 4, 3), value, dtype=np.uint8))
+
+    def test_image_digest(self):
+        """画素が同じなら同じダイジェスト、1画素でも違えば別のダイジェスト"""
+        image = Image.new('RGB', (8, 8), (10, 20, 30))
+        self.assertEqual(make_image_digest(image), make_image_digest(image.copy()))
+        changed = image.copy()
+        changed.putpixel((3, 3), (10, 20, 31))
+        self.assertNotEqual(make_image_digest(image), make_image_digest(changed))
+
+    def test_lru_budget(self):
+        """配列のバイト数で予算を管理し、古く使われたものから削除される"""
+        stack_bytes = self.make_stack(0).nbytes
+        cache = FrameStackCache(memory_budget_bytes=stack_bytes * 2)
+        cache.put('a', self.make_stack(1))
+        cache.put('b', self.make_stack(2))
+        self.assertIsNotNone(cache.get('a'))
+        cache.put('c', self.make_stack(3))
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(int(cache.get('a').array[0, 0, 0, 0]), 1)
+        self.assertEqual(cache.get_stats()['memory_bytes'], stack_bytes * 2)
+
+        # 保存したフレームは書き換えられない
+        with self.assertRaises(ValueError):
+            cache.get('a').array[0, 0, 0, 0] = 0
+
+    def test_cached_frame_stack_skips_synthesis(self):
+        """同じ画像・パラメータの2回目はキャッシュのフレームを返す"""
+        image = Image.new('RGB', (64, 64), (0, 0, 0))
+        image.paste((200, 100, 50), (16, 16, 48, 48))
+
+        first = animation_service.get_cached_frame_stack(image, 'heartbeat', 4, 4, 8)
+        second = animation_service.get_cached_frame_stack(image.copy(), 'heartbeat', 4, 4, 8)
+        self.assertIs(first, second)
+        self.assertIsNot(first, animation_service.get_cached_frame_stack(image, 'heartbeat', 4, 4, 16))
+
+    def test_failed_synthesis_is_not_cached(self):
+        """生成失敗時の元画像1枚のフレームはキャッシュされない"""
+        image = Image.new('RGB', (64, 64), (10, 20, 30))
+        image.paste((90, 180, 40), (8, 8, 40, 40))
+
+        with mock.patch.object(GameAnimations, 'create_frame_stack', side_effect=RuntimeError('boom')):
+            fallback = animation_service.get_cached_frame_stack(image, 'walk_cycle', 4, 4, 8)
+        self.assertEqual(len(fallback), 1)
+
+        stack = animation_service.get_cached_frame_stack(image, 'walk_cycle', 4, 4, 8)
+        self.assertEqual(len(stack), 4)
+
+    def test_large_stream_bypasses_cache(self):
+        """推定サイズが上限を超えるストリーム生成はキャッシュせずに1枚ずつ流す"""
+        image = Image.new('RGB', (64, 64), (40, 40, 40))
+        image.paste((250, 120, 0), (20, 12, 44, 52))
+
+        with mock.patch.object(Config, 'FRAME_CACHE_MAX_STREAM_MB', 0):
+            frames = animation_service.iter_cached_animation_frames(image, 'idle_breathing', 4, 4, 8)
+            self.assertNotIsInstance(frames, FrameStack)
+            streamed = [np.asarray(frame) for frame in frames]
+
+        stack = animation_service.iter_cached_animation_frames(image, 'idle_breathing', 4, 4, 8)
+        self.assertIsInstance(stack, FrameStack)
+        np.testing.assert_array_equal(stack.array, np.stack(streamed))
+        self.assertIs(animation_service.iter_cached_animation_frames(image, 'idle_breathing', 4, 4, 8), stack)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)